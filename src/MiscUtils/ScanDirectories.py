@@ -11,6 +11,11 @@ __license__     = "MIT (http://opensource.org/licenses/MIT)"
 from os.path import join, isdir, normpath
 import os
 import logging
+try:
+    # scandir backport, if installed, returns entry types with directory listings
+    from scandir import scandir
+except ImportError:
+    scandir = None
 
 logger = logging.getLogger("ScanDirectories")
 #logger.setLevel(logging.INFO)
@@ -101,6 +106,65 @@ def CollectDirectoryContents(srcDir, baseDir="",
     ScanDirectoriesEx(srcDir, CollectDir, CollectFile, recursive)
     return collection
 
+# Generate directory contents found under the source directory
+#
+# This is like 'CollectDirectoryContents' above, except that values are
+# generated as the directory structure is scanned rather than collected
+# in a list, and hidden directories can be skipped without being scanned.
+# Hidden directories are pruned before they are descended.  If the scandir
+# module is installed, entry types are taken from the directory listing;
+# otherwise os.walk is used, which stats each entry to find directories.
+#
+# srcdir    directory to search, maybe including sub-directories
+# baseDir   a base directory that is removed from all results returned.
+# listFiles is True if files are to be included in the values generated
+# recursive is True if directories are to be scanned recursively,
+#           otherwise only the named directory is scanned.
+# appendSep is True if path separator character is to be appended to directory names
+# listHidden is True if hidden files and directories are to be included
+#
+# Returns an iterator over directory contents
+#
+def IterDirectoryContents(srcDir, baseDir="",
+        listDirs=True, listFiles=False, recursive=True, appendSep=False, listHidden=True):
+    """
+    Return an iterator over directory contents found under the source directory.
+    """
+    logger.debug("IterDirectoryContents: %s, %s, %s"%(srcDir,baseDir,str(os.path.sep)))
+    dirsuffix = ""
+    if appendSep: dirsuffix = os.path.sep
+    if (baseDir != "") and (not baseDir.endswith(os.path.sep)):
+        baseDir = baseDir+os.path.sep
+    def WalkError(e):
+        raise e
+    def ScanWalk(srcdir):
+        # Like os.walk(srcdir, followlinks=True), using entry types from scandir
+        dirnames  = []
+        filenames = []
+        for entry in scandir(srcdir):
+            if entry.is_dir(): dirnames.append(entry.name)
+            else:              filenames.append(entry.name)
+        yield (srcdir, dirnames, filenames)
+        for d in dirnames:
+            for w in ScanWalk(join(srcdir, d)): yield w
+        return
+    def Walk(srcdir):
+        if scandir: return ScanWalk(srcdir)
+        return os.walk(srcdir, onerror=WalkError, followlinks=True)
+    def IterDir(srcdir):
+        for (dirpath, dirnames, filenames) in Walk(srcdir):
+            if not listHidden:
+                # Prune in place so that os.walk does not descend hidden directories
+                dirnames[:] = [ d for d in dirnames if not d.startswith(".") ]
+                filenames   = [ f for f in filenames if not f.startswith(".") ]
+            if listDirs:
+                for d in dirnames: yield join(dirpath, d).replace(baseDir,"",1)+dirsuffix
+            if listFiles:
+                for f in filenames: yield join(dirpath, f).replace(baseDir,"",1)
+            if not recursive: break
+        return
+    return IterDir(srcDir)
+
 if __name__ == "__main__":
     directoryCollection = CollectDirectoryContents(".", baseDir=".", 
         listFiles=True, listDirs=False, appendSep=True)
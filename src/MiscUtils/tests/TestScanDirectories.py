@@ -9,13 +9,16 @@ __copyright__   = "Copyright 2011-2013, Graham Klyne, University of Oxford"
 __license__     = "MIT (http://opensource.org/licenses/MIT)"
 
 import sys
+import os
+import shutil
+import tempfile
 import unittest
 import re
 import logging
 from os.path import normpath, abspath
 
 sys.path.append("../..")
-from MiscUtils.ScanDirectories import CollectDirectoryContents
+from MiscUtils.ScanDirectories import CollectDirectoryContents, IterDirectoryContents
 from MiscUtils.Functions import compareLists
 from MiscUtils import TestUtils
 
@@ -189,6 +192,33 @@ class TestScanDirectories (unittest.TestCase):
         c = compareLists(dirs, expected)
         assert c == None, "Wrong directory list: "+repr(c)
 
+    def testIterAllRecursive(self):
+        dirs     = IterDirectoryContents(self.srcPath, baseDir=self.basePath,
+                        listDirs=True, listFiles=True, recursive=True)
+        expected = CollectDirectoryContents(self.srcPath, baseDir=self.basePath,
+                        listDirs=True, listFiles=True, recursive=True)
+        c = compareLists(list(dirs), expected)
+        assert c == None, "Wrong directory list: "+repr(c)
+
+    def testIterFilesNotHidden(self):
+        tempdir = tempfile.mkdtemp()
+        try:
+            for d in ["dir1", ".hidden", "dir1/.hidden1"]:
+                os.mkdir(os.path.join(tempdir, d))
+            for f in ["file1", ".file2", "dir1/file3", ".hidden/file4", "dir1/.hidden1/file5"]:
+                open(os.path.join(tempdir, f), "w").close()
+            dirs     = IterDirectoryContents(tempdir, baseDir=tempdir,
+                            listDirs=True, listFiles=True, recursive=True,
+                            appendSep=True, listHidden=False)
+            expected = [ "dir1/"
+                       , "dir1/file3"
+                       , "file1"
+                       ]
+            c = compareLists(list(dirs), expected)
+            assert c == None, "Wrong directory list: "+repr(c)
+        finally:
+            shutil.rmtree(tempdir)
+
     # Sentinel/placeholder tests
 
     def testUnits(self):
@@ -231,6 +261,8 @@ def getTestSuite(select="unit"):
             , "testCollectAllRecursive"
             , "testCollectAllRecursiveBaseEndswithSep"
             , "testCollectAllRecursiveEmptyBase"
+            , "testIterAllRecursive"
+            , "testIterFilesNotHidden"
             ],
         "component":
             [ "testComponents"
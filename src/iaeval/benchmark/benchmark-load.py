@@ -0,0 +1,120 @@
+# !/usr/bin/env python
+#
+# benchmark-load.py - time annotation loading for synthetic ROs with different
+#                     numbers of parsing worker processes
+#
+# The ROs used are those created by generate-ro.py (see run-benchmark.sh), e.g.
+#
+#   python benchmark-load.py -w 1,2,4,8,16,32 benchmark_100_100 benchmark_1000_100
+#
+# The annotation cache is removed before each load so that every body is parsed.
+#
+
+import sys
+import os
+import os.path
+import argparse
+import logging
+import time
+
+log = logging.getLogger(__name__)
+
+# Make sure rocommand, etc., can be found on the path, overriding installed copy
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.join(sys.path[0],"../.."))
+
+from rocommand import ro_settings, ro_utils
+from rocommand.ro_metadata import ro_metadata
+
+VERSION = "0.1"
+
+def loadtime(rodir, workers):
+    """
+    Load annotations for RO with specified number of parsing workers,
+    and return elapsed time in seconds.
+    """
+    cachefile = os.path.join(rodir, ro_settings.MANIFEST_DIR, ro_settings.ANNOTATIONS_CACHE_FILE)
+    if os.path.exists(cachefile):
+        os.remove(cachefile)
+    starttime = time.time()
+    rometa = ro_metadata({"annotation_load_workers": workers}, rodir)
+    rometa.getAnnotationGraph()
+    return time.time() - starttime
+
+def run(configbase, filebase, options, progname):
+    """
+    Time annotation loading for each RO and worker count, and print summary table
+    """
+    workerlist = [ int(w) for w in options.workers.split(",") ]
+    print "%-24s"%("RO \\ workers") + "".join([ "%9d"%w for w in workerlist ])
+    for roname in options.ronames:
+        rodir = os.path.abspath(os.path.join(filebase, roname))
+        times = []
+        for w in workerlist:
+            times.append(min( loadtime(rodir, w) for i in range(options.repeat) ))
+        print "%-24s"%(roname) + "".join([ "%9.2f"%t for t in times ])
+    return 0
+
+def parseCommandArgs(argv):
+    """
+    Parse command line arguments
+
+    argv -- argument list from command line
+
+    Returns options specified as returned by ArgumentParser.
+    """
+    parser = argparse.ArgumentParser(
+                description="Time annotation loading of synthetic ROs with parallel parsing.",
+                epilog="Elapsed times (seconds) are written to standard output.")
+    parser.add_argument('ronames', nargs='+', help="Names of research objects to load")
+    parser.add_argument('--version', action='version', version='%(prog)s '+VERSION)
+    parser.add_argument("-w", "--workers",
+                        dest="workers",
+                        default="1,2,4,8",
+                        help="Comma-separated list of worker process counts.  Default: '1,2,4,8'.")
+    parser.add_argument("-r", "--repeat",
+                        dest="repeat",
+                        type=int,
+                        default=3,
+                        help="Number of loads for each RO and worker count; the fastest is reported.")
+    parser.add_argument("--debug",
+                        action="store_true",
+                        dest="debug",
+                        default=False,
+                        help="Run with full debug output enabled")
+    options = parser.parse_args(argv)
+    log.debug("Options: %s"%(repr(options)))
+    return options
+
+def runCommand(configbase, filebase, argv):
+    """
+    Run program with supplied configuration base directory, directory
+    containing the research objects, and arguments.
+
+    Returns exit status.
+    """
+    options = parseCommandArgs(argv[1:])
+    if not options or options.debug:
+        logging.basicConfig(level=logging.DEBUG)
+    log.debug("runCommand: configbase %s, filebase %s, argv %s"%(configbase, filebase, repr(argv)))
+    status = 1
+    if options:
+        progname = ro_utils.progname(argv)
+        status   = run(configbase, filebase, options, progname)
+    return status
+
+def runMain():
+    """
+    Main program transfer function
+    """
+    userhome = os.path.expanduser("~")
+    filebase = os.getcwd()
+    return runCommand(userhome, filebase, sys.argv)
+
+if __name__ == "__main__":
+    """
+    Program invoked from the command line.
+    """
+    status = runMain()
+    sys.exit(status)
+
@@ -0,0 +1,124 @@
+# !/usr/bin/env python
+#
+# benchmark-memory.py - compare memory used by the annotation graph of synthetic
+#                       ROs with different in-memory RDF stores
+#
+# The ROs used are those created by generate-ro.py (see run-benchmark.sh), e.g.
+#
+#   python benchmark-memory.py benchmark_1000_100 benchmark_10000_100
+#
+# Each RO is loaded in a new process for each store, and the peak resident set
+# size of that process is reported.  The baseline for a process that has imported
+# the RO manager modules without loading an RO is reported as store "none".
+#
+
+import sys
+import os
+import os.path
+import argparse
+import logging
+import time
+import resource
+import multiprocessing
+
+log = logging.getLogger(__name__)
+
+# Make sure rocommand, etc., can be found on the path, overriding installed copy
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.join(sys.path[0],"../.."))
+
+from rocommand import ro_utils
+from rocommand.ro_metadata import ro_metadata
+
+VERSION = "0.1"
+
+def loadmemory(rodir, store, result):
+    """
+    Load annotations for RO using specified graph store, and put the number
+    of statements, elapsed time in seconds and peak memory use in MB on the
+    supplied result queue.  Intended to be run in a new process.
+    """
+    starttime = time.time()
+    size      = 0
+    if store != "none":
+        rometa = ro_metadata({"graph_store": store}, rodir)
+        size   = len(rometa.getAnnotationGraph())
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    result.put((size, time.time() - starttime, maxrss/1024.0))
+    return
+
+def run(configbase, filebase, options, progname):
+    """
+    Measure annotation loading for each RO and store, and print summary table
+    """
+    storelist = ["none"] + options.stores.split(",")
+    print "%-24s%-10s%12s%10s%10s"%("RO", "store", "statements", "seconds", "MB")
+    for roname in options.ronames:
+        rodir = os.path.abspath(os.path.join(filebase, roname))
+        for store in storelist:
+            result = multiprocessing.Queue()
+            p = multiprocessing.Process(target=loadmemory, args=(rodir, store, result))
+            p.start()
+            (size, elapsed, maxrss) = result.get()
+            p.join()
+            print "%-24s%-10s%12d%10.2f%10.1f"%(roname, store, size, elapsed, maxrss)
+    return 0
+
+def parseCommandArgs(argv):
+    """
+    Parse command line arguments
+
+    argv -- argument list from command line
+
+    Returns options specified as returned by ArgumentParser.
+    """
+    parser = argparse.ArgumentParser(
+                description="Compare memory used by annotation graphs of synthetic ROs with different stores.",
+                epilog="Statement counts, elapsed times and peak memory are written to standard output.")
+    parser.add_argument('ronames', nargs='+', help="Names of research objects to load")
+    parser.add_argument('--version', action='version', version='%(prog)s '+VERSION)
+    parser.add_argument("-s", "--stores",
+                        dest="stores",
+                        default="default,compact",
+                        help="Comma-separated list of graph_store values.  Default: 'default,compact'.")
+    parser.add_argument("--debug",
+                        action="store_true",
+                        dest="debug",
+                        default=False,
+                        help="Run with full debug output enabled")
+    options = parser.parse_args(argv)
+    log.debug("Options: %s"%(repr(options)))
+    return options
+
+def runCommand(configbase, filebase, argv):
+    """
+    Run program with supplied configuration base directory, directory
+    containing the research objects, and arguments.
+
+    Returns exit status.
+    """
+    options = parseCommandArgs(argv[1:])
+    if not options or options.debug:
+        logging.basicConfig(level=logging.DEBUG)
+    log.debug("runCommand: configbase %s, filebase %s, argv %s"%(configbase, filebase, repr(argv)))
+    status = 1
+    if options:
+        progname = ro_utils.progname(argv)
+        status   = run(configbase, filebase, options, progname)
+    return status
+
+def runMain():
+    """
+    Main program transfer function
+    """
+    userhome = os.path.expanduser("~")
+    filebase = os.getcwd()
+    return runCommand(userhome, filebase, sys.argv)
+
+if __name__ == "__main__":
+    """
+    Program invoked from the command line.
+    """
+    status = runMain()
+    sys.exit(status)
+
@@ -0,0 +1,234 @@
+# ro_eval_incremental.py
+
+"""
+Saved checklist rule results, for incremental re-evaluation of a research object.
+
+The result of evaluating each checklist rule is saved in the RO metadata directory
+with the rule's dependencies, and a fingerprint of the RO annotations for each
+dependency.  A dependency is one of:
+
+    ('p', predicate)    the rule depends on statements using the predicate
+    ('c', class)        the rule depends on statements that resources are of the class
+
+When the RO is evaluated again against the same checklist, a rule whose dependency
+fingerprints are unchanged is not evaluated again, and the saved result is used.
+Rules whose dependencies cannot be determined (see ro_eval_minim.ruleDependencies)
+are always evaluated.
+
+Fingerprints are calculated from the matching statements in the RO annotation graph
+(which includes the manifest).  Blank node identifiers are not stable between reads
+of the RO, so blank nodes are not distinguished from each other in fingerprints.
+
+Saved results are written as JSON, with RDF terms, lists and dictionaries in rule
+result bindings represented as JSON objects (see _valueToJson).
+"""
+
+__author__      = "Graham Klyne (GK@ACM.ORG)"
+__copyright__   = "Copyright 2011-2013, University of Oxford"
+__license__     = "MIT (http://opensource.org/licenses/MIT)"
+
+import os
+import os.path
+import tempfile
+import hashlib
+import threading
+import logging
+try:
+    # Running Python 2.5 with simplejson?
+    import simplejson as json
+except ImportError:
+    import json
+
+log = logging.getLogger(__name__)
+
+import rdflib
+
+from rocommand import ro_settings
+from rocommand.ro_uriutils   import isFileUri, getFilenameFromUri
+from rocommand.ro_namespaces import RDF
+
+def _termKey(term):
+    if isinstance(term, rdflib.BNode):
+        return u"_:"
+    return term.n3()
+
+def _valueToJson(value):
+    """
+    Return JSON-serializable representation of a value in a saved rule result
+    """
+    if isinstance(value, rdflib.Literal):
+        return {"literal": unicode(value), "lang": value.language, "datatype": value.datatype}
+    if isinstance(value, rdflib.BNode):
+        return {"bnode": unicode(value)}
+    if isinstance(value, rdflib.URIRef):
+        return {"uri": unicode(value)}
+    if isinstance(value, (list, tuple)):
+        return {"list": map(_valueToJson, value)}
+    if isinstance(value, dict):
+        return {"dict": [ [k, _valueToJson(v)] for (k, v) in value.items() ]}
+    return value
+
+def _valueFromJson(value, listtype=list):
+    """
+    Return value in a saved rule result from value created by _valueToJson.  Lists
+    are returned as instances of 'listtype'.
+    """
+    if not isinstance(value, dict):
+        return value
+    if "literal" in value:
+        return rdflib.Literal(value["literal"], lang=value["lang"],
+                              datatype=value["datatype"] and rdflib.URIRef(value["datatype"]))
+    if "bnode" in value:
+        return rdflib.BNode(value["bnode"])
+    if "uri" in value:
+        return rdflib.URIRef(value["uri"])
+    if "list" in value:
+        return listtype( _valueFromJson(v, listtype) for v in value["list"] )
+    return dict( (str(k), _valueFromJson(v, listtype)) for (k, v) in value["dict"] )
+
+class EvaluationCache(object):
+    """
+    Saved rule results for evaluations of a local RO against a checklist
+    """
+
+    def __init__(self, rometa, checklist, listtype=list):
+        """
+        rometa      is an ro_metadata object for the RO being evaluated
+        checklist   is the ro_minim.MinimChecklist used for the evaluation.
+        listtype    is the type of lists in saved rule result bindings.
+        """
+        self.rometa       = rometa
+        self.minimuri     = unicode(checklist.minimuri)
+        self.validator    = checklist.validator
+        self.listtype     = listtype
+        self.filename     = os.path.join(getFilenameFromUri(rometa.getRoUri()),
+                                ro_settings.MANIFEST_DIR, ro_settings.EVALUATION_CACHE_FILE)
+        self.checklists   = {}
+        self.entries      = {}
+        self.fingerprints = {}
+        self.changed      = False
+        self._lock        = threading.Lock()
+        try:
+            with open(self.filename, "r") as cf:
+                cache = json.load(cf)
+            if cache.get("version") == ro_settings.EVALUATION_CACHE_VERSION:
+                self.checklists = cache["checklists"]
+                saved = self.checklists.get(self.minimuri)
+                if saved and _valueFromJson(saved["validator"], tuple) == self.validator:
+                    self.entries = dict( (k, self._entryFromJson(e))
+                                         for (k, e) in saved["entries"].items() )
+        except IOError:
+            pass
+        except Exception as e:
+            log.debug("EvaluationCache: unreadable cache: %s"%(repr(e)))
+            self.checklists = {}
+            self.entries    = {}
+        return
+
+    def _entryFromJson(self, entry):
+        fingerprints = dict( ((kind, _valueFromJson(term)), fp)
+                             for (kind, term, fp) in entry["fingerprints"] )
+        (satisfied, bindings, constraintbinding) = entry["result"]
+        return (fingerprints,
+            ( satisfied
+            , _valueFromJson(bindings, self.listtype)
+            , _valueFromJson(constraintbinding, self.listtype)
+            ))
+
+    def _entryToJson(self, entry):
+        (fingerprints, (satisfied, bindings, constraintbinding)) = entry
+        return (
+            { "fingerprints":   [ [kind, _valueToJson(term), fp]
+                                  for ((kind, term), fp) in fingerprints.items() ]
+            , "result":         [ satisfied
+                                , _valueToJson(bindings)
+                                , _valueToJson(constraintbinding)
+                                ]
+            })
+
+    def fingerprint(self, dependency):
+        """
+        Returns a fingerprint of the RO annotations that match a rule dependency
+        """
+        with self._lock:
+            if dependency in self.fingerprints:
+                return self.fingerprints[dependency]
+        (kind, term) = dependency
+        graph = self.rometa.getAnnotationGraph()
+        if kind == 'c':
+            stmts = graph.triples((None, RDF.type, term))
+        else:
+            stmts = graph.triples((None, term, None))
+        lines = sorted([ u" ".join(map(_termKey, stmt)) for stmt in stmts ])
+        fp    = hashlib.md5(u"\n".join(lines).encode("utf-8")).hexdigest()
+        with self._lock:
+            self.fingerprints[dependency] = fp
+        return fp
+
+    def lookup(self, key, dependencies):
+        """
+        Returns the saved (satisfied, bindings, constraintbinding) for a rule, or None
+        if there is no saved result or the RO annotations it depends on have changed.
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        (fingerprints, result) = entry
+        if set(fingerprints.keys()) != set(dependencies):
+            return None
+        for d in dependencies:
+            if self.fingerprint(d) != fingerprints[d]:
+                return None
+        return result
+
+    def save(self, key, dependencies, result):
+        """
+        Save result of evaluating a rule.  The result is written to the RO metadata
+        directory by 'write'.
+        """
+        fingerprints = dict( (d, self.fingerprint(d)) for d in dependencies )
+        with self._lock:
+            self.entries[key] = (fingerprints, result)
+            self.changed      = True
+        return
+
+    def write(self):
+        """
+        Write saved rule results to the RO metadata directory, if they have changed.
+        Failure to write the results is not an error.
+        """
+        if not self.changed or self.validator is None:
+            return
+        self.checklists[self.minimuri] = (
+            { "validator":  _valueToJson(self.validator)
+            , "entries":    dict( (k, self._entryToJson(e)) for (k, e) in self.entries.items() )
+            })
+        cache = (
+            { "version":    ro_settings.EVALUATION_CACHE_VERSION
+            , "checklists": self.checklists
+            })
+        try:
+            (fd, tempname) = tempfile.mkstemp(dir=os.path.dirname(self.filename),
+                                              prefix=ro_settings.EVALUATION_CACHE_FILE)
+            with os.fdopen(fd, "w") as cf:
+                json.dump(cache, cf)
+            os.rename(tempname, self.filename)
+        except (IOError, OSError, TypeError, ValueError) as e:
+            log.debug("EvaluationCache.write: %s"%(repr(e)))
+        self.changed = False
+        return
+
+def getEvaluationCache(rometa, checklist, listtype=list):
+    """
+    Returns an EvaluationCache for evaluating an RO against a checklist, or None if
+    incremental evaluation is not enabled by the "incremental_evaluation" configuration
+    value, or is not possible for the RO or checklist.  Lists in saved rule result
+    bindings are returned as instances of 'listtype'.
+    """
+    if not rometa.roconfig.get("incremental_evaluation", False):
+        return None
+    if not isFileUri(rometa.getRoUri()) or checklist.validator is None:
+        return None
+    return EvaluationCache(rometa, checklist, listtype)
+
+# End.
@@ -14,12 +14,24 @@ import sys
 #import urlparse
 import re
 import subprocess
+import threading
+import time
+import multiprocessing
+import multiprocessing.pool
 import logging
 import urllib
+import StringIO
+try:
+    # Running Python 2.5 with simplejson?
+    import simplejson as json
+except ImportError:
+    import json
 
 log = logging.getLogger(__name__)
 
 import rdflib
+import rdflib.plugins.sparql
+import rdflib.paths
 #import rdflib.namespace
 #from rdflib import URIRef, Namespace, BNode
 #from rdflib import Literal
@@ -28,33 +40,270 @@ try:
 except ImportError:
     import uritemplate
 
-from rocommand.ro_uriutils   import isLiveUri, resolveUri
+from rocommand.ro_uriutils   import resolveUri, resolveFileAsUri
+from rocommand               import ro_liveness
 from rocommand.ro_namespaces import RDF, RDFS, ORE, DCTERMS
 from rocommand.ro_metadata   import ro_metadata
 from rocommand.ro_prefixes   import make_sparql_prefixes
 import ro_minim
+import ro_eval_incremental
 from ro_minim import MINIM, RESULT
 
+# Prepared SPARQL queries, keyed by query text: see prepareQuery
+preparedQueryCache     = {}
+preparedQueryCacheLock = threading.Lock()
+PREPARED_QUERY_MAX     = 1000
+
+# Prepared SPARQL queries with constraint values, keyed by query text: see runBoundQuery
+boundQueryCache        = {}
+
+# The SPARQL parser is not safe for concurrent use, so queries are parsed under this lock
+sparqlParseLock        = threading.Lock()
+
+def prepareQuery(query, cache=True, querycache=None):
+    """
+    Returns a prepared (parsed and translated) form of the supplied SPARQL query, which
+    can be run against any RO with rometa.queryAnnotations.  Queries are prepared once
+    and then taken from preparedQueryCache, or from 'querycache' if supplied, unless
+    'cache' is False (used for queries that are not expected to be used again).
+
+    If the query cannot be prepared without reference to the graph queried, e.g. because
+    it uses a namespace prefix that is bound only in the RO annotations, the query text
+    is returned.
+    """
+    if querycache is None:
+        querycache = preparedQueryCache
+    with preparedQueryCacheLock:
+        prepared = querycache.get(query)
+    if prepared is None:
+        try:
+            with sparqlParseLock:
+                prepared = rdflib.plugins.sparql.prepareQuery(query)
+        except Exception as e:
+            log.debug("prepareQuery: query not prepared: %s"%(e))
+            prepared = query
+        if not cache:
+            return prepared
+        with preparedQueryCacheLock:
+            if len(querycache) >= PREPARED_QUERY_MAX:
+                querycache.clear()
+            querycache[query] = prepared
+    return prepared
+
+def runQuery(rometa, query, initBindings={}, cache=True, querycache=None):
+    """
+    Runs a SPARQL query over the RO annotations using a prepared query if possible
+    (see prepareQuery).  A query that cannot be prepared is parsed when it is run,
+    under sparqlParseLock.
+    """
+    prepared = prepareQuery(query, cache=cache, querycache=querycache)
+    if isinstance(prepared, basestring):
+        with sparqlParseLock:
+            result = rometa.queryAnnotations(prepared, initBindings=initBindings)
+    else:
+        result = rometa.queryAnnotations(prepared, initBindings=initBindings)
+    addStatistic('queries')
+    if isinstance(result, list):
+        addStatistic('rows', len(result))
+    return result
+
+# SPARQL variable references in query text
+queryVariableRef = re.compile(r"[?$]([A-Za-z0-9_]+)")
+
+# SPARQL query text that uses expressions: see runBoundQuery
+queryExpressionRef = re.compile(r"\b(FILTER|BIND)\b", re.IGNORECASE)
+
+def runBoundQuery(rometa, query, constraintbinding):
+    """
+    Runs a SPARQL query over the RO annotations, with the constraint binding values
+    (e.g. 'targetro' and 'targetres') bound to the variables used by the query, so
+    that the query matches only statements about the constraint target.  Each result
+    row includes the bound values, as if they had been matched by the query.
+
+    The values are supplied as initial bindings of the prepared query, so the query is
+    parsed once for all constraints.  rdflib does not make initial bindings visible to
+    FILTER and BIND expressions, so a query that uses them is run with the values in a
+    VALUES clause instead, and prepared once for each set of values (in boundQueryCache).
+    Values that cannot be given in a VALUES clause (e.g. blank nodes) are always
+    supplied as initial bindings.
+    """
+    names    = set(queryVariableRef.findall(query))
+    bindings = {}
+    for (k, v) in constraintbinding.items():
+        if k in names:
+            if not isinstance(v, rdflib.term.Identifier):
+                v = rdflib.Literal(v)
+            bindings[rdflib.Variable(k)] = v
+    if not bindings:
+        return runQuery(rometa, query)
+    result = None
+    if ( queryExpressionRef.search(query) and
+         not any( isinstance(v, rdflib.BNode) for v in bindings.values() ) ):
+        try:
+            (keys, vals) = zip(*bindings.items())
+            values = "\nVALUES (%s) { (%s) }\n"%(
+                " ".join([ k.n3() for k in keys ]), " ".join([ v.n3() for v in vals ]))
+            result = runQuery(rometa, query+values, querycache=boundQueryCache)
+        except Exception as e:
+            log.debug("runBoundQuery: using initial bindings: %s"%(repr(e)))
+    if result is None:
+        result = runQuery(rometa, query, initBindings=bindings)
+    if isinstance(result, list):
+        result = [ dict(row.items()+bindings.items()) for row in result ]
+    return result
+
+# Statistics for the requirement rule being evaluated by the current thread: see
+# evalRequirementStatistics
+ruleStatistics = threading.local()
+
+def addStatistic(name, count=1):
+    """
+    Add to a count in the statistics for the requirement rule being evaluated, if any
+    """
+    stats = getattr(ruleStatistics, 'current', None)
+    if stats is not None:
+        stats[name] += count
+    return
+
+# Software rule command outputs, keyed by command: see softwareCommandOutputs
+softwareOutputCache     = {}
+softwareOutputCacheLock = threading.Lock()
+
+def runSoftwareCommand(cmnd):
+    """
+    Run a software rule command, returning its output (including error output)
+    """
+    return unicode(subprocess.check_output(cmnd.split(), stderr=subprocess.STDOUT))
+
+def softwareCommandOutputs(cmnds, ttl=300, workers=4):
+    """
+    Returns a dictionary of the outputs of the supplied software rule commands.
+
+    Outputs are kept in softwareOutputCache, and used again if they were obtained
+    less than 'ttl' seconds ago, so that repeated evaluations do not run the commands
+    again.  Distinct commands that are not in
+    the cache are run concurrently.  If a command fails, its exception is raised.
+    """
+    now     = time.time()
+    outputs = {}
+    pending = []
+    with softwareOutputCacheLock:
+        for cmnd in set(cmnds):
+            cached = softwareOutputCache.get(cmnd)
+            if cached and cached[1] + ttl > now:
+                outputs[cmnd] = cached[0]
+            else:
+                pending.append(cmnd)
+    addStatistic('commands', len(pending))
+    if workers > 1 and len(pending) > 1:
+        pool = multiprocessing.pool.ThreadPool(min(workers, len(pending)))
+        try:
+            values = pool.map(runSoftwareCommand, pending)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        values = map(runSoftwareCommand, pending)
+    outputs.update(zip(pending, values))
+    with softwareOutputCacheLock:
+        for (cmnd, out) in zip(pending, values):
+            softwareOutputCache[cmnd] = (out, now)
+    return outputs
+
+EXISTS_ROW = rdflib.Variable("_existsrow")
+
+def existsBatchPattern(exists, bindings):
+    """
+    Returns a query pattern that matches the supplied minim:exists pattern for each of
+    a list of query result bindings, using a VALUES block of the bindings.  Variable
+    ?_existsrow is bound to the index of each binding for which the pattern matches.
+
+    Returns None if the bindings cannot be expressed in a VALUES block, which is the
+    case if any value is a blank node or has no N3 form.
+    """
+    keys = sorted(set( k for b in bindings for k in b ))
+    if not all( isinstance(k, rdflib.Variable) for k in keys ):
+        return None
+    rows = []
+    for (i, b) in enumerate(bindings):
+        vals = [ str(i) ]
+        for k in keys:
+            v = b.get(k)
+            if v is None:
+                vals.append("UNDEF")
+            elif isinstance(v, rdflib.BNode):
+                return None
+            else:
+                try:
+                    vals.append(v.n3())
+                except Exception as e:
+                    log.debug("existsBatchPattern: %s"%(repr(e)))
+                    return None
+        rows.append("(%s)"%(" ".join(vals)))
+    return ( "VALUES (%s)\n  { %s\n  }\n%s"%
+             (" ".join([ EXISTS_ROW.n3() ] + [ k.n3() for k in keys ]),
+              "\n    ".join(rows), exists) )
+
+def evalExistsBatch(rometa, makeQuery, exists, bindings):
+    """
+    Evaluate a minim:exists pattern for each of a list of query result bindings,
+    returning a list of True/False values corresponding to the bindings.
+
+    makeQuery   is a function that takes a query verb and query pattern, and returns
+                the text of a query to be run.
+
+    Where possible, a single query is used to test all the bindings, rather than
+    running an ASK query for each binding.  If the single query cannot be run (e.g.
+    because some value does not parse back from its N3 form), the bindings are
+    tested separately.
+    """
+    pattern = None
+    if len(bindings) > 1:
+        pattern = existsBatchPattern(exists, bindings)
+    if pattern is not None:
+        query = makeQuery("SELECT DISTINCT %s WHERE"%(EXISTS_ROW.n3()), pattern)
+        log.debug("evalExistsBatch: \nquery: %s"%(query))
+        try:
+            resp  = runQuery(rometa, query, cache=False)
+            found = set( int(r[EXISTS_ROW]) for r in resp )
+            return [ i in found for i in range(len(bindings)) ]
+        except Exception as e:
+            log.debug("evalExistsBatch: testing bindings separately: %s"%(repr(e)))
+    query = makeQuery("ASK", exists)
+    return [ runQuery(rometa, query, initBindings=b) for b in bindings ]
+
+iriref = re.compile(r"<([^<>\"{}|^`\\\x00-\x20]*)>")
+absuri = re.compile(r"[A-Za-z][A-Za-z0-9+.-]*:")
+
+def queryBase(rometa, query):
+    """
+    Returns a SPARQL BASE declaration for the RO if the supplied query contains
+    relative URI references, otherwise an empty string.  Queries that do not depend
+    on the RO URI are thus the same for all ROs, and can share a prepared query.
+    """
+    for uri in iriref.findall(query):
+        if not absuri.match(uri):
+            return "BASE <%s>\n"%(str(rometa.getRoUri()))
+    return ""
+
 def doQuery(rometa, queryPattern, queryVerb=None, resultMod="", queryPrefixes=None, initBindings=None):
     # @@TODO - factor out query construction from various places below to use this
     querytemplate = (make_sparql_prefixes(queryPrefixes or [])+
         """
-        BASE <%(querybase)s>
-
         %(queryverb)s
         {
           %(querypattern)s
         } %(resultmod)s
         """)
     queryparams = (
-        { 'querybase':    str(rometa.getRoUri())
-        , 'queryverb':    queryVerb or "SELECT * WHERE"
+        { 'queryverb':    queryVerb or "SELECT * WHERE"
         , 'querypattern': queryPattern
         , 'resultmod':    resultMod or ""
         })
     query = querytemplate%queryparams
+    query = queryBase(rometa, query) + query
     log.debug(" - doQuery: "+query)
-    resp  = rometa.queryAnnotations(query, initBindings=initBindings)
+    resp  = runQuery(rometa, query, initBindings=initBindings)
     return resp
 
 def getLabel(rometa, target):
@@ -79,7 +328,7 @@ def getIdLabel(rometa, target):
                   )
     return (targetid, targetlabel)
 
-def evaluate(rometa, minim, target, purpose):
+def evaluate(rometa, minim, target, purpose, detail="full", statistics=False):
     """
     Evaluate a RO against a minimum information model for a particular
     purpose with respect to a particular target resource.
@@ -92,6 +341,11 @@ def evaluate(rometa, minim, target, purpose):
                 performed.
     purpose     is a string that identifies a purpose w.r.t. the target for
                 which completeness will be evaluated.
+    detail      is the level of detail required from the evaluation: "summary",
+                "must", "should", "may" or "full" (see evalConstraint).
+    statistics  if True, the time taken to evaluate each requirement, and the numbers
+                of queries, result rows, liveness tests and software commands used,
+                are included in the result (see evalConstraint).
                 
     'target' and 'purpose' are ued together to select a particular minim Model
     that will be used for the evaluation.  For example, to evaluate whether an 
@@ -105,12 +359,15 @@ def evaluate(rometa, minim, target, purpose):
     The function returns a pair of values (minimgraph, evalresult)
     
     minimgraph is a copy of the minim graph on which the evaluation was based.
+    The minim description is read using ro_minim.getMinimChecklist, so a description
+    that has been used before is not read again unless it has changed.
     
     The evalresult indicates a summary and details of the analysis; e.g.
       { 'summary':        [MINIM.fullySatisfies, MINIM.nominallySatisfies, MINIM.minimallySatisfies]
       , 'missingMust':    []
       , 'missingShould':  []
       , 'missingMay':     []
+      , 'notEvaluated':   []
       , 'rouri':          rouri
       , 'roid':           roid
       , 'description':    rodesc
@@ -122,6 +379,41 @@ def evaluate(rometa, minim, target, purpose):
       , 'modeluri':       model['uri']
       }
     """
+    (minimgraph, evalresults) = evaluateTargets(rometa, minim, [(target, purpose)],
+        detail, statistics)
+    assert evalresults[0] != None, "Missing minim:Constraint for target %s, purpose %s"%(target, purpose)
+    return (minimgraph, evalresults[0])
+
+def evaluateTargets(rometa, minim, targetpurposes, detail="full", statistics=False):
+    """
+    Evaluate a RO against a minimum information model for each of a number of
+    target resources and purposes.
+
+    rometa      is an ro_metadata object used to access the RO being evaluated
+    minim       is a URI-reference (relative to the RO, or absolute) of the
+                minim description to be used.
+    targetpurposes
+                is a list of (target, purpose) pairs, each of which is interpreted
+                as the corresponding parameters of the evaluate function.
+    detail      is the level of detail required from each evaluation (see evaluate).
+    statistics  if True, requests statistics for each requirement evaluated (see
+                evaluate).  A rule shared by several constraints has statistics only in
+                the result for which it was evaluated.
+
+    Returns a pair (minimgraph, evalresults), where minimgraph is a copy of the
+    minim graph, and evalresults is a list containing an evaluation result (see
+    evaluate) for each supplied target and purpose, in the order supplied, or None
+    where the minim description has no constraint for the target and purpose.
+
+    The RO metadata and checklist are accessed once for all targets and purposes, and
+    a requirement rule whose evaluation does not depend on the target is evaluated
+    once, and its result used for all of the constraints that include it.
+
+    If the "incremental_evaluation" configuration value is set, the results of rule
+    evaluations for a local RO are saved in its metadata directory, and on subsequent
+    evaluations only rules that depend on RO annotations that have changed are
+    evaluated again (see ro_eval_incremental).
+    """
     # Locate the constraint model requirements
     rouri                   = rometa.getRoUri()
     (roid, rotitle)         = getIdLabel(rometa, rouri)    
@@ -136,66 +428,94 @@ def evaluate(rometa, minim, target, purpose):
     #                )
     rodesc       = rometa.getAnnotationValue(rouri, DCTERMS.description) or rotitle
     minimuri     = rometa.getComponentUri(minim)
-    minimgraph   = ro_minim.readMinimGraph(minimuri)
-    constraint   = ro_minim.getConstraint(minimgraph, rouri, target, purpose)
-    assert constraint != None, "Missing minim:Constraint for target %s, purpose %s"%(target, purpose)
+    checklist    = ro_minim.getMinimChecklist(minimuri)
+    constraints  = checklist.getConstraints(rouri, targetpurposes)
+    rulecache    = {}
+    evalcache    = ro_eval_incremental.getEvaluationCache(rometa, checklist, ValueList)
+    evalresults  = []
+    for ((target, purpose), constraint) in zip(targetpurposes, constraints):
+        if constraint == None:
+            evalresults.append(None)
+        else:
+            evalresults.append(evalConstraint(rometa, checklist, constraint, target, purpose,
+                { 'rouri': rouri, 'roid': roid, 'title': rotitle, 'description': rodesc
+                , 'minimuri': minimuri
+                }, rulecache, evalcache, detail, statistics))
+    if evalcache:
+        evalcache.write()
+    return (checklist.copyGraph(), evalresults)
+
+def evalConstraint(rometa, checklist, constraint, target, purpose, rodetails, rulecache,
+        evalcache=None, detail="full", statistics=False):
+    """
+    Evaluate RO against the model of a checklist constraint, and return the
+    evaluation result (see evaluate).
+
+    rodetails   is a dictionary of RO and checklist details included in the result.
+    rulecache   is a dictionary in which results of rule evaluations are saved for use
+                by other constraints evaluated for the same RO (see evalRequirements).
+    evalcache   is None, or an EvaluationCache of rule results from previous evaluations.
+    detail      is the level of detail required: "full" or "may" to evaluate all
+                requirements, "should" or "must" to evaluate only requirements up to
+                that level and as much of the rest as is needed to determine the
+                summary result, or "summary" for just the summary result.
+    statistics  if True, statistics of the work done to evaluate each requirement are
+                included in the result as 'statistics', a list of (requirement, stats)
+                for the requirements evaluated (see evalRequirementStatistics).
+
+    Unless all requirements are evaluated, requirements are evaluated a level at a
+    time, starting with MUST.  Evaluation of a level whose unsatisfied requirements
+    are not required to be reported stops at the first unsatisfied requirement, and
+    once a level is unsatisfied, lower levels that are not required to be reported
+    are not evaluated.  Requirements not evaluated are listed in the result as
+    'notEvaluated', and do not affect the summary result.
+    """
     (targetid, targetlabel) = getIdLabel(rometa, constraint['targetres_actual'])
     cbindings    = { 'targetro':    constraint['targetro_actual']
                    , 'targetres':   constraint['targetres_actual']
                    , 'targetid':    targetid
                    , 'targetlabel': targetlabel
                    }
-    model        = ro_minim.getModel(minimgraph, constraint['model'])
+    model        = checklist.getModel(constraint['model'])
     assert model != None, "Missing minim:Model for target %s, purpose %s"%(target, purpose)
-    requirements = ro_minim.getRequirements(minimgraph, model['uri'])
+    requirements = checklist.getRequirements(model['uri'])
     # Evaluate the individual model requirements
-    reqeval = []
     # requirements = [] # SHORT_CIRCUIT ACTUAL EVALUATION FOR BENCHMARKING
-    for r in requirements:
-        if 'datarule' in r:
-            # @@TODO: factor to separate function?
-            #         (This is a deprecated form, as it locks the rule to a particular resource)
-            satisfied = rometa.roManifestContains( (rouri, ORE.aggregates, r['datarule']['aggregates']) )
-            reqeval.append((r,satisfied,{}))
-            log.debug("- %s: %s"%(repr((rouri, ORE.aggregates, r['datarule']['aggregates'])), satisfied))
-        elif 'softwarerule' in r:
-            # @@TODO: factor to separate function
-            cmnd = r['softwarerule']['command']
-            resp = r['softwarerule']['response']
-            log.debug("softwarerule: %s -> %s"%(cmnd,resp))
-            out = unicode(subprocess.check_output(cmnd.split(), stderr=subprocess.STDOUT))
-            exp = re.compile(resp)
-            satisfied = exp.match(out)
-            reqeval.append((r,satisfied,{}))
-            log.debug("- Software %s: response %s,  satisfied %s"%
-                      (cmnd, resp, "OK" if satisfied else "Fail"))
-        elif 'contentmatchrule' in r:
-            (satisfied, bindings) = evalContentMatch(rometa, r['contentmatchrule'], cbindings)
-            reqeval.append((r,satisfied,bindings))
-            log.debug("- ContentMatch: rule %s, bindings %s, satisfied %s"%
-                        (repr(r['contentmatchrule']), repr(bindings), "OK" if satisfied else "Fail"))
-        elif 'querytestrule' in r:
-            (satisfied, bindings, msg) = evalQueryTest(rometa, r['querytestrule'], cbindings)
-            reqeval.append((r,satisfied,bindings))
-            log.debug("- QueryTest: rule %s, bindings %s, satisfied %s"%
-                        (repr(r['querytestrule']), repr(bindings), "OK" if satisfied else "Fail"))
-        else:
-            raise ValueError("Unrecognized requirement rule: %s"%repr(r.keys()))
-        log.info("evaluate: [%s] %s %s (%s)"%
-                     (r['seq'][:10], r['level'], str(r['ruleuri']), 
-                      "pass" if satisfied else "fail"))
+    reqstats = {} if statistics else None
+    if detail in ["full", "may"]:
+        reqeval = evalRequirements(rometa, requirements, cbindings,
+            rulecache=rulecache, evalcache=evalcache, statistics=reqstats)
+    else:
+        reqeval   = []
+        satisfied = True
+        for level in REQUIREMENT_LEVELS:
+            levelreqs  = [ r for r in requirements if r['level'] == level ]
+            reportfail = level in DETAIL_LEVELS[detail]
+            if satisfied or reportfail:
+                levelevals = evalRequirements(rometa, levelreqs, cbindings,
+                    rulecache=rulecache, evalcache=evalcache, stoponfail=not reportfail,
+                    statistics=reqstats)
+                satisfied  = satisfied and not any(
+                    s is not None and not s for (_r, s, _b) in levelevals )
+            else:
+                levelevals = [ (r, None, cbindings.copy()) for r in levelreqs ]
+            reqeval.extend(levelevals)
+        # Restore checklist order of requirements
+        order = dict( (id(r), i) for (i, r) in enumerate(requirements) )
+        reqeval.sort(key=lambda (r, _s, _b): order[id(r)])
     # Evaluate overall satisfaction of model
     eval_result = (
         { 'summary':        []
         , 'missingMust':    []
         , 'missingShould':  []
         , 'missingMay':     []
+        , 'notEvaluated':   []
         , 'satisfied':      []
-        , 'rouri':          rouri
-        , 'roid':           roid
-        , 'title':          rotitle
-        , 'description':    rodesc
-        , 'minimuri':       minimuri
+        , 'rouri':          rodetails['rouri']
+        , 'roid':           rodetails['roid']
+        , 'title':          rodetails['title']
+        , 'description':    rodetails['description']
+        , 'minimuri':       rodetails['minimuri']
         , 'target':         target
         , 'targetid':       targetid
         , 'targetlabel':    targetlabel
@@ -211,7 +531,9 @@ def evaluate(rometa, minim, target, purpose):
         , 'MAY':    MINIM.fullySatisfies
         })
     for (r, satisfied, binding) in reqeval:
-        if satisfied:
+        if satisfied is None:
+            eval_result['notEvaluated'].append((r, binding))
+        elif satisfied:
             eval_result['satisfied'].append((r, binding))
         else:
             if r['level'] == "MUST":
@@ -227,7 +549,406 @@ def evaluate(rometa, minim, target, purpose):
                 eval_result['missingMay'].append((r, binding))
                 sat_levels['MAY'] = None
     eval_result['summary'] = [ sat_levels[k] for k in sat_levels if sat_levels[k] ]
-    return (minimgraph, eval_result)
+    if statistics:
+        eval_result['statistics'] = [ (r, reqstats[r['uri']])
+                                      for r in requirements if r['uri'] in reqstats ]
+    return eval_result
+
+RULE_TYPES = ['datarule', 'softwarerule', 'contentmatchrule', 'querytestrule']
+
+REQUIREMENT_LEVELS = ["MUST", "SHOULD", "MAY"]
+
+# Requirement levels whose unsatisfied requirements are reported for each level of detail
+DETAIL_LEVELS = (
+    { "summary":    []
+    , "must":       ["MUST"]
+    , "should":     ["MUST", "SHOULD"]
+    , "may":        ["MUST", "SHOULD", "MAY"]
+    , "full":       ["MUST", "SHOULD", "MAY"]
+    })
+
+# References to variables in rule text: SPARQL variables (?var, $var), message
+# formats (%(var)s) and URI template expressions ({var}, {+var,other:3*}, etc.)
+ruleVariableRef = re.compile(
+    r"[?$]([A-Za-z0-9_]+)|%\(([^)]*)\)|\{[+#./;?&=,!@|]?([^{}]*)\}")
+
+def ruleVariables(r):
+    """
+    Returns a set of the names of variables referred to by the rule of a requirement
+    """
+    names = set()
+    for t in RULE_TYPES:
+        for v in (r[t].values() if t in r else []):
+            if not isinstance(v, basestring): continue
+            for (var, fmt, tmpl) in ruleVariableRef.findall(v):
+                names.update([var, fmt])
+                names.update( re.sub(r"(:[0-9]+|\*)$", "", n.strip())
+                              for n in tmpl.split(",") )
+    return names
+
+def ruleCacheKey(r, constraintbinding):
+    """
+    Returns a key for saving the result of evaluating the rule of a requirement with
+    the supplied constraint bindings.  Only bindings that are referred to by the rule
+    are used in the key, so a rule that does not refer to the target resource has the
+    same key for all targets.  (Bindings echoed in the result of a rule evaluated
+    for another target are replaced by evalRequirements.)
+    """
+    names = ruleVariables(r)
+    used  = [ (k, unicode(constraintbinding[k]))
+              for k in sorted(constraintbinding) if k in names ]
+    return (r['ruleuri'], tuple(used))
+
+def ruleDependencies(rometa, r):
+    """
+    Returns a set of the RO annotations on which the result of evaluating the rule of
+    a requirement depends, for use with ro_eval_incremental.EvaluationCache, or None
+    if the dependencies cannot be determined.  Each dependency is ('p', predicate)
+    or ('c', class) (see ro_eval_incremental).
+
+    Rules that test the accessibility of resources or the local software environment
+    depend on more than the RO annotations, and so return None, as do rules whose
+    queries use a variable predicate.
+    """
+    if 'datarule' in r:
+        return frozenset([('p', ORE.aggregates)])
+    if 'contentmatchrule' in r:
+        rule     = r['contentmatchrule']
+        prefixes = make_sparql_prefixes()
+        patterns = [rule['forall'], rule['exists']]
+        volatile = rule['islive']
+        aggregates = rule['template']
+    elif 'querytestrule' in r:
+        rule     = r['querytestrule']
+        prefixes = make_sparql_prefixes(rule['prefixes'])
+        patterns = [rule['query'], rule['exists']]
+        volatile = rule['islive_t']
+        aggregates = rule['aggregates_t']
+    else:
+        return None
+    if volatile:
+        return None
+    deps = set()
+    if aggregates:
+        deps.add(('p', ORE.aggregates))
+    for pattern in patterns:
+        if not pattern: continue
+        query    = prefixes + "SELECT * WHERE {\n" + pattern + "\n}"
+        prepared = prepareQuery(queryBase(rometa, query) + query)
+        if isinstance(prepared, basestring):
+            return None
+        if not addQueryDependencies(deps, prepared.algebra):
+            return None
+    return frozenset(deps)
+
+def addQueryDependencies(deps, algebra):
+    """
+    Adds the dependencies of the triple patterns in a SPARQL query algebra expression
+    to the supplied set, returning False if a pattern has a variable predicate.
+    """
+    if isinstance(algebra, dict):
+        for (k, v) in algebra.items():
+            if k == 'triples':
+                for (_s, p, o) in v:
+                    if not addPredicateDependencies(deps, p, o):
+                        return False
+            elif not addQueryDependencies(deps, v):
+                return False
+    elif isinstance(algebra, list):
+        for v in algebra:
+            if not addQueryDependencies(deps, v):
+                return False
+    return True
+
+def addPredicateDependencies(deps, p, o=None):
+    if isinstance(p, rdflib.paths.NegatedPath):
+        return False
+    if isinstance(p, rdflib.paths.Path):
+        for a in getattr(p, 'args', None) or [getattr(p, 'arg', None) or p.path]:
+            if not addPredicateDependencies(deps, a):
+                return False
+    elif not isinstance(p, rdflib.URIRef):
+        return False
+    elif p == RDF.type and isinstance(o, rdflib.URIRef):
+        deps.add(('c', o))
+    else:
+        deps.add(('p', p))
+    return True
+
+def evalRequirements(rometa, requirements, constraintbinding, workers=None, rulecache=None,
+        evalcache=None, stoponfail=False, statistics=None):
+    """
+    Evaluate a list of model requirements, returning a list of
+    (requirement, satisfied, bindings) in the same order as the requirements.
+
+    rulecache   if supplied, is a dictionary of rule evaluation results, keyed by
+                ruleCacheKey.  Rules with results in the cache are not evaluated
+                again, and the results of rules that are evaluated are added to it.
+    evalcache   if supplied, is an ro_eval_incremental.EvaluationCache of results from
+                a previous evaluation of the RO.  A rule whose dependencies (see
+                ruleDependencies) are unchanged since then is not evaluated again.
+    stoponfail  if True, evaluation stops when an unsatisfied requirement is found.
+                Requirements are then evaluated in batches of 'workers' at a time, and
+                those not evaluated are returned with None for 'satisfied'.
+    statistics  if supplied, is a dictionary to which a dictionary of statistics is
+                added for each requirement evaluated, keyed by requirement URI (see
+                evalRequirementStatistics).  Requirements are then evaluated one at
+                a time, and software rule commands are run by the rules that use them
+                rather than all together beforehand, so that the time for a rule does
+                not include time spent waiting for other rules.
+
+    Requirements are independent of each other, so they are evaluated by a pool of
+    threads, the size of which is given by the "evaluation_workers" configuration
+    value if not supplied.  This allows liveness probes and software rule commands
+    for different requirements to proceed at the same time.
+
+    The distinct software rule commands used are run first, at the same time, and
+    their outputs cached for the number of seconds given by the "software_rule_ttl"
+    configuration value.
+    """
+    if workers is None:
+        workers = int(rometa.roconfig.get("evaluation_workers", 4))
+    if statistics is not None:
+        workers = 1
+    # Load the RO annotations before starting the workers, which then only read them
+    rometa.getAnnotationGraph()
+    softwarettl = float(rometa.roconfig.get("software_rule_ttl", 300))
+    if softwarettl > 0 and statistics is None:
+        softwareCommandOutputs(
+            [ r['softwarerule']['command'] for r in requirements if 'softwarerule' in r ],
+            ttl=softwarettl, workers=workers)
+    if rulecache is None:
+        rulecache = {}
+    keys    = [ ruleCacheKey(r, constraintbinding) for r in requirements ]
+    pending = []
+    persist = {}
+    for (r, key) in zip(requirements, keys):
+        if key in rulecache or key in persist:
+            continue
+        persist[key] = None
+        if evalcache and not isinstance(r['uri'], rdflib.BNode):
+            # Saved results are keyed by requirement, as rule nodes are often blank
+            persist[key] = (unicode(r['uri'])+u" "+repr(key[1]), ruleDependencies(rometa, r))
+            if persist[key][1] is not None:
+                saved = evalcache.lookup(*persist[key])
+                if saved is not None:
+                    rulecache[key] = saved
+                    continue
+        pending.append((r, key))
+    if statistics is None:
+        evalone = lambda (r, key): evalRequirement(rometa, r, constraintbinding)
+    else:
+        def evalone((r, key)):
+            (satisfied, bindings, stats) = evalRequirementStatistics(rometa, r, constraintbinding)
+            statistics[r['uri']] = stats
+            return (satisfied, bindings)
+    batchsize = max(workers, 1) if stoponfail else max(len(pending), 1)
+    failed    = stoponfail and any( not rulecache[k][0] for k in keys if k in rulecache )
+    pool      = None
+    if workers > 1 and len(pending) > 1:
+        pool = multiprocessing.pool.ThreadPool(min(workers, len(pending)))
+    try:
+        for start in range(0, len(pending), batchsize):
+            if failed: break
+            batch   = pending[start:start+batchsize]
+            results = pool.map(evalone, batch) if pool else map(evalone, batch)
+            for ((r, key), (satisfied, bindings)) in zip(batch, results):
+                rulecache[key] = (satisfied, bindings, constraintbinding)
+                if evalcache and persist[key] and persist[key][1] is not None:
+                    evalcache.save(persist[key][0], persist[key][1],
+                                   (bool(satisfied), bindings, constraintbinding))
+                failed = failed or (stoponfail and not satisfied)
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    reqeval = []
+    for (r, key) in zip(requirements, keys):
+        if key not in rulecache:
+            reqeval.append((r, None, constraintbinding.copy()))
+            log.info("evaluate: [%s] %s %s (not evaluated)"%
+                         (r['seq'][:10], r['level'], str(r['ruleuri'])))
+            continue
+        (satisfied, bindings, usedbinding) = rulecache[key]
+        if usedbinding != constraintbinding:
+            # Result saved for another constraint: show this constraint's bindings
+            bindings = dict(bindings)
+            for k in constraintbinding:
+                if k in bindings and bindings[k] == usedbinding.get(k):
+                    bindings[k] = constraintbinding[k]
+        reqeval.append((r, satisfied, bindings))
+        log.info("evaluate: [%s] %s %s (%s)"%
+                     (r['seq'][:10], r['level'], str(r['ruleuri']), 
+                      "pass" if satisfied else "fail"))
+    return reqeval
+
+def evalRequirementStatistics(rometa, r, constraintbinding):
+    """
+    Evaluate a single model requirement, returning (satisfied, bindings, statistics),
+    where statistics is a dictionary of:
+
+    'time'      elapsed time taken to evaluate the requirement, in seconds
+    'queries'   number of SPARQL queries run
+    'rows'      number of result rows returned by SELECT queries
+    'liveness'  number of URIs tested for liveness (including cached results)
+    'commands'  number of software rule commands run (excluding cached outputs)
+    """
+    stats = { 'time': 0.0, 'queries': 0, 'rows': 0, 'liveness': 0, 'commands': 0 }
+    ruleStatistics.current = stats
+    start = time.time()
+    try:
+        (satisfied, bindings) = evalRequirement(rometa, r, constraintbinding)
+    finally:
+        stats['time'] = time.time() - start
+        ruleStatistics.current = None
+    return (satisfied, bindings, stats)
+
+def evalRequirement(rometa, r, constraintbinding):
+    """
+    Evaluate a single model requirement, returning a pair (satisfied, bindings)
+    """
+    rouri = rometa.getRoUri()
+    if 'datarule' in r:
+        # @@TODO: factor to separate function?
+        #         (This is a deprecated form, as it locks the rule to a particular resource)
+        satisfied = rometa.roManifestContains( (rouri, ORE.aggregates, r['datarule']['aggregates']) )
+        bindings  = {}
+        log.debug("- %s: %s"%(repr((rouri, ORE.aggregates, r['datarule']['aggregates'])), satisfied))
+    elif 'softwarerule' in r:
+        # @@TODO: factor to separate function
+        cmnd = r['softwarerule']['command']
+        resp = r['softwarerule']['response']
+        log.debug("softwarerule: %s -> %s"%(cmnd,resp))
+        softwarettl = float(rometa.roconfig.get("software_rule_ttl", 300))
+        out = softwareCommandOutputs([cmnd], ttl=softwarettl)[cmnd]
+        exp = re.compile(resp)
+        satisfied = exp.match(out) is not None
+        bindings  = {}
+        log.debug("- Software %s: response %s,  satisfied %s"%
+                  (cmnd, resp, "OK" if satisfied else "Fail"))
+    elif 'contentmatchrule' in r:
+        (satisfied, bindings) = evalContentMatch(rometa, r['contentmatchrule'], constraintbinding)
+        log.debug("- ContentMatch: rule %s, bindings %s, satisfied %s"%
+                    (repr(r['contentmatchrule']), repr(bindings), "OK" if satisfied else "Fail"))
+    elif 'querytestrule' in r:
+        (satisfied, bindings, msg) = evalQueryTest(rometa, r['querytestrule'], constraintbinding)
+        log.debug("- QueryTest: rule %s, bindings %s, satisfied %s"%
+                    (repr(r['querytestrule']), repr(bindings), "OK" if satisfied else "Fail"))
+    else:
+        raise ValueError("Unrecognized requirement rule: %s"%repr(r.keys()))
+    return (satisfied, bindings)
+
+def resultBinding(constraintbinding, binding, count, valuetype=unicode):
+    """
+    Returns the simple (string-valued) variable bindings for a query result, combined
+    with the constraint bindings, as used for expanding URI templates and messages.
+    """
+    simplebinding = constraintbinding.copy()
+    for k in binding:
+        if not isinstance(k,rdflib.BNode):
+            simplebinding[str(k)]   = valuetype(binding[k])
+            simplebinding['_count'] = count
+    return simplebinding
+
+def evaluateBulk(roconfig, rorefs, minim, target, purpose, report, workers=None, detail="full"):
+    """
+    Evaluate a number of ROs against a minim description for the same target
+    and purpose.  This is a generator that yields a triple (roref, output, error)
+    for each RO reference supplied, in the order supplied:
+
+    roref       is the supplied RO reference.
+    output      is the evaluation report for the RO, or None if evaluation failed.
+    error       is a message describing an evaluation failure, or None.
+
+    roconfig    is the research object manager configuration, used for each RO.
+    rorefs      is an iterable of RO references (directories or URIs).
+    minim       is a URI-reference of the minim description, which is resolved
+                against the current directory (not against each RO).
+    target      is a URI-reference of the target resource, resolved against each RO.
+    purpose     is the purpose for which each RO is evaluated.
+    report      is a function that is applied to the (minimgraph, evalresult) result
+                of evaluate, and returns a report string.  It is called in a worker
+                process, so must be a module-level function or functools.partial
+                applied to one: see reportJson, reportText and reportRdf.
+    workers     is the number of worker processes used, by default the
+                "bulk_evaluation_workers" configuration value, or the number of CPUs.
+    detail      is the level of detail required from each evaluation (see evaluate).
+
+    The minim description is read before the worker processes are started, so each
+    worker inherits it, and the queries it uses are prepared once in each worker.
+    A failure to evaluate an RO is reported for that RO, and does not affect others.
+    """
+    if workers is None:
+        workers = int(roconfig.get("bulk_evaluation_workers", multiprocessing.cpu_count()))
+    minimuri = resolveFileAsUri(minim)
+    ro_minim.getMinimChecklist(rdflib.URIRef(minimuri))
+    tasks = ( (roref, roconfig, minimuri, target, purpose, report, detail) for roref in rorefs )
+    if workers > 1:
+        pool = multiprocessing.Pool(workers)
+        try:
+            for result in pool.imap(evaluateBulkItem, tasks):
+                yield result
+        finally:
+            pool.terminate()
+            pool.join()
+    else:
+        for task in tasks:
+            yield evaluateBulkItem(task)
+    return
+
+def evaluateBulkItem((roref, roconfig, minimuri, target, purpose, report, detail)):
+    """
+    Evaluate a single RO for evaluateBulk, returning (roref, output, error).
+    """
+    try:
+        rometa = ro_metadata(roconfig, roref)
+        (minimgraph, evalresult) = evaluate(rometa, minimuri, target, purpose, detail)
+        return (roref, report(minimgraph, evalresult), None)
+    except Exception as e:
+        log.debug("evaluateBulkItem: %s"%(roref), exc_info=True)
+        return (roref, None, "%s: %s"%(e.__class__.__name__, e))
+
+def evalResultJson(eval_result):
+    """
+    Returns a JSON-serializable summary of an evaluation result, with the
+    satisfied and unsatisfied requirements shown as report messages.
+    """
+    result = dict(
+        [ (k, unicode(eval_result[k]))
+          for k in ['rouri', 'roid', 'title', 'minimuri', 'target', 'targetid', 'purpose', 'modeluri'] ])
+    result['level']   = evalSummaryText(eval_result)
+    result['summary'] = [ unicode(s) for s in eval_result['summary'] ]
+    for k in ['missingMust', 'missingShould', 'missingMay']:
+        result[k] = [ formatRule(False, *m) for m in eval_result[k] ]
+    result['satisfied'] = [ formatRule(True, *m) for m in eval_result['satisfied'] ]
+    if eval_result.get('notEvaluated'):
+        result['notEvaluated'] = [ requirementText(r) for (r, _b) in eval_result['notEvaluated'] ]
+    if 'statistics' in eval_result:
+        result['statistics'] = [ dict(stats, requirement=unicode(r['uri']))
+                                 for (r, stats) in eval_result['statistics'] ]
+    return result
+
+def reportJson(minimgraph, eval_result):
+    """
+    evaluateBulk report function: returns a line of JSON summarizing the result
+    """
+    return json.dumps(evalResultJson(eval_result), sort_keys=True)+"\n"
+
+def reportText(detail, minimgraph, eval_result):
+    """
+    evaluateBulk report function: returns a text report with the indicated level
+    of detail (use functools.partial to supply the detail level)
+    """
+    ostr = StringIO.StringIO()
+    format(eval_result, { 'detail': detail }, ostr)
+    return ostr.getvalue()
+
+def reportRdf(rdfformat, minimgraph, eval_result):
+    """
+    evaluateBulk report function: returns an RDF serialization of the result in the
+    indicated format (use functools.partial to supply the format)
+    """
+    return evalResultGraph(minimgraph, eval_result).serialize(format=rdfformat)
 
 def evalContentMatch(rometa, rule, constraintbinding):
     """
@@ -265,14 +986,29 @@ def evalContentMatch(rometa, rule, constraintbinding):
             })
         query = querytemplate%queryparams
         log.debug(" - forall query: "+query)
-        ### @@TODO: Why is this failing?
-        # resp  = rometa.queryAnnotations(query, initBindings=constraintbinding)
-        resp  = rometa.queryAnnotations(query)
+        resp  = runBoundQuery(rometa, query, constraintbinding)
         log.debug(" - forall resp: "+repr(resp))
         simplebinding['_count'] = len(resp)
         if len(resp) == 0 and rule['showmiss']:
             satisfied = False
-        for binding in resp:
+        if islive:
+            # Check liveness of URIs for all query results together
+            livechecker = ro_liveness.getLiveUriChecker(rometa.roconfig)
+            addStatistic('liveness', len(resp))
+            liveuris    = livechecker.checkUris(
+                [ rometa.getComponentUri(uritemplate.expand(islive,
+                    resultBinding(constraintbinding, binding, len(resp), str)))
+                  for binding in resp ])
+        if exists:
+            # Test existence query against all forall results together
+            def makeQuery(queryverb, querypattern):
+                return querytemplate%(
+                    { 'queryverb':    queryverb
+                    , 'querypattern': querypattern
+                    , 'queryorder':   ""
+                    })
+            existsresults = evalExistsBatch(rometa, makeQuery, exists, resp)
+        for (i, binding) in enumerate(resp):
             satisfied = False
             # Extract keys and values from query result to return with result
             simplebinding = constraintbinding.copy()
@@ -292,15 +1028,9 @@ def evalContentMatch(rometa, rule, constraintbinding):
                         ### assert False, "Aborted"
             if exists:
                 # existence query against forall results
-                existsparams = (
-                    { 'queryverb': "ASK"
-                    , 'querypattern': exists
-                    , 'queryorder':   ""
-                    })
-                query = querytemplate%existsparams
-                log.debug("evalContentMatch RO test exists: \nquery: %s \nbinding: %s"%
-                          (query, repr(binding)))
-                satisfied = rometa.queryAnnotations(query,initBindings=binding)
+                log.debug("evalContentMatch RO test exists: \npattern: %s \nbinding: %s"%
+                          (exists, repr(binding)))
+                satisfied = existsresults[i]
             if template:
                 # Construct URI for file from template
                 # Uses code copied from http://code.google.com/p/uri-templates
@@ -316,7 +1046,7 @@ def evalContentMatch(rometa, rule, constraintbinding):
                 fileuri = rometa.getComponentUri(fileref)
                 # Test if URI is live (accessible)
                 log.debug("evalContentMatch RO islive %s (%s)"%(fileref, str(fileuri)))
-                satisfied = isLiveUri(fileuri)
+                satisfied = liveuris[fileuri]
             log.debug("evalContentMatch (forall) RO satisfied %s"%(satisfied))
             if not satisfied: break
     elif rule['exists']:
@@ -327,7 +1057,7 @@ def evalContentMatch(rometa, rule, constraintbinding):
             })
         query = querytemplate%queryparams
         log.debug("- query %s"%(query))
-        satisfied = rometa.queryAnnotations(query)
+        satisfied = runBoundQuery(rometa, query, constraintbinding)
         log.debug("- satisfied %s"%(satisfied))
     else:
         raise ValueError("Unrecognized content match rule: %s"%repr(rule))
@@ -365,8 +1095,6 @@ def evalQueryTest(rometa, rule, constraintbinding):
     log.debug("evalQueryTest: rule: \n----\n  %s, \n----\nconstraintbinding:\n  %s\n----"%(repr(rule), repr(constraintbinding)))
     querytemplate = (make_sparql_prefixes(rule['prefixes'])+
         """
-        BASE <%(querybase)s>
-
         %(queryverb)s
         {
           %(querypattern)s
@@ -376,6 +1104,8 @@ def evalQueryTest(rometa, rule, constraintbinding):
     simplebinding = constraintbinding.copy()
     if rule['exists'] and not rule['query']:
         # Bare "exists" is syntactic sugar for "query" with "min=1"
+        # (rule is shared by the checklist cache, so a copy is updated)
+        rule = dict(rule)
         rule['query']  = rule['exists']
         rule['exists'] = None
         rule['min']    = rule['min'] or 1
@@ -394,28 +1124,43 @@ def evalQueryTest(rometa, rule, constraintbinding):
         if aggregates:  aggregates = str(aggregates).strip()
         if islive:      islive   = str(islive).strip()
         queryparams = (
-            { 'querybase':    str(rometa.getRoUri())
-            , 'queryverb':    "SELECT DISTINCT * WHERE"
+            { 'queryverb':    "SELECT DISTINCT * WHERE"
             , 'querypattern': rule['query']
             , 'resultmod':    rule['resultmod'] or ""
             })
         query = querytemplate%queryparams
+        query = queryBase(rometa, query) + query
         log.debug(" - QueryTest: "+query)
-        resp  = rometa.queryAnnotations(query, initBindings=constraintbinding)
+        resp  = runQuery(rometa, query, initBindings=constraintbinding)
         log.debug(" - QueryTest resp: "+repr(resp))
         simplebinding['_count'] = len(resp)
         satisfied_count  = 0
         total_count      = len(resp)
         result_list      = []
         failure_message_template = rule['showfail'] or rule['show']
-        for binding in resp:
+        if islive:
+            # Check liveness of URIs for all query results together
+            livechecker = ro_liveness.getLiveUriChecker(rometa.roconfig)
+            addStatistic('liveness', len(resp))
+            liveuris    = livechecker.checkUris(
+                [ rometa.getComponentUri(uritemplate.expand(islive,
+                    resultBinding(constraintbinding, binding, len(resp))))
+                  for binding in resp ])
+        if exists:
+            # Test existence query against all query results together
+            def makeQuery(queryverb, querypattern):
+                query = querytemplate%(
+                    { 'queryverb':    queryverb
+                    , 'querypattern': querypattern
+                    , 'resultmod':    ""
+                    })
+                return queryBase(rometa, query) + query
+            existsquery   = makeQuery("ASK", exists)
+            existsresults = evalExistsBatch(rometa, makeQuery, exists, resp)
+        for (i, binding) in enumerate(resp):
             satisfied = True
             failmsg   = failure_message_template
-            simplebinding = constraintbinding.copy()
-            for k in binding:
-                if not isinstance(k,rdflib.BNode):
-                    simplebinding[str(k)]   = unicode(binding[k])
-                    simplebinding['_count'] = len(resp)
+            simplebinding = resultBinding(constraintbinding, binding, len(resp))
             # Do the required test
             if aggregates:
                 fileref   = uritemplate.expand(aggregates, simplebinding)
@@ -429,20 +1174,13 @@ def evalQueryTest(rometa, rule, constraintbinding):
                 fileuri   = rometa.getComponentUri(fileref)
                 simplebinding.update({'_fileref': fileref, '_fileuri': fileuri})
                 log.debug("evalQueryTest RO isLive %s (%s)"%(fileref, str(fileuri)))
-                satisfied = isLiveUri(fileuri)
+                satisfied = liveuris[fileuri]
                 failmsg   = failmsg or "Accessible %(_fileref)s"
             if exists:
-                existsparams = (
-                    { 'querybase':    str(rometa.getRoUri())
-                    , 'queryverb':    "ASK"
-                    , 'querypattern': exists
-                    , 'resultmod':    ""
-                    })
-                query = querytemplate%existsparams
-                simplebinding.update({'_pattern': exists, '_query': query})
+                simplebinding.update({'_pattern': exists, '_query': existsquery})
                 log.debug("evalContentMatch RO test exists: \nquery: %s \nbinding: %s"%
-                          (query, repr(binding)))
-                satisfied = rometa.queryAnnotations(query,initBindings=binding)
+                          (existsquery, repr(binding)))
+                satisfied = existsresults[i]
                 failmsg   = failmsg or "Exists %(_fileref)s"
             # Test done, defines: satisfied, failmsg, simplebinding 
             log.debug("Satisfied: %s"%(repr(satisfied)))
@@ -501,10 +1239,7 @@ def format(eval_result, options, ostr):
             ostr.write("\n")
         return
     put(s_any, "Research Object %(rouri)s:"%eval_result)
-    summary_text= ( "Fully complete"     if MINIM.fullySatisfies     in eval_result['summary'] else
-                    "Nominally complete" if MINIM.nominallySatisfies in eval_result['summary'] else
-                    "Minimally complete" if MINIM.minimallySatisfies in eval_result['summary'] else
-                    "Incomplete")
+    summary_text = evalSummaryText(eval_result)
     put(s_any, summary_text+" for %(purpose)s of resource %(target)s"%(eval_result))
     if eval_result['missingMust']:
         put(s_must, "Unsatisfied MUST requirements:")
@@ -518,6 +1253,10 @@ def format(eval_result, options, ostr):
         put(s_may, "Unsatisfied MAY requirements:")
         for m in eval_result['missingMay']:
             put(s_may, "  "+formatRule(False, *m))
+    if eval_result.get('notEvaluated'):
+        put(s_must, "Requirements not evaluated:")
+        for (r, _b) in eval_result['notEvaluated']:
+            put(s_must, "  "+requirementText(r))
     if eval_result['satisfied']:
         put(s_full, "Satisfied requirements:")
         for m in eval_result['satisfied']:
@@ -526,6 +1265,38 @@ def format(eval_result, options, ostr):
     put(s_full, "Minimum information URI: %(minimuri)s"%(eval_result))
     return
 
+def formatStatistics(eval_result, ostr, limit=None):
+    """
+    Writes a report of the requirements of an evaluation result that took longest to
+    evaluate, slowest first, to the supplied stream.  The evaluation must have been
+    performed with statistics requested.
+
+    limit       if supplied, is the maximum number of requirements reported.
+    """
+    stats = sorted(eval_result.get('statistics', []), key=lambda (r, s): s['time'], reverse=True)
+    ostr.write("Slowest rules:\n")
+    ostr.write("  %8s %7s %7s %8s %8s  %s\n"%
+        ("Time(s)", "Queries", "Rows", "Liveness", "Commands", "Requirement"))
+    for (r, s) in stats[:limit]:
+        ostr.write("  %8.3f %7d %7d %8d %8d  %s\n"%
+            (s['time'], s['queries'], s['rows'], s['liveness'], s['commands'], requirementText(r)))
+    return
+
+def evalSummaryText(eval_result):
+    """
+    Returns text describing the level of completeness of an evaluation result
+    """
+    return ( "Fully complete"     if MINIM.fullySatisfies     in eval_result['summary'] else
+             "Nominally complete" if MINIM.nominallySatisfies in eval_result['summary'] else
+             "Minimally complete" if MINIM.minimallySatisfies in eval_result['summary'] else
+             "Incomplete")
+
+def requirementText(rule):
+    """
+    Format a requirement without its result, for a report
+    """
+    return "%s %s"%(rule['level'], rule['label'] or rule['uri'])
+
 def formatRule(satisfied, rule, bindings):
     """
     Format a rule for a missing/satisfied report
@@ -618,7 +1389,10 @@ def evalResultGraph(graph, evalresult):
     def addRequirementsDetail(satisfied, results, satlevel):
         for (req, binding) in results:
             b = rdflib.BNode()
-            msg = formatRule(satisfied, req, binding)
+            if satisfied is None:
+                msg = requirementText(req)
+            else:
+                msg = formatRule(satisfied, req, binding)
             graph.add( (resultnode, satlevel, b) )
             graph.add( (b, RDF.type,             MINIM.ChecklistItemReport) )
             graph.add( (b, MINIM.tryRequirement, req['uri']) )
@@ -634,6 +1408,18 @@ def evalResultGraph(graph, evalresult):
     addRequirementsDetail(False, evalresult['missingMay'], MINIM.missingMay)
     addRequirementsDetail(False, evalresult['missingShould'], MINIM.missingShould)
     addRequirementsDetail(False, evalresult['missingMust'], MINIM.missingMust)
+    addRequirementsDetail(None,  evalresult.get('notEvaluated', []), MINIM.notEvaluated)
+    # Add statistics for requirements evaluated, if requested
+    for (req, stats) in evalresult.get('statistics', []):
+        b = rdflib.BNode()
+        graph.add( (resultnode, MINIM.ruleStatistics, b) )
+        graph.add( (b, RDF.type,              MINIM.RuleStatistics) )
+        graph.add( (b, MINIM.tryRequirement,  req['uri']) )
+        graph.add( (b, MINIM.evalTime,        rdflib.Literal(stats['time'])) )
+        graph.add( (b, MINIM.queryCount,      rdflib.Literal(stats['queries'])) )
+        graph.add( (b, MINIM.resultCount,     rdflib.Literal(stats['rows'])) )
+        graph.add( (b, MINIM.livenessCount,   rdflib.Literal(stats['liveness'])) )
+        graph.add( (b, MINIM.commandCount,    rdflib.Literal(stats['commands'])) )
     return graph
 
 # End.
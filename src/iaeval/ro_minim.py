@@ -8,9 +8,12 @@ __author__      = "Graham Klyne (GK@ACM.ORG)"
 __copyright__   = "Copyright 2011-2013, University of Oxford"
 __license__     = "MIT (http://opensource.org/licenses/MIT)"
 
+import os
 import re
 import urllib
 import urlparse
+import httplib
+import threading
 import logging
 
 log = logging.getLogger(__name__)
@@ -24,6 +27,7 @@ except ImportError:
 
 from rocommand import ro_manifest
 from rocommand import ro_namespaces
+from rocommand.ro_uriutils import isFileUri, getFilenameFromUri
 from rocommand.ro_namespaces import RDF, RDFS
 
 minimnsuri = rdflib.URIRef("http://purl.org/minim/minim#")
@@ -64,9 +68,11 @@ MINIM      = ro_namespaces.makeNamespace(minimnsuri,
             , "minimUri"
             , "testedChecklist", "testedPurpose", "testedTarget", "testedModel", "testedRO"
             , "minimallySatisfies", "nominallySatisfies", "fullySatisfies"
-            , "satisfied", "missingMay", "missingShould", "missingMust"
+            , "satisfied", "missingMay", "missingShould", "missingMust", "notEvaluated"
             , "ChecklistItemReport"
             , "tryRequirement", "tryMessage"
+            , "RuleStatistics", "ruleStatistics"
+            , "evalTime", "queryCount", "resultCount", "livenessCount", "commandCount"
             ])
 
 resultnsuri = rdflib.URIRef("http://www.w3.org/2001/sw/DataAccess/tests/result-set#")
@@ -111,13 +117,17 @@ def getConstraints(minimgraph):
         yield c
     return
 
-def getConstraint(minimgraph, rouri, target_ref, purpose_regex_string):
+def getConstraint(minimgraph, rouri, target_ref, purpose_regex_string, constraints=None):
     """
     Find constraint matching supplied RO, target and purpose regex
     
     Constraint is returned with:
     targetro_actual  -> URI of resource
     targetres_actual -> URI of target if supplied, else subject of minium:hasConstraint
+
+    constraints is an optional list of constraints previously obtained from getConstraints,
+                which are used instead of scanning the minim graph.  The constraint
+                returned is a copy, so the supplied values are not modified.
     """
     def mkstr(u):
         return u and str(u)
@@ -129,7 +139,10 @@ def getConstraint(minimgraph, rouri, target_ref, purpose_regex_string):
     if target:
         # Allow use of {+targetres} in checklist target template:
         templatedict['targetres'] = urllib.unquote(str(target))
-    for c in getConstraints(minimgraph):
+    if constraints is None:
+        constraints = getConstraints(minimgraph)
+    for c in constraints:
+        c = dict(c)
         log.debug("- test: target %s purpose %s"%(c['target'],c['purpose']))
         log.debug("- purpose %s, c['purpose'] %s"%(purpose_regex_string, c['purpose']))
         if not purpose or purpose.match(c['purpose']):
@@ -263,4 +276,120 @@ def getRequirements(minimgraph, modeluri):
                 break
     return
 
+# Checklist cache
+#
+# Checklists are usually evaluated many times (e.g. by the checklist evaluation service),
+# so parsed Minim descriptions and the requirements of each model are kept here, keyed
+# by Minim file URI, and reused for as long as the file is unchanged.
+
+minimCache      = {}
+minimCacheLock  = threading.Lock()
+MINIM_CACHE_MAX = 64
+
+def getMinimValidator(minimuri):
+    """
+    Returns a value that changes when the Minim file at the supplied URI is updated,
+    or None if no such value is available.  For local files, this is the file size and
+    modification time; otherwise the ETag or Last-Modified header from a HEAD request.
+    """
+    minimuri = str(minimuri)
+    if isFileUri(minimuri):
+        try:
+            st = os.stat(getFilenameFromUri(minimuri))
+            return (st.st_size, st.st_mtime)
+        except OSError:
+            return None
+    parseduri = urlparse.urlsplit(minimuri)
+    if parseduri.scheme not in ["http", "https"]:
+        return None
+    path = parseduri.path
+    if parseduri.query: path += "?"+parseduri.query
+    if parseduri.scheme == "https":
+        httpcon = httplib.HTTPSConnection(parseduri.netloc, timeout=5)
+    else:
+        httpcon = httplib.HTTPConnection(parseduri.netloc, timeout=5)
+    try:
+        httpcon.request("HEAD", path)
+        response = httpcon.getresponse()
+        if response.status < 200 or response.status > 299:
+            return None
+        validator = response.getheader("etag") or response.getheader("last-modified")
+    except Exception as e:
+        log.debug("getMinimValidator: %s: %s"%(minimuri, repr(e)))
+        validator = None
+    finally:
+        httpcon.close()
+    return validator
+
+class MinimChecklist(object):
+    """
+    Parsed Minim description, with its constraints, and the models and requirements
+    used from it.  Requirement and rule dictionaries are built once and shared by all
+    evaluations that use this object.
+    """
+
+    def __init__(self, minimuri, validator=None):
+        self.minimuri     = minimuri
+        self.validator    = validator
+        self.graph        = readMinimGraph(minimuri)
+        self.constraints  = list(getConstraints(self.graph))
+        self.models       = {}
+        self.requirements = {}
+        self._lock        = threading.Lock()
+        return
+
+    def getConstraint(self, rouri, target_ref, purpose_regex_string):
+        return getConstraint(self.graph, rouri, target_ref, purpose_regex_string,
+                             constraints=self.constraints)
+
+    def getConstraints(self, rouri, targetpurposes):
+        """
+        Returns a list of constraints matching each of a list of (target, purpose)
+        pairs, with None for any pair that has no matching constraint.
+        """
+        return [ self.getConstraint(rouri, target, purpose)
+                 for (target, purpose) in targetpurposes ]
+
+    def getModel(self, modeluri):
+        with self._lock:
+            if modeluri not in self.models:
+                self.models[modeluri] = getModel(self.graph, modeluri)
+            return self.models[modeluri]
+
+    def getRequirements(self, modeluri):
+        with self._lock:
+            if modeluri not in self.requirements:
+                self.requirements[modeluri] = list(getRequirements(self.graph, modeluri))
+            return self.requirements[modeluri]
+
+    def copyGraph(self):
+        """
+        Returns a copy of the Minim graph, which may be updated by the caller
+        """
+        graph = rdflib.Graph()
+        for (prefix, uri) in self.graph.namespaces():
+            graph.bind(prefix, uri)
+        graph += self.graph
+        return graph
+
+def getMinimChecklist(minimuri):
+    """
+    Returns a MinimChecklist object for the Minim file at the supplied URI, reusing a
+    previously parsed checklist if the file has not changed since it was read.
+    """
+    key       = str(minimuri)
+    validator = getMinimValidator(key)
+    with minimCacheLock:
+        checklist = minimCache.get(key)
+    if checklist and validator is not None and checklist.validator == validator:
+        log.debug("getMinimChecklist: using cached %s"%(key))
+        return checklist
+    checklist = MinimChecklist(minimuri, validator)
+    if validator is not None:
+        with minimCacheLock:
+            if len(minimCache) >= MINIM_CACHE_MAX:
+                minimCache.clear()
+            minimCache[key] = checklist
+    return checklist
+
 # End.
@@ -18,6 +18,7 @@ import unittest
 import logging
 import datetime
 import StringIO
+import tempfile
 try:
     # Running Python 2.5 with simplejson?
     import simplejson as json
@@ -165,6 +166,55 @@ class TestEvalChecklist(TestROSupport.TestROSupport):
         self.deleteTestRo(rodir)
         return
 
+    def testEvalDetailLevels(self):
+        """
+        Evaluate RO with a missing MUST requirement for different levels of detail,
+        and check that requirements not needed for the level are not evaluated.
+        """
+        self.setupConfig()
+        rodir      = self.createTestRo(testbase, "test-data-1", "RO test minim", "ro-testMinim")
+        self.populateTestRo(testbase, rodir)
+        rometa = ro_metadata(dict(ro_config, evaluation_workers=1), rodir)
+        def evaluate(detail):
+            return ro_eval_minim.evaluate(rometa,
+                "Minim-UserRequirements.rdf",               # Minim file
+                "docs/UserRequirements-bio.csv",            # Target resource
+                "create",                                   # Purpose
+                detail)[1]
+        full    = evaluate("full")
+        must    = evaluate("must")
+        summary = evaluate("summary")
+        self.assertEquals(full['notEvaluated'], [])
+        self.assertEquals(len(full['missingMust']), len(must['missingMust']))
+        for evalresult in [must, summary]:
+            self.assertEquals(evalresult['summary'], [])
+            self.assertEquals(evalresult['missingShould'], [])
+            self.assertEquals(evalresult['missingMay'],    [])
+            self.assertEquals(
+                [ r['level'] for (r, _b) in evalresult['notEvaluated'] if r['level'] != "MUST" ],
+                [ "SHOULD" ])
+        # Summary evaluation stops at the first unsatisfied requirement
+        self.assertEquals(len(summary['missingMust']), 1)
+        self.assertEquals(
+            len(summary['satisfied'])+len(summary['missingMust'])+len(summary['notEvaluated']),
+            len(full['satisfied'])+len(full['missingMust'])+len(full['missingShould']))
+        # Requirements are reported in checklist order, not level order
+        checklist = ro_minim.getMinimChecklist(summary['minimuri'])
+        order = [ r['uri'] for r in checklist.getRequirements(summary['modeluri']) ]
+        noteval = [ r['uri'] for (r, _b) in summary['notEvaluated'] ]
+        self.assertEquals(sorted(set( r['level'] for (r, _b) in summary['notEvaluated'] )),
+                          ["MUST", "SHOULD"])
+        self.assertEquals(noteval, [ u for u in order if u in noteval ])
+        # Requirements not evaluated are reported as such
+        outstr = StringIO.StringIO()
+        ro_eval_minim.format(must, { "detail": "must" }, outstr)
+        self.assertIn("Requirements not evaluated:", outstr.getvalue())
+        self.assertIn("SHOULD aggregates docs/reqs.css", outstr.getvalue())
+        graph = ro_eval_minim.evalResultGraph(rdflib.Graph(), must)
+        self.assertEquals(len(list(graph.objects(predicate=MINIM.notEvaluated))), 1)
+        self.deleteTestRo(rodir)
+        return
+
     def testEvalShouldMissing(self):
         """
         Evaluate complete RO against Minim description 
@@ -253,6 +303,132 @@ class TestEvalChecklist(TestROSupport.TestROSupport):
         self.deleteTestRo(rodir)
         return
 
+    def testEvalRequirementsConcurrent(self):
+        """
+        Evaluate RO with requirements evaluated concurrently, and check results are
+        the same, and in the same order, as when requirements are evaluated in turn.
+        """
+        self.setupConfig()
+        rodir     = self.createTestRo(testbase, "test-data-1", "RO test minim", "ro-testMinim")
+        self.populateTestRo(testbase, rodir)
+        evalresults = []
+        for workers in [1, 4]:
+            roconfig  = dict(ro_config, evaluation_workers=workers)
+            rometa    = ro_metadata(roconfig, rodir)
+            (g,evalresult) = ro_eval_minim.evaluate(rometa,
+                "Minim-UserRequirements.rdf",           # Minim file
+                "docs/UserRequirements-bio.pdf",        # Target resource
+                "create")                               # Purpose
+            evalresults.append(evalresult)
+        self.maxDiff=None
+        self.assertEquals(evalresults[1], evalresults[0])
+        seqs = [ r['seq'] for (r, b) in evalresults[1]['satisfied'] ]
+        self.assertEquals(seqs, sorted(seqs))
+        self.assertEquals(len(evalresults[1]['missingMay']), 1)
+        self.deleteTestRo(rodir)
+        return
+
+    def testEvaluateTargets(self):
+        """
+        Evaluate RO for several targets and purposes, and check results are the same
+        as evaluating each separately, with shared rules evaluated once.
+        """
+        self.setupConfig()
+        rodir     = self.createTestRo(testbase, "test-data-1", "RO test minim", "ro-testMinim")
+        self.populateTestRo(testbase, rodir)
+        rometa    = ro_metadata(ro_config, rodir)
+        targetpurposes = (
+            [ ("docs/UserRequirements-astro.csv", "create")
+            , ("docs/UserRequirements-bio.csv",   "create")
+            , ("docs/UserRequirements-bio.html",  "create")
+            , ("docs/UserRequirements-bio.pdf",   "create")
+            , ("docs/UserRequirements-bio.pdf",   "no-such-purpose")
+            ])
+        evalRequirement = ro_eval_minim.evalRequirement
+        evalcount = [0]
+        def countEvalRequirement(*args):
+            evalcount[0] += 1
+            return evalRequirement(*args)
+        ro_eval_minim.evalRequirement = countEvalRequirement
+        try:
+            (g, evalresults) = ro_eval_minim.evaluateTargets(rometa,
+                "Minim-UserRequirements.rdf", targetpurposes)
+            sharedcount  = evalcount[0]
+            evalcount[0] = 0
+            expect = [ ro_eval_minim.evaluate(rometa, "Minim-UserRequirements.rdf", t, p)[1]
+                       for (t, p) in targetpurposes[:-1] ]
+            separatecount = evalcount[0]
+        finally:
+            ro_eval_minim.evalRequirement = evalRequirement
+        self.maxDiff = None
+        self.assertEquals(evalresults, expect+[None])
+        self.assertTrue(sharedcount < separatecount,
+            "Rules evaluated: %d, separately %d"%(sharedcount, separatecount))
+        # Command line form, with JSON output
+        args = [ "ro", "evaluate", "matrix"
+               , "-d", rodir+"/"
+               , "-o", "json"
+               , "Minim-UserRequirements.rdf"
+               , "create,no-such-purpose"
+               , "docs/UserRequirements-astro.csv,docs/UserRequirements-bio.html"
+               ]
+        self.outstr.seek(0)
+        with StdoutContext.SwitchStdout(self.outstr):
+            status = ro.runCommand(
+                os.path.join(testbase, TestConfig.ro_test_config.CONFIGDIR),
+                os.path.join(testbase, TestConfig.ro_test_config.ROBASEDIR),
+                args)
+        outtxt = self.outstr.getvalue()
+        self.assertEquals(status, 0, outtxt)
+        results = [ json.loads(line) for line in outtxt.splitlines() ]
+        self.assertEquals([ (r['target'], r['purpose']) for r in results ],
+            [ ("docs/UserRequirements-astro.csv", "create")
+            , ("docs/UserRequirements-bio.html",  "create")
+            , ("docs/UserRequirements-astro.csv", "no-such-purpose")
+            , ("docs/UserRequirements-bio.html",  "no-such-purpose")
+            ])
+        self.assertEquals(results[1]['missingShould'], ["05 - aggregates docs/missing.css"])
+        self.assertIn('error', results[3])
+        self.deleteTestRo(rodir)
+        return
+
+    def testRuleCacheKey(self):
+        """
+        Rule result keys use just the constraint bindings that a rule refers to
+        """
+        cbindings = { 'target': "t", 'targetres': "res", 'targetro': "ro" }
+        def ruleKey(ruletype, **rule):
+            return ro_eval_minim.ruleCacheKey(
+                { 'ruleuri': "rule", ruletype: dict(rule, prefixes=["rdfs"]) }, cbindings)
+        self.assertEquals(ruleKey('querytestrule', query="?targetres rdfs:label ?label"),
+            ("rule", (('targetres', "res"),)))
+        self.assertEquals(ruleKey('querytestrule', query="$targetro ore:aggregates ?x",
+                                  showfail="Missing %(target)s"),
+            ("rule", (('target', "t"), ('targetro', "ro"))))
+        self.assertEquals(ruleKey('contentmatchrule', forall="?x a ?y",
+                                  template="{+targetres,other:3}/{x}"),
+            ("rule", (('targetres', "res"),)))
+        self.assertEquals(ruleKey('datarule', aggregates="docs/targetres.css"),
+            ("rule", ()))
+        return
+
+    def testSoftwareRuleCache(self):
+        """
+        Software rule command outputs are reused until they expire
+        """
+        cmnds = ["date +%s%N", "date +%N%s"]
+        ro_eval_minim.softwareOutputCache.clear()
+        out1  = ro_eval_minim.softwareCommandOutputs(cmnds+cmnds, ttl=300)
+        self.assertEquals(sorted(out1.keys()), sorted(cmnds))
+        out2  = ro_eval_minim.softwareCommandOutputs(cmnds, ttl=300)
+        self.assertEquals(out2, out1)
+        out3  = ro_eval_minim.softwareCommandOutputs(cmnds, ttl=0)
+        self.assertNotEquals(out3[cmnds[0]], out1[cmnds[0]])
+        out4  = ro_eval_minim.softwareCommandOutputs(cmnds, ttl=300)
+        self.assertEquals(out4, out3)
+        ro_eval_minim.softwareOutputCache.clear()
+        return
+
     def setupEvalFormat(self):
         self.setupConfig()
         rodir     = self.createTestRo(testbase, "test-data-1", "RO test minim", "ro-testMinim")
@@ -392,6 +568,43 @@ class TestEvalChecklist(TestROSupport.TestROSupport):
         self.deleteTestRo(rodir)
         return
 
+    def testEvaluateBulkCommand(self):
+        self.setupConfig()
+        rodir = self.createTestRo(testbase, "test-data-1", "RO test minim", "ro-testMinim")
+        self.populateTestRo(testbase, rodir)
+        rometa = ro_metadata(ro_config, rodir)
+        (g, evalresult) = ro_eval_minim.evaluate(rometa,
+            "Minim-UserRequirements.rdf", "docs/UserRequirements-bio.html", "create")
+        (fd, rolist) = tempfile.mkstemp(suffix=".txt")
+        os.write(fd, "# ROs to evaluate\n%s\n%s\n\n%s\n"%(rodir, rodir+"-missing", rometa.getRoUri()))
+        os.close(fd)
+        args = [ "ro", "evaluate", "bulk"
+               , rolist
+               , rodir+"/Minim-UserRequirements.rdf"
+               , "create"
+               , "docs/UserRequirements-bio.html"
+               ]
+        self.outstr.seek(0)
+        with StdoutContext.SwitchStdout(self.outstr):
+            status = ro.runCommand(
+                os.path.join(testbase, TestConfig.ro_test_config.CONFIGDIR),
+                os.path.join(testbase, TestConfig.ro_test_config.ROBASEDIR),
+                args)
+        os.remove(rolist)
+        outtxt = self.outstr.getvalue()
+        log.debug("status %d, outtxt: %s"%(status, outtxt))
+        # One line of JSON for each RO, in order, with the failure reported
+        self.assertEquals(status, 1)
+        results = [ json.loads(line) for line in outtxt.splitlines() ]
+        self.assertEquals(len(results), 3)
+        expect = json.loads(json.dumps(ro_eval_minim.evalResultJson(evalresult)))
+        self.assertEquals(results[0], expect)
+        self.assertEquals(results[1]['ro'], rodir+"-missing")
+        self.assertIn('error', results[1])
+        self.assertEquals(results[2], expect)
+        self.deleteTestRo(rodir)
+        return
+
     # @@TODO Add test cases for software environment rule pass/fail, based on previous
     def annotateWfRo(self, testbase, rodir):
         """
@@ -721,11 +934,17 @@ def getTestSuite(select="unit"):
             , "testSetupConfig"
             , "testEvalAllPresent"
             , "testEvalMustMissing"
+            , "testEvalDetailLevels"
             , "testEvalShouldMissing"
             , "testEvalMayMissing"
+            , "testEvalRequirementsConcurrent"
+            , "testEvaluateTargets"
+            , "testRuleCacheKey"
+            , "testSoftwareRuleCache"
             , "testEvalFormatSummary"
             , "testEvalFormatDetail"
             , "testEvaluateChecklistCommand"
+            , "testEvaluateBulkCommand"
             , "testEvaluateWfInputs"
             , "testEvaluateWfInputsRDF"
             , "testEvaluateMissing"
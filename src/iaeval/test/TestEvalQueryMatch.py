@@ -18,6 +18,9 @@ import unittest
 import logging
 import datetime
 import StringIO
+import threading
+import BaseHTTPServer
+import SocketServer
 try:
     # Running Python 2.5 with simplejson?
     import simplejson as json
@@ -31,13 +34,17 @@ if __name__ == "__main__":
     sys.path.insert(0, "../..")
 
 import rdflib
+import rdflib.plugins.sparql.processor
 
 from MiscUtils import TestUtils
 
+from rocommand import ro_settings
 from rocommand import ro_manifest
+from rocommand import ro_liveness
 from rocommand.ro_metadata import ro_metadata
 from rocommand.ro_annotation import annotationTypes, annotationPrefixes
 from rocommand.ro_prefixes   import make_sparql_prefixes
+from rocommand.ro_namespaces import RDF
 
 from rocommand.test import TestROSupport
 from rocommand.test import TestConfig
@@ -144,6 +151,164 @@ class TestEvalQueryMatch(TestROSupport.TestROSupport):
         self.deleteTestRo(rodir)
         return
 
+    def testEvalQueryTestExistsOnly(self):
+        """
+        Evaluate query test rule with just minim:exists, and check that the rule,
+        which may be shared by concurrent evaluations, is not updated
+        """
+        self.setupConfig()
+        rodir = self.createTestRo(testbase, "test-data-2", "RO test minim", "ro-testMinim")
+        self.populateTestRo(testbase, rodir)
+        rometa = ro_metadata(ro_config, rodir)
+        resuri = rometa.getComponentUriAbs("data/UserRequirements-astro.ods")
+        rometa.addSimpleAnnotation(resuri, "rdfs:label", "Test label")
+        rule = (
+            { 'prefixes':   [], 'query': None, 'resultmod': None
+            , 'exists':     rdflib.Literal("?targetres rdfs:label ?label")
+            , 'min': None,  'max': None, 'aggregates_t': None, 'islive_t': None
+            , 'show': None, 'showpass': "Labelled", 'showfail': "Not labelled", 'showmiss': None
+            , 'list': [],   'listpass': [], 'listfail': []
+            })
+        saved = dict(rule)
+        cbindings = { 'targetro': rometa.getRoUri(), 'targetres': resuri }
+        (satisfied, binding, msg) = ro_eval_minim.evalQueryTest(rometa, rule, cbindings)
+        self.assertTrue(satisfied)
+        self.assertEquals(msg, "Labelled")
+        self.assertEquals(rule, saved)
+        self.deleteTestRo(rodir)
+        return
+
+    def testEvalQueryTestPrepared(self):
+        """
+        Evaluate RO using queries prepared by an earlier evaluation
+        """
+        self.setupConfig()
+        rodir = self.createTestRo(testbase, "test-data-2", "RO test minim", "ro-testMinim")
+        self.populateTestRo(testbase, rodir)
+        rometa = ro_metadata(ro_config, rodir)
+        resuri = rometa.getComponentUriAbs("data/UserRequirements-astro.ods")
+        rometa.addSimpleAnnotation(resuri, "rdfs:label", "Test label")
+        ro_eval_minim.preparedQueryCache.clear()
+        def evaluate():
+            (g, evalresult) = ro_eval_minim.evaluate(rometa,
+                "Minim-UserRequirements2-exists.rdf", # Minim file
+                "data/UserRequirements-astro.ods",    # Target resource
+                "create")                             # Purpose
+            return evalresult
+        evalresult1 = evaluate()
+        queries = dict(ro_eval_minim.preparedQueryCache)
+        self.assertTrue(len(queries) > 0)
+        evalresult2 = evaluate()
+        self.assertEquals(ro_eval_minim.preparedQueryCache, queries)
+        self.assertEquals(evalresult2['summary'], evalresult1['summary'])
+        self.assertIn(MINIM.fullySatisfies, evalresult2['summary'])
+        # Relative URI references in a query are resolved against the RO URI
+        self.assertEquals(ro_eval_minim.queryBase(rometa, "?s a <http://example.org/T>"), "")
+        self.assertEquals(ro_eval_minim.queryBase(rometa, "?s ?p <data/x.ods>"),
+                          "BASE <%s>\n"%(rometa.getRoUri()))
+        self.deleteTestRo(rodir)
+        return
+
+    def testEvalExistsBatch(self):
+        """
+        Test minim:exists pattern for several query results using a single query
+        """
+        self.setupConfig()
+        rodir = self.createTestRo(testbase, "test-data-2", "RO test minim", "ro-testMinim")
+        self.populateTestRo(testbase, rodir)
+        rometa = ro_metadata(ro_config, rodir)
+        resuri = rometa.getComponentUriAbs("data/UserRequirements-astro.ods")
+        rometa.addSimpleAnnotation(resuri, "rdfs:label", "Test label")
+        prefixes = make_sparql_prefixes()
+        bindings = ro_eval_minim.runQuery(rometa,
+            prefixes+"SELECT ?file WHERE { ?ro ore:aggregates ?file } ORDER BY ?file")
+        self.assertTrue(len(bindings) > 2)
+        bindings.append({})
+        queries  = []
+        def makeQuery(queryverb, querypattern):
+            queries.append(queryverb)
+            return prefixes+"%s { %s }"%(queryverb, querypattern)
+        exists  = "?file rdfs:label ?label"
+        results = ro_eval_minim.evalExistsBatch(rometa, makeQuery, exists, bindings)
+        self.assertEquals(len(queries), 1)
+        expect  = [ ro_eval_minim.runQuery(rometa, makeQuery("ASK", exists), initBindings=b)
+                    for b in bindings ]
+        self.assertEquals(results, expect)
+        self.assertEquals(results.count(True), 2)
+        self.assertTrue(results[-1])
+        # Blank node values are tested one at a time
+        queries = []
+        results = ro_eval_minim.evalExistsBatch(rometa, makeQuery, exists,
+            [ {rdflib.Variable("file"): resuri}, {rdflib.Variable("file"): rdflib.BNode()} ])
+        self.assertEquals(queries, ["ASK"])
+        self.assertEquals(results, [True, False])
+        # Values that cannot be written in a VALUES block are tested one at a time
+        queries = []
+        results = ro_eval_minim.evalExistsBatch(rometa, makeQuery, exists,
+            [ {rdflib.Variable("file"): resuri},
+              {rdflib.Variable("file"): rdflib.URIRef("http://example.org/a <b> c")} ])
+        self.assertEquals(queries, ["ASK"])
+        self.assertEquals(results, [True, False])
+        # Values whose N3 form does not parse as SPARQL are tested one at a time
+        queries = []
+        results = ro_eval_minim.evalExistsBatch(rometa, makeQuery, exists,
+            [ {rdflib.Variable("file"): resuri},
+              {rdflib.Variable("file"): rdflib.URIRef("http://example.org/a\tb")} ])
+        self.assertEquals(queries, ["SELECT DISTINCT ?_existsrow WHERE", "ASK"])
+        self.assertEquals(results, [True, False])
+        self.deleteTestRo(rodir)
+        return
+
+    def testRunBoundQuery(self):
+        """
+        Test query with constraint bindings, prepared once for all constraints
+        """
+        self.setupConfig()
+        rodir = self.createTestRo(testbase, "test-data-2", "RO test minim", "ro-testMinim")
+        self.populateTestRo(testbase, rodir)
+        rometa = ro_metadata(ro_config, rodir)
+        res1   = rometa.getComponentUriAbs("data/UserRequirements-astro.ods")
+        res2   = rometa.getComponentUriAbs("data/NoSuchResource")
+        rometa.addSimpleAnnotation(res1, "rdfs:label", "Label 1")
+        rometa.addSimpleAnnotation(res2, "rdfs:label", "Label 2")
+        prefixes = make_sparql_prefixes()
+        query    = prefixes+"SELECT * WHERE { ?targetres rdfs:label ?label }"
+        self.assertTrue(len(ro_eval_minim.runQuery(rometa, query)) >= 2)
+        filterquery = prefixes+"ASK { ?targetres rdfs:label ?label FILTER(bound(?targetres)) }"
+        # Count queries parsed
+        parsed = []
+        parseQuery = rdflib.plugins.sparql.processor.parseQuery
+        def countParseQuery(querytext):
+            parsed.append(querytext)
+            return parseQuery(querytext)
+        rdflib.plugins.sparql.processor.parseQuery = countParseQuery
+        try:
+            for (res, label) in [(res1, "Label 1"), (res2, "Label 2")]:
+                cbindings = { 'targetro': rometa.getRoUri(), 'targetres': res, 'targetid': "id" }
+                resp = ro_eval_minim.runBoundQuery(rometa, query, cbindings)
+                self.assertEquals(resp,
+                    [ { rdflib.Variable("targetres"): res
+                      , rdflib.Variable("label"):     rdflib.Literal(label)
+                      } ])
+                self.assertTrue(ro_eval_minim.runBoundQuery(rometa,
+                    prefixes+"ASK { ?targetres rdfs:label \"%s\" }"%(label), cbindings))
+                self.assertFalse(ro_eval_minim.runBoundQuery(rometa,
+                    prefixes+"ASK { ?targetres rdfs:label \"Label 3\" }", cbindings))
+                self.assertTrue(ro_eval_minim.runBoundQuery(rometa, filterquery, cbindings))
+            # The query without expressions is not parsed again for each target
+            self.assertEquals([ q for q in parsed if q.startswith(query) ], [])
+            del parsed[:]
+            # Running bound queries again does not parse them again
+            for res in [res1, res2]:
+                cbindings = { 'targetro': rometa.getRoUri(), 'targetres': res, 'targetid': "id" }
+                self.assertEquals(len(ro_eval_minim.runBoundQuery(rometa, query, cbindings)), 1)
+                self.assertTrue(ro_eval_minim.runBoundQuery(rometa, filterquery, cbindings))
+            self.assertEquals(parsed, [])
+        finally:
+            rdflib.plugins.sparql.processor.parseQuery = parseQuery
+        self.deleteTestRo(rodir)
+        return
+
     def testEvalQueryTestModel(self):
         """
         Evaluate RO against Minim description using just QueryTestRules
@@ -178,6 +343,116 @@ class TestEvalQueryMatch(TestROSupport.TestROSupport):
         self.deleteTestRo(rodir)
         return
 
+    def testEvalIncremental(self):
+        """
+        Re-evaluate RO using saved results for rules whose dependencies are unchanged
+        """
+        self.setupConfig()
+        rodir = self.createTestRo(testbase, "test-data-2", "RO test minim", "ro-testMinim")
+        self.populateTestRo(testbase, rodir)
+        config = dict(ro_config, incremental_evaluation=True)
+        evaluated = []
+        evalRequirement = ro_eval_minim.evalRequirement
+        def countRequirement(rometa, r, constraintbinding):
+            evaluated.append(r['uri'])
+            return evalRequirement(rometa, r, constraintbinding)
+        def evaluate():
+            del evaluated[:]
+            (g, evalresult) = ro_eval_minim.evaluate(ro_metadata(config, rodir),
+                "Minim-UserRequirements2.rdf",        # Minim file
+                "data/UserRequirements-astro.ods",    # Target resource
+                "create")                             # Purpose
+            return evalresult
+        ro_eval_minim.evalRequirement = countRequirement
+        try:
+            firstresult = evaluate()
+            self.assertEquals(len(evaluated), 3)
+            self.assertEquals(len(firstresult['missingMust']), 1)
+            # Unchanged RO: only the liveness rule is evaluated again
+            evalresult = evaluate()
+            self.assertEquals(len(evaluated), 1)
+            self.assertEquals(evalresult, firstresult)
+            # Unreadable saved results are ignored
+            cachefile = os.path.join(rodir, ro_settings.MANIFEST_DIR, ro_settings.EVALUATION_CACHE_FILE)
+            with open(cachefile, "r") as cf:
+                self.assertEquals(json.load(cf)["version"], ro_settings.EVALUATION_CACHE_VERSION)
+            with open(cachefile, "w") as cf:
+                cf.write("not saved results")
+            evalresult = evaluate()
+            self.assertEquals(len(evaluated), 3)
+            evalresult = evaluate()
+            self.assertEquals(len(evaluated), 1)
+            self.assertEquals(len(evalresult['missingMust']), 1)
+            self.assertEquals(evalresult['missingMust'][0][0]['uri'],
+                ro_metadata(config, rodir).getComponentUriAbs(
+                    "Minim-UserRequirements2.rdf#isLabeled/data/UserRequirements-astro.ods"))
+            # Adding a label causes the rule that tests for it to be evaluated again
+            # (the new annotation is also aggregated by the RO)
+            rometa = ro_metadata(config, rodir)
+            resuri = rometa.getComponentUriAbs("data/UserRequirements-astro.ods")
+            rometa.addSimpleAnnotation(resuri, "rdfs:label", "Test label")
+            evalresult = evaluate()
+            self.assertIn(rometa.getComponentUriAbs(
+                "Minim-UserRequirements2.rdf#isLabeled/data/UserRequirements-astro.ods"), evaluated)
+            self.assertEquals(evalresult['missingMust'], [])
+            self.assertIn(MINIM.fullySatisfies, evalresult['summary'])
+        finally:
+            ro_eval_minim.evalRequirement = evalRequirement
+        self.deleteTestRo(rodir)
+        return
+
+    def testEvalStatistics(self):
+        """
+        Evaluate RO with statistics for each requirement
+        """
+        self.setupConfig()
+        rodir = self.createTestRo(testbase, "test-data-2", "RO test minim", "ro-testMinim")
+        self.populateTestRo(testbase, rodir)
+        rometa = ro_metadata(dict(ro_config, evaluation_workers=4), rodir)
+        threads = set()
+        evalRequirement = ro_eval_minim.evalRequirement
+        def threadRequirement(rometa, r, constraintbinding):
+            threads.add(threading.current_thread())
+            return evalRequirement(rometa, r, constraintbinding)
+        ro_eval_minim.evalRequirement = threadRequirement
+        try:
+            (g, evalresult) = ro_eval_minim.evaluate(rometa,
+                "Minim-UserRequirements2.rdf",        # Minim file
+                "data/UserRequirements-astro.ods",    # Target resource
+                "create",                             # Purpose
+                statistics=True)
+        finally:
+            ro_eval_minim.evalRequirement = evalRequirement
+        # Rules are timed one at a time, not while other rules are evaluated
+        self.assertEquals(threads, set([threading.current_thread()]))
+        stats = dict( (str(r['uri']).split("#")[1], s) for (r, s) in evalresult['statistics'] )
+        self.assertEquals(len(stats), 3)
+        self.assertEquals(stats["isAggregated/data/UserRequirements-astro.ods"]['queries'], 1)
+        self.assertEquals(stats["isAggregated/data/UserRequirements-astro.ods"]['rows'],    1)
+        self.assertEquals(stats["isAccessible/data/UserRequirements-astro.ods"]['liveness'], 1)
+        self.assertEquals(stats["isLabeled/data/UserRequirements-astro.ods"]['queries'],    2)
+        for s in stats.values():
+            self.assertEquals(s['commands'], 0)
+            self.assertTrue(s['time'] >= 0)
+        # Statistics in RDF result, and slowest rules report
+        graph = ro_eval_minim.evalResultGraph(g, evalresult)
+        self.assertEquals(len(list(graph.subjects(RDF.type, MINIM.RuleStatistics))), 3)
+        self.assertEquals(
+            sorted([ int(v) for v in graph.objects(predicate=MINIM.queryCount) ]), [1, 1, 2])
+        outstr = StringIO.StringIO()
+        ro_eval_minim.formatStatistics(evalresult, outstr)
+        lines = outstr.getvalue().splitlines()
+        self.assertEquals(lines[0], "Slowest rules:")
+        self.assertEquals(len(lines), 5)
+        times = [ float(l.split()[0]) for l in lines[2:] ]
+        self.assertEquals(times, sorted(times, reverse=True))
+        # No statistics unless requested
+        (g, evalresult) = ro_eval_minim.evaluate(rometa,
+            "Minim-UserRequirements2.rdf", "data/UserRequirements-astro.ods", "create")
+        self.assertNotIn('statistics', evalresult)
+        self.deleteTestRo(rodir)
+        return
+
     def testEvalQueryTestReportList(self):
         """
         Test QueryTestRules reporting list of failed query probes
@@ -493,6 +768,56 @@ class TestEvalQueryMatch(TestROSupport.TestROSupport):
         self.deleteTestRo(rodir)
         return
 
+    def testLiveUriChecker(self):
+        # Local HTTP server that counts requests and connections
+        requests    = []
+        connections = []
+        class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            def setup(self):
+                BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+                connections.append(self.client_address)
+            def do_HEAD(self):
+                requests.append(self.path)
+                self.send_response(200 if self.path.startswith("/live") else 404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+            def log_message(self, *args):
+                pass
+        class Server(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+            daemon_threads = True
+        server = Server(("127.0.0.1", 0), Handler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        try:
+            base    = "http://127.0.0.1:%d/"%(server.server_port)
+            uris    = [ base+"live/%d"%i for i in range(20) ] + [ base+"dead/%d"%i for i in range(5) ]
+            checker = ro_liveness.LiveUriChecker(workers=4, hostprobes=2)
+            result  = checker.checkUris(uris+uris[:3])
+            self.assertEqual(len(result), 25)
+            self.assertTrue(all( result[u] for u in uris[:20] ))
+            self.assertFalse(any( result[u] for u in uris[20:] ))
+            self.assertEqual(len(requests), 25)
+            self.assertTrue(len(connections) <= 4, "connections %r"%(connections))
+            # Results, including failures, are cached
+            self.assertTrue(checker.isLive(uris[0]))
+            self.assertFalse(checker.isLive(uris[-1]))
+            self.assertEqual(len(requests), 25)
+            # Local files are checked each time
+            self.assertTrue(checker.isLive(__file__))
+            self.assertFalse(checker.isLive(__file__+".missing"))
+            checker.clearCache()
+            self.assertTrue(checker.isLive(uris[0]))
+            self.assertEqual(len(requests), 26)
+            checker.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+        # Shared checker for ro_config settings
+        self.assertIs(ro_liveness.getLiveUriChecker({}), ro_liveness.getLiveUriChecker({}))
+        return
+
     # Sentinel/placeholder tests
 
     def testUnits(self):
@@ -526,13 +851,20 @@ def getTestSuite(select="unit"):
             , "testNull"
             , "testEvalQueryTestModelMin"
             , "testEvalQueryTestModelExists"
+            , "testEvalQueryTestExistsOnly"
+            , "testEvalQueryTestPrepared"
+            , "testEvalExistsBatch"
+            , "testRunBoundQuery"
             , "testEvalQueryTestModel"
+            , "testEvalIncremental"
+            , "testEvalStatistics"
             , "testEvalQueryTestReportList"
             , "testEvalQueryTestChembox"
             , "testEvalQueryTestChemboxFail"
             , "testEvalFormatSummary"
             , "testEvalFormatDetail"
             , "testEvaluateRDF"
+            , "testLiveUriChecker"
             ],
         "component":
             [ "testComponents"
@@ -232,6 +232,30 @@ class TestMinimAccess(TestROSupport.TestROSupport):
         self.assertTrue(r3_found, "Expected requirement(3) not found in minim")
         return
 
+    def testMinimChecklistCache(self):
+        self.setupConfig()
+        rodir        = self.createTestRo(testbase, "test-data-1", "RO test minim", "ro-testMinim")
+        minimbase    = ro_manifest.getComponentUri(rodir, "Minim-UserRequirements.rdf")
+        model        = ro_minim.getElementUri(minimbase, "#runnableRequirementRO")
+        checklist    = ro_minim.getMinimChecklist(minimbase)
+        c = checklist.getConstraint(rodir,
+            "docs/UserRequirements-astro.csv",
+            r"create.*UserRequirements-astro\.csv")
+        self.assertEquals(c['model'], model)
+        self.assertFalse('targetres_actual' in checklist.constraints[0])
+        requirements = checklist.getRequirements(model)
+        self.assertEquals(len(requirements), len(list(ro_minim.getRequirements(checklist.graph, model))))
+        # Unchanged checklist is reused, with the same requirement objects
+        self.assertTrue(ro_minim.getMinimChecklist(minimbase) is checklist)
+        self.assertTrue(checklist.getRequirements(model) is requirements)
+        # Changed checklist is read again
+        minimfile = os.path.join(rodir, "Minim-UserRequirements.rdf")
+        with open(minimfile, "a") as f:
+            f.write("\n")
+        self.assertFalse(ro_minim.getMinimChecklist(minimbase) is checklist)
+        self.deleteTestRo(rodir)
+        return
+
     # Remote access tests
 
     def testMinimReadRemote(self):
@@ -407,6 +431,7 @@ def getTestSuite(select="unit"):
             , "testGetModels"
             , "testGetModel"
             , "testGetRequirements"
+            , "testMinimChecklistCache"
             ],
         "component":
             [ "testComponents"
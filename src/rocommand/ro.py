@@ -75,6 +75,8 @@ def run(configbase, options, args):
         status = ro_command.dump(progname, configbase, options, args)
     elif args[1] == "manifest":
         status = ro_command.manifest(progname, configbase, options, args)
+    elif args[1] == "compact":
+        status = ro_command.compact(progname, configbase, options, args)
     elif args[1] == "snapshot":
         status = ro_command.snapshot(progname, configbase, options, args)
     elif args[1] == "archive":
@@ -146,6 +148,11 @@ def parseCommandArgs(argv):
     parser.add_option("-t", "--rosrs-access-token",
                       dest="rosrs_access_token",
                       help="ROSRS access token")
+    parser.add_option("--timing",
+                      action="store_true",
+                      dest="timing",
+                      default=False,
+                      help="Report time taken and queries used for each checklist rule evaluated")
     parser.add_option("-v", "--verbose",
                       action="store_true",
                       dest="verbose",
@@ -11,6 +11,7 @@ __license__     = "MIT (http://opensource.org/licenses/MIT)"
 import sys
 import os
 import os.path
+import errno
 import datetime
 import logging
 import re
@@ -166,6 +167,43 @@ def readAnnotationBody(rodir, annotationfile):
     rdfGraph.parse(annotationfilename, format=annotationformat)
     return rdfGraph
 
+# Next annotation body file index for each RO and day, seeded by listing the RO metadata
+# directory once per session (see allocateAnnotationFilename)
+annotationFileIndex = {}
+
+def allocateAnnotationFilename(ro_dir, name_suffix):
+    """
+    Allocate a new annotation body file name, Ann-YYYYMMDD-NNNN-<name_suffix>.rdf, and
+    create an empty file with that name to reserve it.
+
+    The next index to use is held in annotationFileIndex, so the metadata directory is
+    listed only once per session for each RO.  The file is created exclusively, so a
+    name taken by a concurrent writer is skipped rather than overwritten.
+
+    Returns the name of the annotation body file, relative to the RO metadata directory.
+    """
+    today   = datetime.date.today()
+    datestr = "%04d%02d%02d"%(today.year, today.month, today.day)
+    key     = (os.path.abspath(ro_dir), datestr)
+    if key not in annotationFileIndex:
+        name_index = 0
+        for f in os.listdir(makeAnnotationFilename(ro_dir, "")):
+            m = re.match(r"Ann-%s-(\d+)-"%(datestr), f)
+            if m: name_index = max(name_index, int(m.group(1)))
+        annotationFileIndex[key] = name_index+1
+    while True:
+        name_index = annotationFileIndex[key]
+        annotationFileIndex[key] = name_index+1
+        name = ("Ann-%s-%04d-%s.rdf"%(datestr, name_index, name_suffix))
+        try:
+            fd = os.open(makeAnnotationFilename(ro_dir, name), os.O_WRONLY|os.O_CREAT|os.O_EXCL)
+        except OSError as e:
+            if e.errno != errno.EEXIST: raise
+            log.debug("allocateAnnotationFilename: %s exists"%(name))
+            continue
+        os.close(fd)
+        return name
+
 def createAnnotationGraphBody(ro_config, ro_dir, rofile, anngraph):
     """
     Create a new annotation body for a single resource in a research object, based
@@ -187,18 +225,10 @@ def createAnnotationGraphBody(ro_config, ro_dir, rofile, anngraph):
     """
     # Determine name for annotation body
     log.debug("createAnnotationGraphBody: %s, %s"%(ro_dir, rofile))
-    annotation_filename = None
-    name_index = 0
     name_suffix = os.path.basename(rofile)
     if name_suffix in [".",""]:
         name_suffix = os.path.basename(os.path.normpath(ro_dir))
-    today = datetime.date.today()
-    while annotation_filename == None:
-        name_index += 1
-        name = ("Ann-%04d%02d%02d-%04d-%s.rdf"%
-                (today.year, today.month, today.day, name_index, name_suffix))
-        if not os.path.exists(makeAnnotationFilename(ro_dir, name)):
-            annotation_filename = name
+    annotation_filename = allocateAnnotationFilename(ro_dir, name_suffix)
     # Create annotation body file
     log.debug("createAnnotationGraphBody: %s"%(annotation_filename))
     anngraph.serialize(destination=makeAnnotationFilename(ro_dir, annotation_filename),
@@ -16,6 +16,7 @@ import datetime
 import logging
 import urlparse
 import urllib2
+import functools
 from ro_utils import EvoType
 from xml.parsers import expat
 from httplib2 import RelativeURIError
@@ -183,8 +184,13 @@ ro_command_usage = (
           ])
     , (["annotations"], argminmax(2, 3),
           ["annotations [ <file> | -d <dir> ] [ -o <format> ]"])
-    , (["evaluate", "eval"], argminmax(5, 6),
-          ["evaluate checklist [ -d <dir> ] [ -a | -l <level> ] [ -o <format> ] <minim> <purpose> [ <target> ]"])
+    , (["evaluate", "eval"],
+          (lambda options, args: len(args) in
+              { "bulk": [6, 7], "matrix": [6] }.get(args[2] if len(args) > 2 else None, [5, 6])),
+          ["evaluate checklist [ -d <dir> ] [ -a | -l <level> ] [ -o <format> ] [ --timing ] <minim> <purpose> [ <target> ]"
+          , "evaluate bulk [ -a | -l <level> ] [ -o <format> ] <ro-list> <minim> <purpose> [ <target> ]"
+          , "evaluate matrix [ -d <dir> ] [ -a | -l <level> ] [ -o <format> ] <minim> <purpose>,... <target>,..."
+          ])
     , (["push"], (lambda options, args: (argminmax(2, 3) if options.rodir else len(args) == 3)),
           ["push <zip> | -d <dir> [ -f ] [ -r <rosrs_uri> ] [ -t <access_token> ] [ --asynchronous ]"])
     , (["checkout"], argminmax(2, 3),
@@ -193,6 +199,8 @@ ro_command_usage = (
           ["dump [ -d <dir> | <rouri> ] [ -o <format> ]"])
     , (["manifest"], argminmax(2, 3),
           ["manifest [ -d <dir> | <rouri> ] [ -o <format> ]"])
+    , (["compact"], argminmax(2, 2),
+          ["compact [ -d <dir> ]"])
     , (["snapshot"],  argminmax(4, 4),
           ["snapshot <live-RO> <snapshot-id> [ --asynchronous ] [ --freeze ] [ -t <access_token> ] [ -r <rosrs_uri> ]"])
     , (["archive"],  argminmax(4, 4),
@@ -378,7 +386,7 @@ def status(progname, configbase, options, args):
     # Read manifest and display status
     if options.verbose:
         print "ro status -d \"%(rodir)s\"" % ro_options
-    rometa = ro_metadata(ro_config, ro_dir)
+    rometa = ro_metadata(ro_config, ro_dir, lazy=True)
     rodict = rometa.getRoMetadataDict()
     print "Research Object status"
     print "  identifier:  %(roident)s, title: %(rotitle)s" % rodict
@@ -476,8 +484,9 @@ def add(progname, configbase, options, args):
     if options.verbose:
         print "ro add -d %(rodir)s %(recurseopt)s %(rofile)s" % ro_options
     rometa = ro_metadata(ro_config, ro_dir)
-    rometa.addAggregatedResources(ro_options['rofile'],
-        recurse=ro_options['recurse'], includeDirs=not ro_options['recurse'])
+    with rometa.batchUpdate():
+        rometa.addAggregatedResources(ro_options['rofile'],
+            recurse=ro_options['recurse'], includeDirs=not ro_options['recurse'])
     return 0
 
 def remove(progname, configbase, options, args):
@@ -512,8 +521,9 @@ def remove(progname, configbase, options, args):
             ro_options["err"] = str(e)
             print '''%(rocmd)s remove -w "%(rofile)s" <...> : %(err)s''' % ro_options
             return 1
-        for rofile in [ r for r in rometa.getAggregatedResources() if rofilepattern.search(str(r)) ]:
-            rometa.removeAggregatedResource(rofile)
+        with rometa.batchUpdate():
+            for rofile in [ r for r in rometa.getAggregatedResources() if rofilepattern.search(str(r)) ]:
+                rometa.removeAggregatedResource(rofile)
     else:
         rofile = rometa.getComponentUri(ro_options['rofile'])
         rometa.removeAggregatedResource(rofile)
@@ -597,16 +607,13 @@ def list(progname, configbase, options, args):
             return 1
         prep_f = "f: "
         prep_a = "a: "
-        rofiles = MiscUtils.ScanDirectories.CollectDirectoryContents(
+        rofiles = MiscUtils.ScanDirectories.IterDirectoryContents(
                     ro_dir, baseDir=os.path.abspath(ro_dir),
-                    listDirs=False, listFiles=True, recursive=True, appendSep=False)
-        if not options.hidden:
-            def notHidden(f):
-                return re.match("\.|.*/\.", f) == None
-            rofiles = filter(notHidden, rofiles)
+                    listDirs=False, listFiles=True, recursive=True, appendSep=False,
+                    listHidden=options.hidden)
     # Scan RO and collect aggregated resources
     try:
-        rometa = ro_metadata(ro_config, rouri)
+        rometa = ro_metadata(ro_config, rouri, lazy=True)
     except ROSRS_Error, e:
         print str(e)
         return 2
@@ -679,8 +686,9 @@ def annotate(progname, configbase, options, args):
             ro_options["err"] = str(e)
             print '''%(rocmd)s %(anncmd)s -w "%(rofile)s" <...> : %(err)s''' % ro_options
             return 1
-        for rofile in [ str(r) for r in rometa.getAggregatedResources() if rofilepattern.search(str(r)) ]:
-            annotate_single(rofile)
+        with rometa.batchUpdate():
+            for rofile in [ str(r) for r in rometa.getAggregatedResources() if rofilepattern.search(str(r)) ]:
+                annotate_single(rofile)
     else:
         rofile = ro_uriutils.resolveFileAsUri(ro_options['rofile'])  # Relative to CWD
         annotate_single(rofile)
@@ -1001,6 +1009,8 @@ def evaluate(progname, configbase, options, args):
     Evaluate RO
 
     ro evaluate checklist [ -d <dir> ] <minim> <purpose> [ <target> ]"
+    ro evaluate bulk [ -o <format> ] <ro-list> <minim> <purpose> [ <target> ]"
+    ro evaluate matrix [ -d <dir> ] [ -o <format> ] <minim> <purpose>,... <target>,..."
     """
     log.debug("evaluate: progname %s, configbase %s, args %s" % 
               (progname, configbase, repr(args)))
@@ -1010,18 +1020,20 @@ def evaluate(progname, configbase, options, args):
         , "function":     args[2]
         })
     log.debug("ro_options: " + repr(ro_options))
+    levels = ["summary", "must", "should", "may", "full"]
+    if options.level not in levels:
+        print ("%s evaluate %s: invalid reporting level %s, must be one of %s" % 
+                (progname, ro_options["function"], options.level, repr(levels)))
+        return 1
+    if ro_options["function"] == "bulk":
+        return evaluateBulk(progname, ro_config, options, args)
     ro_ref = ro_root_reference(progname + " annotations", ro_config, None, ro_options['rodir'])
     if not ro_ref: return 1
     # Evaluate...
     if ro_options["function"] == "checklist":
         if len(args) not in [5, 6]:
             print ("%s evaluate checklist: wrong number of arguments provided" % (progname))
-            print ("Usage: %s evaluate checklist [ -d <dir> ] [ -a | -l <level> ] <minim> <purpose> [ <target> ]" % (progname))
-            return 1
-        levels = ["summary", "must", "should", "may", "full"]
-        if options.level not in ["summary", "must", "should", "may", "full"]:
-            print ("%s evaluate checklist: invalid reporting level %s, must be one of %s" % 
-                    (progname, options.level, repr(levels)))
+            print ("Usage: %s evaluate checklist [ -d <dir> ] [ -a | -l <level> ] [ --timing ] <minim> <purpose> [ <target> ]" % (progname))
             return 1
         ro_options["minim"]   = ((len(args) > 3) and args[3]) or "minim.rdf"
         ro_options["purpose"] = ((len(args) > 4) and args[4]) or "create"
@@ -1030,7 +1042,8 @@ def evaluate(progname, configbase, options, args):
             print "ro evaluate %(function)s -d \"%(rodir)s\" %(minim)s %(purpose)s %(target)s" % ro_options
         rometa = ro_metadata(ro_config, ro_ref)
         (minimgraph, evalresult) = ro_eval_minim.evaluate(rometa,
-            ro_options["minim"], ro_options["target"], ro_options["purpose"])
+            ro_options["minim"], ro_options["target"], ro_options["purpose"],
+            "full" if options.all else options.level, statistics=options.timing)
         if options.verbose:
             print "== Evaluation result =="
             print json.dumps(evalresult, indent=2)
@@ -1043,14 +1056,100 @@ def evaluate(progname, configbase, options, args):
             ro_eval_minim.format(evalresult,
                 { "detail" : "full" if options.all else options.level },
                 sys.stdout)
+            if options.timing:
+                ro_eval_minim.formatStatistics(evalresult, sys.stdout)
+    elif ro_options["function"] == "matrix":
+        ro_options["minim"]    = args[3]
+        ro_options["purposes"] = args[4]
+        ro_options["targets"]  = args[5]
+        if options.verbose:
+            print "ro evaluate %(function)s -d \"%(rodir)s\" %(minim)s %(purposes)s %(targets)s" % ro_options
+        targetpurposes = [ (t, p) for p in ro_options["purposes"].split(",")
+                                  for t in ro_options["targets"].split(",") ]
+        rometa = ro_metadata(ro_config, ro_ref)
+        (minimgraph, evalresults) = ro_eval_minim.evaluateTargets(rometa,
+            ro_options["minim"], targetpurposes, "full" if options.all else options.level)
+        outformat = (options.outformat or "TEXT").upper()
+        for ((target, purpose), evalresult) in zip(targetpurposes, evalresults):
+            if evalresult is None:
+                msg = "No checklist for %s of resource %s" % (purpose, target)
+                if outformat == "JSON":
+                    print json.dumps({ "target": target, "purpose": purpose, "error": msg }, sort_keys=True)
+                else:
+                    print >>sys.stderr, ("%s evaluate matrix: %s" % (progname, msg))
+            elif outformat in RDFTYPSERIALIZERMAP:
+                ro_eval_minim.evalResultGraph(minimgraph, evalresult)
+            elif outformat == "JSON":
+                print json.dumps(ro_eval_minim.evalResultJson(evalresult), sort_keys=True)
+            else:
+                ro_eval_minim.format(evalresult,
+                    { "detail" : "full" if options.all else options.level },
+                    sys.stdout)
+        if outformat in RDFTYPSERIALIZERMAP:
+            minimgraph.serialize(destination=sys.stdout, format=RDFTYPSERIALIZERMAP[outformat])
     # elif ... other functions here
     else:
         print ("%s evaluate: unrecognized function provided (%s)" % (progname, ro_options["function"]))
         print ("Usage:")
-        print ("  %s evaluate checklist [ -d <dir> ] [ -a | -l <level> ] <minim> <purpose> [ <target> ]" % (progname))
+        print ("  %s evaluate checklist [ -d <dir> ] [ -a | -l <level> ] [ --timing ] <minim> <purpose> [ <target> ]" % (progname))
+        print ("  %s evaluate bulk [ -a | -l <level> ] [ -o <format> ] <ro-list> <minim> <purpose> [ <target> ]" % (progname))
+        print ("  %s evaluate matrix [ -d <dir> ] [ -a | -l <level> ] [ -o <format> ] <minim> <purpose>,... <target>,..." % (progname))
         return 1
     return 0
 
+def evaluateBulk(progname, ro_config, options, args):
+    """
+    Evaluate a list of ROs against the same checklist
+
+    ro evaluate bulk [ -a | -l <level> ] [ -o <format> ] <ro-list> <minim> <purpose> [ <target> ]
+
+    <ro-list> is a file containing RO directories or URIs, one per line, or "-" to
+    read them from standard input.  <minim> is resolved against the current directory.
+    Results are written as they become available, in the order of the RO list:
+    by default, as a line of JSON for each RO; with "-o TEXT", as a text report for
+    each RO; or with an RDF format, as concatenated RDF result graphs.  An RO that
+    cannot be evaluated is reported without affecting evaluation of the others.
+    """
+    ro_options = (
+        { "rolist":       args[3]
+        , "minim":        args[4]
+        , "purpose":      args[5]
+        , "target":       ((len(args) > 6) and args[6]) or "."
+        })
+    if options.verbose:
+        print "ro evaluate bulk %(rolist)s %(minim)s %(purpose)s %(target)s" % ro_options
+    outformat = (options.outformat or "JSON").upper()
+    if outformat in RDFTYPSERIALIZERMAP:
+        report = functools.partial(ro_eval_minim.reportRdf, RDFTYPSERIALIZERMAP[outformat])
+    elif outformat == "TEXT":
+        report = functools.partial(ro_eval_minim.reportText, "full" if options.all else options.level)
+    elif outformat == "JSON":
+        report = ro_eval_minim.reportJson
+    else:
+        print ("%s evaluate bulk: unrecognized output format %s" % (progname, options.outformat))
+        return 1
+    if ro_options["rolist"] == "-":
+        rolist = sys.stdin
+    else:
+        rolist = open(ro_options["rolist"], "r")
+    rorefs = ( l.strip() for l in rolist if l.strip() and not l.startswith("#") )
+    status = 0
+    for (roref, output, error) in ro_eval_minim.evaluateBulk(ro_config, rorefs,
+            ro_options["minim"], ro_options["target"], ro_options["purpose"], report,
+            detail="full" if options.all else options.level):
+        if error:
+            status = 1
+            if outformat == "JSON":
+                output = json.dumps({ "ro": roref, "error": error }, sort_keys=True)+"\n"
+            else:
+                print >>sys.stderr, ("%s evaluate bulk: %s: %s" % (progname, roref, error))
+        if output:
+            sys.stdout.write(output)
+            sys.stdout.flush()
+    if rolist is not sys.stdin:
+        rolist.close()
+    return status
+
 def dump(progname, configbase, options, args):
     """
     Dump RDF of annotations
@@ -1109,4 +1208,24 @@ def manifest(progname, configbase, options, args):
     graph.serialize(destination=sys.stdout, format=RDFTYPSERIALIZERMAP[format])
     return 0
 
+def compact(progname, configbase, options, args):
+    """
+    Fold manifest journal into manifest file
+
+    ro compact [ -d dir ]
+    """
+    ro_config = getroconfig(configbase, options)
+    ro_options = {
+        "rodir":        options.rodir or ""
+        }
+    log.debug("ro_options: " + repr(ro_options))
+    # Find RO root directory
+    ro_dir = ro_root_directory(progname + " compact", ro_config, ro_options['rodir'])
+    if not ro_dir: return 1
+    if options.verbose:
+        print "ro compact -d \"%(rodir)s\"" % ro_options
+    rometa = ro_metadata(ro_config, ro_dir)
+    rometa.compactManifest()
+    return 0
+
 # End.
@@ -0,0 +1,146 @@
+# ro_journal.py
+
+"""
+Research Object manifest journal.
+
+The journal is an append-only log of statements added to and removed from a
+research object manifest.  Each record is a line consisting of "+" (add) or "-"
+(remove), a space, and the statement in N-Triples format.  Blank node labels in
+the journal are those used in the manifest file, which must therefore be read
+with blank node identifiers preserved.
+
+A journal containing just the header line indicates that the manifest file was
+last written with blank node identifiers that can be used in journal records.
+A missing or empty journal indicates that this may not be so.
+
+Access to the journal is serialized using file locks: readers take a shared lock
+and writers an exclusive lock on the journal file.
+"""
+
+__author__      = "Graham Klyne (GK@ACM.ORG)"
+__copyright__   = "Copyright 2011-2013, University of Oxford"
+__license__     = "MIT (http://opensource.org/licenses/MIT)"
+
+import os
+import contextlib
+import logging
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+log = logging.getLogger(__name__)
+
+import rdflib
+from rdflib.plugins.parsers.ntriples import NTriplesParser, r_nodeid
+from rdflib.plugins.serializers.nt import _nt_row
+
+ADD    = "+"
+REMOVE = "-"
+HEADER = "# Research Object manifest journal\n"
+
+class JournalParser(NTriplesParser):
+    """
+    N-Triples parser that keeps blank node labels used in the journal, rather
+    than allocating new blank nodes.
+    """
+    def nodeid(self):
+        if self.peek('_'):
+            return rdflib.BNode(self.eat(r_nodeid).group(1).decode())
+        return False
+
+class JournalSink(object):
+    """
+    Sink for JournalParser that applies a journal record to a graph
+    """
+    def __init__(self, graph):
+        self.graph = graph
+        self.op    = ADD
+        self.count = 0
+        return
+
+    def triple(self, s, p, o):
+        if self.op == ADD:
+            self.graph.add((s, p, o))
+        else:
+            self.graph.remove((s, p, o))
+        self.count += 1
+        return
+
+@contextlib.contextmanager
+def lockJournal(journalfile, exclusive=False):
+    """
+    Returns a context manager that opens the journal file, creating it if necessary,
+    and holds a shared or exclusive lock on it.  The value of the context manager is
+    the open journal file.
+    """
+    jf = open(journalfile, "a+")
+    try:
+        if fcntl:
+            fcntl.flock(jf.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield jf
+    finally:
+        # Closing the file releases the lock
+        jf.close()
+    return
+
+def isInitialized(jf):
+    """
+    Returns True if the supplied open journal file is not empty
+    """
+    return os.fstat(jf.fileno()).st_size != 0
+
+def formatRecord(op, stmt):
+    """
+    Returns a journal record string for adding or removing the supplied statement
+    """
+    return op + " " + _nt_row(stmt).encode("utf-8")
+
+def appendRecords(jf, records):
+    """
+    Append records to a journal file opened by lockJournal with an exclusive lock.
+
+    records     is a list of (op, stmt) pairs, where op is ADD or REMOVE.
+    """
+    jf.seek(0, os.SEEK_END)
+    jf.write("".join([ formatRecord(op, stmt) for (op, stmt) in records ]))
+    jf.flush()
+    os.fsync(jf.fileno())
+    return
+
+def replayJournal(jf, graph):
+    """
+    Apply records from a journal file opened by lockJournal to the supplied graph.
+
+    Returns the number of records applied.
+    """
+    sink   = JournalSink(graph)
+    parser = JournalParser(sink)
+    jf.seek(0)
+    for line in jf:
+        if not line.endswith("\n"):
+            log.warning("replayJournal: ignoring incomplete record %r"%(line))
+            break
+        if line[0:2] in [ADD+" ", REMOVE+" "]:
+            sink.op = line[0]
+            parser.parsestring(line[2:])
+        elif line.strip() and not line.startswith("#"):
+            log.warning("replayJournal: ignoring unrecognized record %r"%(line))
+    log.debug("replayJournal: %d records"%(sink.count))
+    return sink.count
+
+def resetJournal(jf):
+    """
+    Remove all records from a journal file opened by lockJournal with an exclusive
+    lock, leaving just the header line.  This is used after the manifest file has
+    been written.
+    """
+    jf.seek(0)
+    jf.truncate()
+    jf.write(HEADER)
+    jf.flush()
+    os.fsync(jf.fileno())
+    return
+
+# End.
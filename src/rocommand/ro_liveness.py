@@ -0,0 +1,239 @@
+# ro_liveness.py
+
+"""
+Liveness checking for URIs referenced by research objects.
+
+A LiveUriChecker tests whether URI references refer to accessible resources, as
+ro_uriutils.isLiveUri does, but:
+
+- HTTP(S) probes reuse keep-alive connections, with a pool of idle connections
+  for each host,
+- a batch of URIs can be checked at once, with probes run concurrently by a
+  bounded pool of threads and a limit on concurrent probes for each host, and
+- results for HTTP(S) URIs are cached, including failures, for a configurable
+  time.  Local files are checked each time they are requested.
+
+A checker is shared by all users in a process that have the same settings; use
+getLiveUriChecker to obtain it, e.g.:
+
+    checker = ro_liveness.getLiveUriChecker(rometa.roconfig)
+    live    = checker.checkUris(uris)       # dictionary: uri -> True/False
+
+Settings are taken from these ro_config values, if present:
+
+    "liveness_cache_ttl"        seconds to remember a live URI (default 300)
+    "liveness_negative_ttl"     seconds to remember a failed URI (default 60)
+    "liveness_workers"          number of concurrent probes (default 8)
+    "liveness_host_probes"      number of concurrent probes per host (default 4)
+    "liveness_timeout"          seconds to wait for a probe response (default 5)
+"""
+
+__author__      = "Graham Klyne (GK@ACM.ORG)"
+__copyright__   = "Copyright 2011-2013, University of Oxford"
+__license__     = "MIT (http://opensource.org/licenses/MIT)"
+
+import os
+import time
+import threading
+import urlparse
+import httplib
+import multiprocessing.pool
+import logging
+
+log = logging.getLogger(__name__)
+
+from ro_uriutils import isFileUri, resolveFileAsUri, getFilenameFromUri
+
+LIVENESS_CACHE_MAX = 10000      # cached results held before expired entries are purged
+PROBE_FAILED       = 900        # status used for a probe that gets no response
+
+class LiveUriChecker(object):
+    """
+    Checks URIs for liveness using pooled connections and a cache of results
+    """
+
+    def __init__(self, ttl=300, negativettl=60, workers=8, hostprobes=4, timeout=5):
+        self._ttl         = ttl
+        self._negativettl = negativettl
+        self._workers     = workers
+        self._hostprobes  = hostprobes
+        self._timeout     = timeout
+        self._cache       = {}      # uri -> (islive, expiry time)
+        self._cachelock   = threading.Lock()
+        self._idle        = {}      # (scheme, host) -> list of idle connections
+        self._hostlimits  = {}      # (scheme, host) -> semaphore limiting probes
+        self._poollock    = threading.Lock()
+        return
+
+    # Result cache
+
+    def _getCached(self, uri):
+        with self._cachelock:
+            cached = self._cache.get(uri)
+        if cached and cached[1] > time.time():
+            return cached[0]
+        return None
+
+    def _setCached(self, uri, islive):
+        now = time.time()
+        with self._cachelock:
+            if len(self._cache) >= LIVENESS_CACHE_MAX:
+                for (u, (_l, expiry)) in self._cache.items():
+                    if expiry <= now: del self._cache[u]
+                if len(self._cache) >= LIVENESS_CACHE_MAX:
+                    self._cache.clear()
+            self._cache[uri] = (islive, now + (self._ttl if islive else self._negativettl))
+        return
+
+    def clearCache(self):
+        """
+        Forget all cached results
+        """
+        with self._cachelock:
+            self._cache.clear()
+        return
+
+    # Connection pool
+
+    def _hostKey(self, parseduri):
+        return (parseduri.scheme.lower(), parseduri.netloc.lower())
+
+    def _hostLimit(self, hostkey):
+        with self._poollock:
+            if hostkey not in self._hostlimits:
+                self._hostlimits[hostkey] = threading.Semaphore(self._hostprobes)
+            return self._hostlimits[hostkey]
+
+    def _getConnection(self, hostkey):
+        """
+        Returns (connection, reused) for a host, using an idle connection if available
+        """
+        with self._poollock:
+            idle = self._idle.get(hostkey)
+            if idle:
+                return (idle.pop(), True)
+        (scheme, host) = hostkey
+        if scheme == "https":
+            return (httplib.HTTPSConnection(host, timeout=self._timeout), False)
+        return (httplib.HTTPConnection(host, timeout=self._timeout), False)
+
+    def _releaseConnection(self, hostkey, httpcon):
+        with self._poollock:
+            idle = self._idle.setdefault(hostkey, [])
+            if len(idle) < self._hostprobes:
+                idle.append(httpcon)
+                return
+        httpcon.close()
+        return
+
+    def close(self):
+        """
+        Close all idle connections
+        """
+        with self._poollock:
+            idle = self._idle
+            self._idle = {}
+        for conns in idle.values():
+            for httpcon in conns:
+                httpcon.close()
+        return
+
+    # Probes
+
+    def _probeHttp(self, uri):
+        """
+        Issue a HEAD request for an HTTP(S) URI, and return the response status
+        """
+        parseduri = urlparse.urlsplit(uri)
+        hostkey   = self._hostKey(parseduri)
+        path      = parseduri.path or "/"
+        if parseduri.query: path += "?"+parseduri.query
+        with self._hostLimit(hostkey):
+            while True:
+                (httpcon, reused) = self._getConnection(hostkey)
+                try:
+                    httpcon.request("HEAD", path)
+                    response = httpcon.getresponse()
+                    response.read()
+                except Exception as e:
+                    httpcon.close()
+                    if reused:
+                        # Server may have closed an idle keep-alive connection: retry
+                        continue
+                    log.debug("LiveUriChecker: %s: %s"%(uri, e))
+                    return PROBE_FAILED
+                if response.will_close:
+                    httpcon.close()
+                else:
+                    self._releaseConnection(hostkey, httpcon)
+                return response.status
+
+    def _probe(self, uri):
+        """
+        Check URI for liveness without reference to the cache
+        """
+        fileuri = resolveFileAsUri(uri)
+        if isFileUri(fileuri):
+            return os.path.exists(getFilenameFromUri(fileuri))
+        status = self._probeHttp(fileuri)
+        islive = (status >= 200) and (status <= 299)
+        self._setCached(fileuri, islive)
+        return islive
+
+    def isLive(self, uriref):
+        """
+        Test URI reference to see if it refers to an accessible resource.
+
+        Relative URI references are assumed to be local file system references,
+        relative to the current working directory.
+        """
+        return self.checkUris([uriref])[uriref]
+
+    def checkUris(self, urirefs):
+        """
+        Test a number of URI references for liveness, returning a dictionary that maps
+        each supplied URI reference to True or False.  URIs that are not in the cache
+        are probed concurrently.
+        """
+        result  = {}
+        pending = []
+        for uriref in set(urirefs):
+            islive = self._getCached(resolveFileAsUri(uriref))
+            if islive is None:
+                pending.append(uriref)
+            else:
+                result[uriref] = islive
+        if self._workers > 1 and len(pending) > 1:
+            pool = multiprocessing.pool.ThreadPool(min(self._workers, len(pending)))
+            try:
+                values = pool.map(self._probe, pending)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            values = map(self._probe, pending)
+        result.update(zip(pending, values))
+        return result
+
+checkers     = {}
+checkersLock = threading.Lock()
+
+def getLiveUriChecker(roconfig={}):
+    """
+    Returns the shared LiveUriChecker for the liveness settings in the supplied
+    ro_config dictionary.
+    """
+    settings = (
+        { 'ttl':          float(roconfig.get("liveness_cache_ttl",    300))
+        , 'negativettl':  float(roconfig.get("liveness_negative_ttl", 60))
+        , 'workers':      int(roconfig.get("liveness_workers",        8))
+        , 'hostprobes':   int(roconfig.get("liveness_host_probes",    4))
+        , 'timeout':      float(roconfig.get("liveness_timeout",      5))
+        })
+    key = tuple(sorted(settings.items()))
+    with checkersLock:
+        if key not in checkers:
+            checkers[key] = LiveUriChecker(**settings)
+        return checkers[key]
+
+# End.
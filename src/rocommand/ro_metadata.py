@@ -16,6 +16,11 @@ import urllib
 import urlparse
 import logging
 import traceback
+import tempfile
+import contextlib
+import stat
+import multiprocessing
+import multiprocessing.pool
 
 log = logging.getLogger(__name__)
 
@@ -31,16 +36,108 @@ from ro_uriutils import isFileUri, resolveUri, resolveFileAsUri, getFilenameFrom
 from ROSRS_Session import ROSRS_Error, ROSRS_Session
 import ro_manifest
 import ro_annotation
+import ro_journal
+import ro_store
 import json
 import hashlib
 
 
+def _getAnnotationFormat(annotationuri):
+    """
+    Return RDF format for an annotation body, determined from its file extension.
+    (rdflib.Graph.parse says; "used if format can not be determined from the source")
+    """
+    if re.search("\.(ttl|n3)$", annotationuri): return "n3"
+    return "xml"
+
+def _parseAnnotationBody(annotationuri):
+    """
+    Parse an annotation body in a worker process.
+
+    Returns a pair containing a list of the triples in the annotation body and a
+    list of its namespace prefix bindings, or None if the body cannot be read.
+    """
+    anngr = rdflib.Graph()
+    try:
+        anngr.parse(annotationuri, format=_getAnnotationFormat(annotationuri))
+    except IOError as e:
+        log.debug("_parseAnnotationBody %s, %s"%(annotationuri, repr(e)))
+        return None
+    return (list(anngr), list(anngr.namespaces()))
+
+def _bindPrefixes(graph):
+    """
+    Bind the common RO namespace prefixes (see ro_prefixes) in a graph
+    """
+    for (prefix, uri) in ro_prefixes.prefixes:
+        graph.bind(prefix, rdflib.namespace.Namespace(uri))
+    return
+
+def _declaredNamespaces(namespaces):
+    """
+    Return namespace prefix bindings of an annotation body, omitting prefixes like
+    "ns1" that rdflib generates for namespaces without a declared prefix.
+    """
+    return [ (p, n) for (p, n) in namespaces if not re.match(r"ns\d+$", p) ]
+
+# Predicates linking an annotation stub to the annotated resource
+def _termToJson(term):
+    """
+    Return JSON-serializable representation of an RDF term (or None)
+    """
+    if isinstance(term, rdflib.Literal):
+        return ["literal", term, term.language, term.datatype]
+    if isinstance(term, rdflib.BNode):
+        return ["bnode", term]
+    if isinstance(term, rdflib.URIRef):
+        return ["uri", term]
+    return None
+
+def _termFromJson(value):
+    """
+    Return RDF term (or None) from value created by _termToJson
+    """
+    if value is None:
+        return None
+    if value[0] == "literal":
+        return rdflib.Literal(value[1], lang=value[2],
+                              datatype=value[3] and rdflib.URIRef(value[3]))
+    if value[0] == "bnode":
+        return rdflib.BNode(value[1])
+    return rdflib.URIRef(value[1])
+
+CHECKSUM_CHUNK_SIZE = 1024*1024
+
+def _calculateFileChecksum(filename):
+    """
+    Return MD5 checksum of file content, reading the file in large binary chunks
+    """
+    m = hashlib.md5()
+    with open(filename, 'rb') as f:
+        while True:
+            chunk = f.read(CHECKSUM_CHUNK_SIZE)
+            if not chunk: break
+            m.update(chunk)
+    return m.hexdigest()
+
+def _tryCalculateFileChecksum(filename):
+    """
+    Return MD5 checksum of file content, or None if the file cannot be read
+    """
+    try:
+        return _calculateFileChecksum(filename)
+    except IOError as e:
+        log.debug("_tryCalculateFileChecksum: %s"%(repr(e)))
+        return None
+
+ANNOTATION_TARGET_PREDICATES = [RO.annotatesAggregatedResource, AO.annotatesResource]
+
 class ro_metadata(object):
     """
     Class for accessing RO metadata
     """
 
-    def __init__(self, roconfig, roref, dummysetupfortest=False):
+    def __init__(self, roconfig, roref, dummysetupfortest=False, lazy=False):
         """
         Initialize: read manifest from object at given directory into local RDF graph
 
@@ -49,12 +146,25 @@ class ro_metadata(object):
                     relative path name (see ro_uriutils.resolveFileAsUri for interpretation)
         dummysetupfortest is an optional parameter that, if True, suppresses some aspects of
                     the setup (does not attempt to read a RO manifest) for isolated testing.
+        lazy        is an optional parameter that, if True, defers reading the manifest of
+                    a local RO until it is first used.  This allows read-only commands that
+                    need only RO-level metadata (see getRoMetadataDict) to avoid parsing it.
         """
         self.roconfig = roconfig
         self.roref    = roref
         self.dummyfortest  = dummysetupfortest
-        self.manifestgraph = None
+        self._manifestgraph = None
         self.roannotations = None
+        self._annotationbodies = None
+        self._annotationsbyresource = None
+        self._annotationbodyuris    = None
+        self._annotationindex = None
+        self._annotationindexbodies = None
+        self._annotationindexchanged = False
+        self._batchdepth   = 0
+        self._batchpending = False
+        # Manifest updates not yet written to the journal, or None if not in journal mode
+        self._journalrecords = [] if roconfig.get("manifest_journal", False) else None
         self.registries = None
         uri = resolveFileAsUri(roref)
         if not uri.endswith("/"): uri += "/"
@@ -66,16 +176,20 @@ class ro_metadata(object):
                 self.roconfig["rosrs_uri"], 
                 self.roconfig["rosrs_access_token"]
                 )
-        self._loadManifest()
-        # Get RO URI from manifest
-        # May be different from computed value if manifest has absolute URI
-        # Nested URIs may be present; ours is the one described by the manifest URI,
-        # which is determined by the _loadManifest() method.
-        for s in self.manifestgraph.subjects(RDF.type, RO.ResearchObject):
-            if self.manifestgraph.value(s, ORE.isDescribedBy) == self.manifesturi:
-                self.rouri = s
-        # Check that the manifest contained at least one RO URI
-        assert self.rouri is not None
+        if not (lazy and self._isLocal()):
+            self._loadManifest()
+        return
+
+    @property
+    def manifestgraph(self):
+        """
+        Manifest graph, which is read when first accessed if the RO was opened lazily
+        """
+        return self._loadManifest()
+
+    @manifestgraph.setter
+    def manifestgraph(self, graph):
+        self._manifestgraph = graph
         return
 
     def _isLocal(self):
@@ -85,28 +199,105 @@ class ro_metadata(object):
         return self.getComponentUri(ro_settings.MANIFEST_DIR+"/"+ro_settings.MANIFEST_FILE)
 
     def _loadManifest(self):
-        if self.manifestgraph != None: return self.manifestgraph
+        if self._manifestgraph is not None: return self._manifestgraph
         if self.dummyfortest:
             # Fake minimal manifest graph for testing
             self.manifestgraph = rdflib.Graph()
-            self.manifestgraph.add( (self.rouri, RDF.type, RO.ResearchObject) )
+            self._manifestgraph.add( (self.rouri, RDF.type, RO.ResearchObject) )
             self.manifesturi   = self.rouri
         elif self._isLocal():
             # Read manifest graph
-            self.manifestgraph = rdflib.Graph()
-            for (prefix, uri) in ro_prefixes.prefixes:
-                self.manifestgraph.bind(prefix, rdflib.namespace.Namespace(uri))
             self.manifesturi   = self._getLocalManifestUri()
-            self.manifestgraph.parse(self.manifesturi)
+            journalfile = self._getManifestJournalFilename()
+            if os.path.exists(journalfile):
+                with ro_journal.lockJournal(journalfile) as jf:
+                    self.manifestgraph = self._readManifestFile(jf)
+            else:
+                self.manifestgraph = self._readManifestFile(None)
         else:
             (status, reason, _h, manifesturi, manifest) = self.rosrs.getROManifest(self.rouri)
             if status != 200:
                 msg = ("Can't access RO manifest (%03d %s)"%(status, reason))
                 raise ROSRS_Error(msg=msg, srsuri=self.rouri)
+            _bindPrefixes(manifest)
             self.manifestgraph = manifest 
             self.manifesturi   = manifesturi
         # log.debug("romanifest graph:\n"+self.manifestgraph.serialize())
-        return self.manifestgraph
+        # Get RO URI from manifest
+        # May be different from computed value if manifest has absolute URI
+        # Nested URIs may be present; ours is the one described by the manifest URI.
+        for s in self._manifestgraph.subjects(RDF.type, RO.ResearchObject):
+            if self._manifestgraph.value(s, ORE.isDescribedBy) == self.manifesturi:
+                self.rouri = s
+        # Check that the manifest contained at least one RO URI
+        assert self.rouri is not None
+        self._buildAnnotationIndex()
+        return self._manifestgraph
+
+    def _buildAnnotationIndex(self):
+        """
+        Build index of annotation stubs in the manifest graph, giving the annotation
+        nodes for each annotated resource and the body URI of each annotation node.
+        The index is maintained by _addManifestStatement and _removeManifestStatements.
+        """
+        self._annotationsbyresource = {}
+        self._annotationbodyuris    = {}
+        for p in ANNOTATION_TARGET_PREDICATES+[AO.body]:
+            for (s, o) in self.manifestgraph.subject_objects(predicate=p):
+                self._updateAnnotationIndex((s, p, o), True)
+        return
+
+    def _updateAnnotationIndex(self, stmt, add):
+        """
+        Update annotation stub index for a statement added to or removed from the manifest
+        """
+        (s, p, o) = stmt
+        if p in ANNOTATION_TARGET_PREDICATES:
+            if add:
+                self._annotationsbyresource.setdefault(o, set()).add(s)
+            elif o in self._annotationsbyresource:
+                self._annotationsbyresource[o].discard(s)
+                if not self._annotationsbyresource[o]:
+                    del self._annotationsbyresource[o]
+        elif p == AO.body:
+            if add:
+                self._annotationbodyuris[s] = o
+            elif self._annotationbodyuris.get(s) == o:
+                del self._annotationbodyuris[s]
+        return
+
+    def _readManifestFile(self, jf):
+        """
+        Read local manifest file and return RDF graph of its contents.
+
+        jf          is the manifest journal file, opened and locked, or None.  If
+                    supplied, the manifest is read preserving blank node identifiers,
+                    and the updates recorded in the journal are applied.
+        """
+        graph = self._newGraph(rdflib.Graph)
+        _bindPrefixes(graph)
+        if jf:
+            graph.parse(self.manifesturi, preserve_bnode_ids=True)
+            ro_journal.replayJournal(jf, graph)
+        else:
+            graph.parse(self.manifesturi)
+        return graph
+
+    def _newGraph(self, graphclass):
+        """
+        Create an empty manifest or annotation graph, using the in-memory store
+        selected by the "graph_store" configuration value: "compact" uses the
+        interned-term store in ro_store, and any other value the rdflib default store.
+
+        graphclass  is rdflib.Graph or rdflib.ConjunctiveGraph
+        """
+        if self.roconfig.get("graph_store", "default") == "compact":
+            return graphclass(store=ro_store.CompactStore())
+        return graphclass()
+
+    def _getManifestJournalFilename(self):
+        return os.path.join(self.getRoFilename(), ro_settings.MANIFEST_DIR,
+                            ro_settings.MANIFEST_JOURNAL_FILE)
 
     def getManifestGraph(self):
         """
@@ -116,12 +307,129 @@ class ro_metadata(object):
 
     def _updateManifest(self):
         """
-        Write updated manifest file for research object
+        Write updated manifest file for research object, or note that it is to be
+        written at the end of the current batch of updates (see batchUpdate).
+        """
+        assert self._isLocal()
+        if self._batchdepth > 0:
+            self._batchpending = True
+        else:
+            self._saveManifest()
+        return
+
+    def _saveManifest(self):
+        """
+        Save manifest updates, either by appending them to the manifest journal
+        (if journal mode is selected by the "manifest_journal" configuration option)
+        or by writing the manifest file.
+        """
+        if self._journalrecords is None:
+            self._writeManifest()
+        else:
+            self._appendManifestJournal()
+        if self._annotationindexchanged:
+            self._writeAnnotationIndex()
+        return
+
+    def _writeManifest(self):
+        """
+        Write manifest file for research object, emptying any manifest journal.
+        """
+        journalfile = self._getManifestJournalFilename()
+        if os.path.exists(journalfile):
+            with ro_journal.lockJournal(journalfile, exclusive=True) as jf:
+                self._writeManifestFile()
+                ro_journal.resetJournal(jf)
+        else:
+            self._writeManifestFile()
+        if self._journalrecords:
+            self._journalrecords = []
+        self._batchpending = False
+        return
+
+    def _appendManifestJournal(self):
+        """
+        Append manifest updates to the manifest journal.
+
+        If the journal has not been initialized, the manifest file is written in full
+        instead, so that the blank node identifiers used by subsequent journal records
+        are those in the manifest file (which may not be the case for a manifest written
+        by other means, such as "ro create").  Concurrent updates are safe once the
+        journal has been initialized by a journalled update or by compactManifest.
+        """
+        with ro_journal.lockJournal(self._getManifestJournalFilename(), exclusive=True) as jf:
+            if not ro_journal.isInitialized(jf):
+                self._writeManifestFile()
+                ro_journal.resetJournal(jf)
+            elif self._journalrecords:
+                ro_journal.appendRecords(jf, self._journalrecords)
+        self._journalrecords = []
+        self._batchpending   = False
+        return
+
+    def compactManifest(self):
+        """
+        Fold the manifest journal into the manifest file.  The manifest and journal
+        are re-read while the journal is locked, so that updates recorded by other
+        processes are included.
         """
         assert self._isLocal()
-        self._loadManifest().serialize(
-            destination=self.getManifestFilename(), format='xml',
-            base=self.rouri, xml_base="..")
+        if self._batchpending: self._saveManifest()
+        with ro_journal.lockJournal(self._getManifestJournalFilename(), exclusive=True) as jf:
+            self.manifestgraph = self._readManifestFile(jf)
+            self._buildAnnotationIndex()
+            self.roannotations     = None   # Flush cached annotation graph
+            self._annotationbodies = None
+            self._writeManifestFile()
+            ro_journal.resetJournal(jf)
+        return
+
+    def _writeManifestFile(self):
+        """
+        Write manifest file for research object.  The manifest is written to a
+        temporary file which is then renamed, so that readers never see a partially
+        written manifest.
+        """
+        manifestfile = self.getManifestFilename()
+        try:
+            filemode = stat.S_IMODE(os.stat(manifestfile).st_mode)
+        except OSError:
+            filemode = 0644
+        (fd, tempname) = tempfile.mkstemp(dir=os.path.dirname(manifestfile),
+                                          prefix=ro_settings.MANIFEST_FILE)
+        try:
+            with os.fdopen(fd, 'wb') as mf:
+                self._loadManifest().serialize(
+                    destination=mf, format='xml',
+                    base=self.rouri, xml_base="..")
+            os.chmod(tempname, filemode)
+            os.rename(tempname, manifestfile)
+        except:
+            os.remove(tempname)
+            raise
+        return
+
+    @contextlib.contextmanager
+    def batchUpdate(self):
+        """
+        Returns a context manager for a batch of updates to a local RO, during which
+        writing of the manifest file is deferred.  The manifest is written once, when
+        the outermost batch ends, if any update was made.  E.g.
+
+            with rometa.batchUpdate():
+                for rofile in rofiles:
+                    rometa.addSimpleAnnotation(rofile, attrname, attrvalue)
+
+        Updates made before an exception is raised in the batch are still written.
+        """
+        assert self._isLocal()
+        self._batchdepth += 1
+        try:
+            yield self
+        finally:
+            self._batchdepth -= 1
+            if self._batchdepth == 0 and self._batchpending:
+                self._saveManifest()
         return
 
     def _iterAnnotations(self, subject=None):
@@ -131,11 +439,17 @@ class ro_metadata(object):
         
         subject is URI of subject whose annotations are returned, or None.
         """
-        manifest = self._loadManifest()
+        self._loadManifest()
         if self._isLocal():
-            for (anode, p, subject) in manifest:
-                if p in [RO.annotatesAggregatedResource, AO.annotatesResource]:
-                    yield anode
+            if subject is None:
+                anodes = set()
+                for resnodes in self._annotationsbyresource.itervalues():
+                    anodes.update(resnodes)
+            else:
+                anodes = self._annotationsbyresource.get(subject, ())
+            # Copy, as callers may update the manifest while iterating
+            for anode in list(anodes):
+                yield anode
         else:
             for anode in self.rosrs.getROAnnotationUris(self.getRoUri(), subject):
                 yield anode
@@ -150,28 +464,207 @@ class ro_metadata(object):
         return (self.rouri, ORE.aggregates, resuri) in self.manifestgraph
 
     def _loadAnnotations(self):
-        if self.roannotations: return self.roannotations
+        if self.roannotations is not None: return self.roannotations
         log.debug("_loadannotations")
         # Assemble annotation graph
         # NOTE: the manifest itself is included as an annotation by the RO setup
         if self._isLocal():
-            manifest = self._loadManifest()
-            self.roannotations = rdflib.Graph()
-            annotation_uris_loaded = set()
+            self._loadManifest()
+            # One named graph per annotation body; the merged view is used for queries
+            self.roannotations     = self._newGraph(rdflib.ConjunctiveGraph)
+            self._annotationbodies = set()
+            # Common prefixes are bound before any body's own bindings are merged
+            _bindPrefixes(self.roannotations)
+            cache   = self._readAnnotationCache()
+            bodies  = {}
+            changed = False
+            bodyuris = []
             for anode in self._iterAnnotations():
-                auri = manifest.value(subject=anode, predicate=AO.body)
-                if auri not in annotation_uris_loaded:
-                    aref = self.getComponentUriRel(auri)
-                    log.debug("_loadAnnotations: aref "+str(aref))
-                    self._readAnnotationBody(aref, self.roannotations)
-                    annotation_uris_loaded.add(auri)
+                auri = self._annotationbodyuris.get(anode)
+                if auri not in self._annotationbodies:
+                    self._annotationbodies.add(auri)
+                    bodyuris.append(auri)
+            workers = int(self.roconfig.get("annotation_load_workers", 1))
+            parsed  = self._parseAnnotationBodies(bodyuris, cache, workers)
+            for auri in bodyuris:
+                (body, newbody) = self._getAnnotationBody(auri, cache, bodies, parsed)
+                self._addAnnotationBody(auri, body)
+                changed = changed or newbody
+            if changed or len(bodies) != len(cache):
+                self._writeAnnotationCache(bodies)
         else:
-            self.roannotations = self.rosrs.getROAnnotationGraph(self.rouri)
+            self.roannotations     = self.rosrs.getROAnnotationGraph(self.rouri)
+            self._annotationbodies = None
+            _bindPrefixes(self.roannotations)
         # log.debug("roannotations graph:\n"+self.roannotations.serialize())
-        for (prefix, uri) in ro_prefixes.prefixes:
-            self.manifestgraph.bind(prefix, rdflib.namespace.Namespace(uri))
         return self.roannotations
 
+    def _parseAnnotationBodies(self, bodyuris, cache, workers):
+        """
+        Parse annotation bodies that are not available from the annotation cache, using
+        a pool of worker processes.  Nothing is done unless more than one worker is
+        requested and there is more than one body to parse.
+
+        bodyuris    is a list of annotation body URIs
+        cache       is a dictionary of cached annotation bodies (see _readAnnotationCache)
+        workers     is the number of worker processes to use
+
+        Returns a dictionary keyed by annotation body URI string whose values are as
+        returned by _parseAnnotationBody.
+        """
+        if workers <= 1: return {}
+        annotationuris = []
+        for auri in bodyuris:
+            if auri == self.manifesturi: continue
+            annotationuri = str(self.getComponentUri(self.getComponentUriRel(auri)))
+            entry = cache.get(annotationuri)
+            stamp = self._getAnnotationStamp(annotationuri)
+            if not (stamp and entry and entry[0:2] == stamp):
+                annotationuris.append(annotationuri)
+        if len(annotationuris) <= 1: return {}
+        log.debug("_parseAnnotationBodies: %d bodies, %d workers"%(len(annotationuris), workers))
+        pool = multiprocessing.Pool(min(workers, len(annotationuris)))
+        try:
+            results = pool.map(_parseAnnotationBody, annotationuris)
+        finally:
+            pool.close()
+            pool.join()
+        return dict(zip(annotationuris, results))
+
+    def _getAnnotationBody(self, bodyuri, cache=None, bodies=None, parsed=None):
+        """
+        Return content of an annotation body for merging into the annotation graph.
+        The manifest is taken from the in-memory manifest graph, so that subsequent
+        changes to the manifest can be applied directly to the merged graph.
+
+        bodyuri     is the URI of an annotation body
+        cache       if supplied, is a dictionary of cached annotation bodies
+                    (see _readCachedAnnotationBody).
+        bodies      if supplied, is a dictionary to which a new cache entry for the
+                    annotation body is added.
+        parsed      if supplied, is a dictionary of already-parsed annotation bodies,
+                    as returned by _parseAnnotationBodies.
+
+        Returns a pair (body, newbody), as for _readCachedAnnotationBody.
+        """
+        if bodyuri == self.manifesturi:
+            manifest = self._loadManifest()
+            return ((list(manifest), list(manifest.namespaces())), False)
+        aref = self.getComponentUriRel(bodyuri)
+        log.debug("_getAnnotationBody: aref "+str(aref))
+        return self._readCachedAnnotationBody(aref,
+            cache if cache is not None else {}, bodies if bodies is not None else {},
+            parsed)
+
+    def _addAnnotationBody(self, bodyuri, body):
+        """
+        Add the content of an annotation body to the loaded annotation graph, as a
+        named graph whose name is the annotation body URI.
+
+        bodyuri     is the URI of the annotation body
+        body        is a pair containing a list of triples and a list of namespace
+                    prefix bindings, or None if the body could not be read.
+        """
+        self._annotationbodies.add(bodyuri)
+        if body:
+            (triples, namespaces) = body
+            for (prefix, nsuri) in _declaredNamespaces(namespaces):
+                self.roannotations.bind(prefix, nsuri, override=False)
+            self._addAnnotationTriples(bodyuri, triples)
+        return
+
+    def _addAnnotationTriples(self, bodyuri, triples):
+        """
+        Add triples to the named graph for an annotation body in the loaded annotation graph.
+
+        If the annotation graph has not been loaded, or the body is not one of those
+        loaded, there is nothing to do.  If the loaded annotation bodies are not known
+        (e.g. for a remote RO), the annotation graph is flushed.
+        """
+        if self.roannotations is None: return
+        if self._annotationbodies is None:
+            self.roannotations = None   # Flush cached annotation graph
+            return
+        if bodyuri in self._annotationbodies:
+            ctx = self.roannotations.get_context(bodyuri)
+            self.roannotations.addN( (s, p, o, ctx) for (s, p, o) in triples )
+        return
+
+    def _removeAnnotationTriples(self, bodyuri, triples):
+        """
+        Remove triples from the named graph for an annotation body in the loaded
+        annotation graph.  Triples that are also asserted by some other annotation body
+        remain in the merged view.
+        """
+        if self.roannotations is None: return
+        if self._annotationbodies is None:
+            self.roannotations = None   # Flush cached annotation graph
+            return
+        if bodyuri in self._annotationbodies:
+            ctx = self.roannotations.get_context(bodyuri)
+            for t in triples:
+                ctx.remove(t)
+        return
+
+    def _removeAnnotationBody(self, bodyuri):
+        """
+        Withdraw the content of an annotation body from the loaded annotation graph.
+        """
+        if self._annotationbodies and bodyuri in self._annotationbodies:
+            self.roannotations.remove_context(self.roannotations.get_context(bodyuri))
+            self._annotationbodies.discard(bodyuri)
+        return
+
+    def _getAnnotationBodyGraph(self, bodyuri):
+        """
+        Return an RDF graph with the content of an annotation body, copied from the
+        loaded annotation graph if available, otherwise read from the body resource.
+        """
+        if self._annotationbodies and bodyuri in self._annotationbodies:
+            anngr = rdflib.Graph()
+            anngr += self.roannotations.get_context(bodyuri)
+            return anngr
+        return self._readAnnotationBody(self.getComponentUriRel(bodyuri))
+
+    def _addManifestStatement(self, stmt):
+        """
+        Add a statement to the manifest graph, and to the loaded annotation graph if the
+        manifest is one of the annotation bodies.
+        """
+        self._addManifestStatements([stmt])
+        return
+
+    def _addManifestStatements(self, stmts):
+        """
+        Add statements from the supplied iterable to the manifest graph, and to the
+        loaded annotation graph if the manifest is one of the annotation bodies.
+        """
+        manifestgraph = self.manifestgraph
+        added = []
+        for stmt in stmts:
+            if stmt not in manifestgraph:
+                manifestgraph.add(stmt)
+                self._updateAnnotationIndex(stmt, True)
+                if self._journalrecords is not None:
+                    self._journalrecords.append((ro_journal.ADD, stmt))
+                added.append(stmt)
+        self._addAnnotationTriples(self.manifesturi, added)
+        return
+
+    def _removeManifestStatements(self, pattern):
+        """
+        Remove statements matching the supplied pattern from the manifest graph, and
+        from the loaded annotation graph if the manifest is one of the annotation bodies.
+        """
+        stmts = list(self.manifestgraph.triples(pattern))
+        for stmt in stmts:
+            self.manifestgraph.remove(stmt)
+            self._updateAnnotationIndex(stmt, False)
+            if self._journalrecords is not None:
+                self._journalrecords.append((ro_journal.REMOVE, stmt))
+        self._removeAnnotationTriples(self.manifesturi, stmts)
+        return
+
     def isInternalResource(self, resuri):
         '''
         Check if the resource is internal, i.e. should the resource content be uploaded
@@ -208,7 +701,12 @@ class ro_metadata(object):
         assert self._isLocal()
         af = ro_annotation.createAnnotationBody(
             self.roconfig, self.getRoFilename(), roresource, attrdict, defaultType)
-        return os.path.join(ro_settings.MANIFEST_DIR+"/", af)
+        annfile = os.path.join(ro_settings.MANIFEST_DIR+"/", af)
+        subject = ro_manifest.getComponentUri(self.getRoFilename(), roresource)
+        self._setAnnotationIndexEntry(annfile,
+            [ (subject, ro_annotation.getAnnotationByName(self.roconfig, k, defaultType)[0])
+              for k in attrdict ])
+        return annfile
 
     def _createAnnotationGraphBody(self, roresource, anngraph):
         """
@@ -230,7 +728,9 @@ class ro_metadata(object):
         assert self._isLocal()
         af = ro_annotation.createAnnotationGraphBody(
             self.roconfig, self.getRoFilename(), roresource, anngraph)
-        return os.path.join(ro_settings.MANIFEST_DIR+"/", af)
+        annfile = os.path.join(ro_settings.MANIFEST_DIR+"/", af)
+        self._setAnnotationIndexEntry(annfile, [ (s, p) for (s, p, o) in anngraph ])
+        return annfile
 
     def _readAnnotationBody(self, annotationref, anngr=None):
         """
@@ -243,11 +743,7 @@ class ro_metadata(object):
         assert self._isLocal()
         log.debug("_readAnnotationBody %s"%(annotationref))
         annotationuri    = self.getComponentUri(annotationref)
-        annotationformat = "xml"
-        # Look at file extension to figure format
-        # (rdflib.Graph.parse says;
-        #   "used if format can not be determined from the source")
-        if re.search("\.(ttl|n3)$", annotationuri): annotationformat="n3"
+        annotationformat = _getAnnotationFormat(annotationuri)
         if anngr == None:
             log.debug("_readAnnotationBody: new graph")
             anngr = rdflib.Graph()
@@ -264,6 +760,259 @@ class ro_metadata(object):
             anngr = None
         return anngr
 
+    def _getAnnotationStamp(self, annotationuri):
+        """
+        Return (size, mtime) of a local annotation body file, or None.
+        """
+        if isFileUri(annotationuri):
+            try:
+                st = os.stat(getFilenameFromUri(annotationuri))
+                return (st.st_size, st.st_mtime)
+            except OSError:
+                pass
+        return None
+
+    def _readCachedAnnotationBody(self, annotationref, cache, bodies, parsed=None):
+        """
+        Read annotation body from indicated resource, using triples from the annotation
+        cache if the body is a local file whose size and modification time are unchanged
+        since the cache was written.
+
+        annotationref   is a URI reference of an annotation, possibly relative to the RO base URI
+        cache           is a dictionary of cached annotation bodies, as returned by
+                        _readAnnotationCache.
+        bodies          is a dictionary to which a new cache entry for the annotation
+                        body is added.
+        parsed          if supplied, is a dictionary of annotation bodies already parsed
+                        by worker processes, keyed by URI, that is used in place of
+                        reading the body.
+
+        Returns a pair (body, newbody), where body is a pair containing a list of
+        the triples in the annotation body and a list of the namespace prefix
+        bindings declared by it, or None if it cannot be read, and newbody is True
+        if a new cache entry was created for the body.
+        """
+        if parsed is None: parsed = {}
+        annotationuri = str(self.getComponentUri(annotationref))
+        stamp = self._getAnnotationStamp(annotationuri)
+        entry = cache.get(annotationuri)
+        if stamp and entry and entry[0:2] == stamp:
+            bodies[annotationuri] = entry
+            return (entry[2:4], False)
+        if annotationuri in parsed:
+            body = parsed[annotationuri]
+        else:
+            anngr = self._readAnnotationBody(annotationref)
+            body  = None if anngr is None else (list(anngr), list(anngr.namespaces()))
+        if body is None:
+            return (None, False)
+        if stamp:
+            bodies[annotationuri] = stamp + body
+        return (body, stamp is not None)
+
+    def _getAnnotationCacheFilename(self):
+        return os.path.join(self.getRoFilename(), ro_settings.MANIFEST_DIR,
+                            ro_settings.ANNOTATIONS_CACHE_FILE)
+
+    def _readAnnotationCache(self):
+        """
+        Read cache of annotation body triples for a local RO.
+
+        Returns a dictionary keyed by annotation body URI, where each value is a
+        (size, mtime, triples, namespaces) tuple.  If there is no usable cache, an empty
+        dictionary is returned.
+        """
+        try:
+            with open(self._getAnnotationCacheFilename(), "r") as cf:
+                cache = json.load(cf)
+            if cache.get("version") != ro_settings.ANNOTATIONS_CACHE_VERSION:
+                log.debug("_readAnnotationCache: ignoring cache version %s"%(cache.get("version")))
+                return {}
+            bodies = {}
+            for entry in cache["bodies"]:
+                triples    = [ tuple(map(_termFromJson, t)) for t in entry["triples"] ]
+                namespaces = [ (p, rdflib.URIRef(n)) for (p, n) in entry["namespaces"] ]
+                bodies[str(entry["uri"])] = (entry["size"], entry["mtime"], triples, namespaces)
+            return bodies
+        except IOError:
+            pass
+        except Exception as e:
+            log.debug("_readAnnotationCache: unreadable cache: %s"%(repr(e)))
+        return {}
+
+    def _writeAnnotationCache(self, bodies):
+        """
+        Write cache of annotation body triples for a local RO.  The cache is written
+        to a temporary file which is then renamed, so concurrent readers never see a
+        partially written cache.  Failure to write the cache is not an error.
+
+        bodies      is a dictionary of cached annotation bodies, in the form returned
+                    by _readAnnotationCache.
+        """
+        cache = (
+            { "version":    ro_settings.ANNOTATIONS_CACHE_VERSION
+            , "bodies":     [ { "uri":          uri
+                              , "size":         size
+                              , "mtime":        mtime
+                              , "triples":      [ map(_termToJson, t) for t in triples ]
+                              , "namespaces":   [ [p, unicode(n)]
+                                                  for (p, n) in _declaredNamespaces(namespaces) ]
+                              }
+                              for (uri, (size, mtime, triples, namespaces)) in bodies.items() ]
+            })
+        cachefile = self._getAnnotationCacheFilename()
+        try:
+            (fd, tempname) = tempfile.mkstemp(dir=os.path.dirname(cachefile),
+                                              prefix=ro_settings.ANNOTATIONS_CACHE_FILE)
+            with os.fdopen(fd, "w") as cf:
+                json.dump(cache, cf)
+            os.rename(tempname, cachefile)
+        except (IOError, OSError) as e:
+            log.debug("_writeAnnotationCache: %s"%(repr(e)))
+        return
+
+    def _getAnnotationIndexFilename(self):
+        return os.path.join(self.getRoFilename(), ro_settings.MANIFEST_DIR,
+                            ro_settings.ANNOTATIONS_INDEX_FILE)
+
+    def _getAnnotationIndex(self):
+        """
+        Return index of the annotation bodies of a local RO that assert each
+        (subject, predicate) pair, reading it from the RO metadata directory if needed.
+
+        The index is a dictionary keyed by (subject, predicate) pairs of URI strings,
+        where each value is a set of annotation body URI strings.  The (size, mtime)
+        of each body file when indexed, and the pairs it asserts, are held in
+        self._annotationindexbodies, keyed by annotation body URI string.
+        """
+        if self._annotationindex is None:
+            self._annotationindex       = {}
+            self._annotationindexbodies = {}
+            try:
+                with open(self._getAnnotationIndexFilename(), "r") as xf:
+                    index = json.load(xf)
+                if index.get("version") == ro_settings.ANNOTATIONS_INDEX_VERSION:
+                    for (annotationuri, (size, mtime, keys)) in index["bodies"].items():
+                        self._addAnnotationIndexEntry(str(annotationuri), (size, mtime),
+                            [ tuple(k) for k in keys ])
+            except IOError:
+                pass
+            except Exception as e:
+                log.debug("_getAnnotationIndex: unreadable index: %s"%(repr(e)))
+                self._annotationindex       = {}
+                self._annotationindexbodies = {}
+        return self._annotationindex
+
+    def _writeAnnotationIndex(self):
+        """
+        Write annotation body index to the RO metadata directory.  Failure to write
+        the index is not an error.
+        """
+        self._getAnnotationIndex()
+        index = (
+            { "version":    ro_settings.ANNOTATIONS_INDEX_VERSION
+            , "bodies":     dict( (annotationuri, [size, mtime, [ list(k) for k in keys ]])
+                                  for (annotationuri, ((size, mtime), keys))
+                                  in self._annotationindexbodies.items() )
+            })
+        indexfile = self._getAnnotationIndexFilename()
+        try:
+            (fd, tempname) = tempfile.mkstemp(dir=os.path.dirname(indexfile),
+                                              prefix=ro_settings.ANNOTATIONS_INDEX_FILE)
+            with os.fdopen(fd, "w") as xf:
+                json.dump(index, xf)
+            os.rename(tempname, indexfile)
+        except (IOError, OSError) as e:
+            log.debug("_writeAnnotationIndex: %s"%(repr(e)))
+        self._annotationindexchanged = False
+        return
+
+    def _addAnnotationIndexEntry(self, annotationuri, stamp, keys):
+        """
+        Add index entry for an annotation body, replacing any previous entry
+        """
+        self._removeAnnotationIndexEntry(annotationuri)
+        self._annotationindexbodies[annotationuri] = (stamp, frozenset(keys))
+        for k in keys:
+            self._annotationindex.setdefault(k, set()).add(annotationuri)
+        return
+
+    def _removeAnnotationIndexEntry(self, annotationuri):
+        """
+        Remove index entry for an annotation body, if present
+        """
+        (_, keys) = self._annotationindexbodies.pop(annotationuri, (None, []))
+        for k in keys:
+            self._annotationindex[k].discard(annotationuri)
+            if not self._annotationindex[k]:
+                del self._annotationindex[k]
+        return
+
+    def _setAnnotationIndexEntry(self, annotationref, keys):
+        """
+        Record the (subject, predicate) pairs asserted by an annotation body file.
+        Pairs with a blank node subject are not recorded.
+        """
+        annotationuri = str(self.getComponentUri(annotationref))
+        stamp = self._getAnnotationStamp(annotationuri)
+        if stamp:
+            self._getAnnotationIndex()
+            self._addAnnotationIndexEntry(annotationuri, stamp,
+                set( (unicode(s), unicode(p)) for (s, p) in keys
+                     if not isinstance(s, rdflib.BNode) ))
+            self._annotationindexchanged = True
+        return
+
+    def _annotationBodyAsserts(self, bodyuri, subject, predicate):
+        """
+        Test if an annotation body contains any statement with the supplied subject
+        and predicate.
+
+        The index is used for a body whose size and modification time are unchanged
+        since it was indexed; a body that has changed, or is not indexed, is read and
+        indexed.
+        """
+        if bodyuri == self.manifesturi:
+            return (subject, predicate, None) in self._loadManifest()
+        annotationuri = str(self.getComponentUri(bodyuri))
+        key    = (unicode(subject), unicode(predicate))
+        bodies = self._getAnnotationIndex().get(key, ())
+        entry  = self._annotationindexbodies.get(annotationuri)
+        if entry and entry[0] == self._getAnnotationStamp(annotationuri):
+            return annotationuri in bodies
+        anngr = self._getAnnotationBodyGraph(bodyuri)
+        keys  = [ (s, p) for (s, p, o) in anngr ] if anngr is not None else []
+        self._setAnnotationIndexEntry(bodyuri, keys)
+        return (subject, predicate) in keys
+
+    def _findAnnotationValues(self, rofile, subject, predicate, val):
+        """
+        Find RO metadata annotation bodies for a resource that contain a given annotation
+        value, and prepare to remove it by creating new annotation bodies without it.
+
+        Returns a pair (remove_annotations, add_annotations) of annotation nodes to be
+        removed from the manifest, and new annotation bodies to be added to it.
+        """
+        add_annotations    = []
+        remove_annotations = []
+        for ann_node in self._iterAnnotations(subject=subject):
+            ann_uri   = self._annotationbodyuris.get(ann_node)
+            log.debug("_findAnnotationValues ann_uri %s"%(str(ann_uri)))
+            if ( self.isRoMetadataRef(ann_uri) and
+                 self._annotationBodyAsserts(ann_uri, subject, predicate) ):
+                ann_graph = self._getAnnotationBodyGraph(ann_uri)
+                if (subject, predicate, val) in ann_graph:
+                    ann_graph.remove((subject, predicate, val))
+                    if (subject, None, None) in ann_graph:
+                        # Triples remain in annotation body: write new body and update RO graph
+                        ann_name = self._createAnnotationGraphBody(rofile, ann_graph)
+                        remove_annotations.append(ann_node)
+                        add_annotations.append(ann_name)
+                    else:
+                        # Remove annotation from RO graph
+                        remove_annotations.append(ann_node)
+        return (remove_annotations, add_annotations)
+
     def _addAnnotationToManifest(self, rofile, annfile):
         """
         Add a new annotation body to an RO graph
@@ -284,16 +1033,19 @@ class ro_metadata(object):
         ann     = rdflib.BNode()
         resuri  = self.getComponentUri(rofile)
         bodyuri = self.getComponentUriAbs(annfile)
-        self.manifestgraph.add((ann, RDF.type, RO.AggregatedAnnotation))
-        self.manifestgraph.add((ann, RO.annotatesAggregatedResource, resuri))
-        self.manifestgraph.add((ann, AO.body, bodyuri))
+        self._addManifestStatement((ann, RDF.type, RO.AggregatedAnnotation))
+        self._addManifestStatement((ann, RO.annotatesAggregatedResource, resuri))
+        self._addManifestStatement((ann, AO.body, bodyuri))
         # Aggregate the annotation
-        self.manifestgraph.add((self.getRoUri(), ORE.aggregates, ann))
+        self._addManifestStatement((self.getRoUri(), ORE.aggregates, ann))
         # Aggregate annotation body if it is RO metadata.
         # Otherwise aggregation is the caller's responsibility
         if self.isRoMetadataRef(bodyuri):
-            self.manifestgraph.add((self.getRoUri(), ORE.aggregates, bodyuri))
-        self.roannotations = None   # Flush cached annotation graph
+            self._addManifestStatement((self.getRoUri(), ORE.aggregates, bodyuri))
+        # Merge new annotation body into loaded annotation graph
+        if self._annotationbodies is not None and bodyuri not in self._annotationbodies:
+            (body, _) = self._getAnnotationBody(bodyuri)
+            self._addAnnotationBody(bodyuri, body)
         return
 
     def _removeAnnotationFromManifest(self, ann):
@@ -304,13 +1056,18 @@ class ro_metadata(object):
         """
         assert self._isLocal()
         bodyuri = self.manifestgraph.value(subject=ann, predicate=AO.body)
-        self.manifestgraph.remove((ann, None, None   ))
-        # If annotation body is RO Metadata, and there are no other uses as an annotation,
-        # remove it from the RO aggregation.
-        if self.isRoMetadataRef(bodyuri):
-            if not self.manifestgraph.value(subject=ann, predicate=AO.body):
-                self.manifestgraph.remove((None, ORE.aggregates, bodyuri))
-        self.roannotations = None   # Flush cached annotation graph
+        self._removeManifestStatements((ann, None, None   ))
+        # If there are no other uses of the annotation body, withdraw its content from
+        # the loaded annotation graph, and if it is RO Metadata remove it from the RO
+        # aggregation.
+        if (None, AO.body, bodyuri) not in self.manifestgraph:
+            if self.isRoMetadataRef(bodyuri):
+                self._removeManifestStatements((None, ORE.aggregates, bodyuri))
+            self._removeAnnotationBody(bodyuri)
+            self._getAnnotationIndex()
+            if str(bodyuri) in self._annotationindexbodies:
+                self._removeAnnotationIndexEntry(str(bodyuri))
+                self._annotationindexchanged = True
         return
 
     def addAggregatedResources(self, ro_file, recurse=True, includeDirs=False):
@@ -318,8 +1075,6 @@ class ro_metadata(object):
         Scan a local directory and add files found to the RO aggregation
         """
         assert self._isLocal()
-        def notHidden(f):
-            return re.match("\.|.*/\.", f) == None
         log.debug("addAggregatedResources: roref %s, file %s"%(self.roref, ro_file))
         self.getRoFilename()  # Check that we have one
         basedir = os.path.abspath(self.roref)+os.path.sep
@@ -331,26 +1086,22 @@ class ro_metadata(object):
             #if ro_file.endswith(os.path.sep):
             #    ro_file = ro_file[0:-1]
             if recurse:
-                rofiles = filter(notHidden,
-                    MiscUtils.ScanDirectories.CollectDirectoryContents(ro_file, 
+                # Hidden directories are skipped without being scanned
+                rofiles = MiscUtils.ScanDirectories.IterDirectoryContents(ro_file,
                           baseDir=basedir,
                           listDirs=includeDirs, 
                           listFiles=True, 
                           recursive=recurse, 
-                          appendSep=True
+                          appendSep=True,
+                          listHidden=False
                           )
-                    )
-                log.debug("- rofiles: %s"%(repr(rofiles)))
             else:
                 rofiles = [ro_file.split(basedir+os.path.sep,1)[-1]]
         else:
             rofiles = [self.getComponentUriRel(ro_file)]
         s = self.getRoUri()
-        for f in rofiles:
-            ### print "- file %s"%f
-            log.debug("- file %s"%f)
-            stmt = (s, ORE.aggregates, self.getComponentUri(f))
-            if stmt not in self.manifestgraph: self.manifestgraph.add(stmt)
+        self._addManifestStatements(
+            (s, ORE.aggregates, self.getComponentUri(f)) for f in rofiles )
         self._updateManifest()
         return
 
@@ -366,7 +1117,7 @@ class ro_metadata(object):
         manifest = self._loadManifest()
         for anode in self._iterAnnotations(subject=resuri):
             self._removeAnnotationFromManifest(anode)
-        manifest.remove((None, ORE.aggregates, resuri))
+        self._removeManifestStatements((None, ORE.aggregates, resuri))
         self._updateManifest()
         return
 
@@ -377,6 +1128,10 @@ class ro_metadata(object):
         Each value returned by the iterator is an aggregated resource URI
         """
         log.debug("getAggregatedResources: uri %s"%(self.rouri))
+        if self._manifestgraph is None and self._isLocal():
+            for r in self._getManifestSummary()[1]:
+                yield r
+            return
         for r in self._loadManifest().objects(subject=self.rouri, predicate=ORE.aggregates):
             if not isinstance(r, rdflib.BNode):
                 yield r
@@ -441,27 +1196,11 @@ class ro_metadata(object):
         subject     = self.getComponentUri(rofile)
         (predicate,valtype) = ro_annotation.getAnnotationByName(self.roconfig, attrname)
         val         = attrvalue and ro_annotation.makeAnnotationValue(self.roconfig, attrvalue, valtype)
-        add_annotations    = []
-        remove_annotations = []
         log.debug("removeSimpleAnnotation subject %s, predicate %s, val %s"%
                   (str(subject), str(predicate), val))
         # Scan for annotation graph resources containing this annotation
-        for ann_node in self._iterAnnotations(subject=subject):
-            ann_uri   = ro_graph.value(subject=ann_node, predicate=AO.body)
-            log.debug("removeSimpleAnnotation ann_uri %s"%(str(ann_uri)))
-            if self.isRoMetadataRef(ann_uri):
-                ann_graph = self._readAnnotationBody(self.getComponentUriRel(ann_uri))
-                log.debug("removeSimpleAnnotation ann_graph %s"%(ann_graph))
-                if (subject, predicate, val) in ann_graph:
-                    ann_graph.remove((subject, predicate, val))
-                    if (subject, None, None) in ann_graph:
-                        # Triples remain in annotation body: write new body and update RO graph
-                        ann_name = self._createAnnotationGraphBody(rofile, ann_graph)
-                        remove_annotations.append(ann_node)
-                        add_annotations.append(ann_name)
-                    else:
-                        # Remove annotation from RO graph
-                        remove_annotations.append(ann_node)
+        (remove_annotations, add_annotations) = self._findAnnotationValues(
+            rofile, subject, predicate, val)
         # Update RO manifest graph if needed
         if add_annotations or remove_annotations:
             for a in remove_annotations:
@@ -486,11 +1225,10 @@ class ro_metadata(object):
         (predicate,valtype) = ro_annotation.getAnnotationByName(self.roconfig, attrname)
         log.debug("Replace annotation: subject %s, predicate %s, value %s"%
                   (repr(subject), repr(predicate), repr(attrvalue)))
-        ro_graph.remove((subject, predicate, None))
-        ro_graph.add((subject, predicate,
-                      ro_annotation.makeAnnotationValue(self.roconfig, attrvalue, valtype)))
+        self._removeManifestStatements((subject, predicate, None))
+        self._addManifestStatement((subject, predicate,
+            ro_annotation.makeAnnotationValue(self.roconfig, attrvalue, valtype)))
         self._updateManifest()
-        self.roannotations = None   # Flush cached annotation graph
         return
 
     def iterateAnnotations(self, subject=None, property=None):
@@ -556,8 +1294,11 @@ class ro_metadata(object):
         Runs a query over the combined annotation graphs (including the manifest)
         and returns True or False (for ASK queries) or a list of dictionaries of
         query results (for SELECT queries).
+
+        query       is a SPARQL query string, or a query prepared by
+                    rdflib.plugins.sparql.prepareQuery.
         """
-        log.debug("queryAnnotations: \n----\n%s\n--------\n"%(query))
+        log.debug("queryAnnotations: \n----\n%s\n--------\n", query)
         ann_gr = self._loadAnnotations()
         # log.debug("queryAnnotations graph: \n----\n%s\n--------\n"%(ann_gr.serialize(format='xml')))
         try:
@@ -591,12 +1332,12 @@ class ro_metadata(object):
         return
     
     def replaceUri(self, ann_node, remote_ann_node_uri):
-        for (p, o) in self.manifestgraph.predicate_objects(subject = ann_node):
-            self.manifestgraph.remove((ann_node, p, o))
-            self.manifestgraph.add((remote_ann_node_uri, p, o))
-        for (s, p) in self.manifestgraph.subject_predicates(object = ann_node):
-            self.manifestgraph.remove((s, p, ann_node))
-            self.manifestgraph.add((s, p, remote_ann_node_uri))
+        for (p, o) in list(self.manifestgraph.predicate_objects(subject = ann_node)):
+            self._removeManifestStatements((ann_node, p, o))
+            self._addManifestStatement((remote_ann_node_uri, p, o))
+        for (s, p) in list(self.manifestgraph.subject_predicates(object = ann_node)):
+            self._removeManifestStatements((s, p, ann_node))
+            self._addManifestStatement((s, p, remote_ann_node_uri))
         self._updateManifest()
         return
 
@@ -628,9 +1369,99 @@ class ro_metadata(object):
 
     def getRoMetadataDict(self):
         """
-        Returns dictionary of metadata about the RO from the manifest graph
+        Returns dictionary of metadata about the RO from the manifest graph.
+
+        If the manifest has not been read (see the lazy option when creating the
+        ro_metadata object), values are taken from the manifest summary (see
+        _getManifestSummary).
         """
         assert self._isLocal()
+        if self._manifestgraph is None:
+            return self._getManifestSummary()[0]
+        return self._makeRoMetadataDict()
+
+    def _getManifestSummary(self):
+        """
+        Returns a summary of the manifest of a local RO, as a pair of the RO metadata
+        dictionary and a list of aggregated resource URIs.
+
+        The summary is taken from a summary file saved in the RO metadata directory,
+        provided it is no older than the manifest and journal.  Otherwise the manifest
+        is read, and the summary file is refreshed.
+        """
+        stamp       = self._getManifestStamp()
+        summaryfile = os.path.join(self.getRoFilename(), ro_settings.MANIFEST_DIR,
+                                   ro_settings.MANIFEST_SUMMARY_FILE)
+        summary     = self._readManifestSummary(summaryfile, stamp)
+        if summary is None:
+            summary = (self._makeRoMetadataDict(), list(self.getAggregatedResources()))
+            self._writeManifestSummary(summaryfile, stamp, *summary)
+        return summary
+
+    def _getManifestStamp(self):
+        """
+        Return [size, mtime] of a local RO manifest file, and of its journal if present
+        """
+        stamp = []
+        for f in [self.getManifestFilename(), self._getManifestJournalFilename()]:
+            try:
+                st = os.stat(f)
+                stamp.extend([st.st_size, st.st_mtime])
+            except OSError:
+                pass
+        return stamp
+
+    def _readManifestSummary(self, summaryfile, stamp):
+        """
+        Read RO metadata dictionary and aggregated resource URIs from manifest summary
+        file, or return None if the file is missing, unreadable or does not match the
+        supplied manifest stamp.  The RO URI is set from the summary, as it would be
+        when reading the manifest.
+        """
+        try:
+            with open(summaryfile, "r") as sf:
+                summary = json.load(sf)
+        except (IOError, ValueError) as e:
+            log.debug("_readManifestSummary: %s"%(repr(e)))
+            return None
+        if ( summary.get("version") != ro_settings.MANIFEST_SUMMARY_VERSION or
+             summary.get("stamp")   != stamp ):
+            return None
+        manifestDict = {
+            'ropath':   self.getRoFilename(),
+            'rouri':    summary["rouri"],
+            }
+        for (k, v) in summary["values"].items():
+            manifestDict[str(k)] = _termFromJson(v)
+        if summary["rouri"]:
+            self.rouri = rdflib.URIRef(summary["rouri"])
+        return (manifestDict, map(rdflib.URIRef, summary["aggregates"]))
+
+    def _writeManifestSummary(self, summaryfile, stamp, manifestDict, aggregates):
+        """
+        Write RO metadata dictionary and aggregated resource URIs to manifest summary
+        file.  Failure to write the summary is not an error.
+        """
+        summary = (
+            { "version":    ro_settings.MANIFEST_SUMMARY_VERSION
+            , "stamp":      stamp
+            , "rouri":      manifestDict['rouri']
+            , "values":     dict( (k, _termToJson(v)) for (k, v) in manifestDict.items()
+                                  if k not in ['ropath', 'rouri'] )
+            , "aggregates": map(unicode, aggregates)
+            })
+        try:
+            (fd, tempname) = tempfile.mkstemp(dir=os.path.dirname(summaryfile),
+                                              prefix=ro_settings.MANIFEST_SUMMARY_FILE)
+            with os.fdopen(fd, "w") as sf:
+                json.dump(summary, sf)
+            os.rename(tempname, summaryfile)
+        except (IOError, OSError) as e:
+            log.debug("_writeManifestSummary: %s"%(repr(e)))
+        return
+
+    def _makeRoMetadataDict(self):
+        self._loadManifest()
         strsubject = ""
         if isinstance(self.rouri, rdflib.URIRef): strsubject = str(self.rouri)
         manifestDict = {
@@ -737,12 +1568,51 @@ class ro_metadata(object):
         '''
         Calculate a file checksum.
         '''
-        m = hashlib.md5()
-        with open(rofile) as f:
-            for line in f:
-                m.update(line)
-            f.close()
-        return m.hexdigest()
+        return self.calculateChecksums([rofile])[rofile]
+
+    def calculateChecksums(self, rofiles, workers=None):
+        '''
+        Calculate checksums for a list of files, returning a dictionary keyed by file name.
+
+        Checksums are saved in the synchronization registries with the size, mtime and
+        inode of each file, and are recalculated only if any of these has changed.  Files
+        to be read are hashed by a pool of threads, the size of which is given by the
+        "checksum_workers" configuration value if not supplied.  A file that cannot be
+        read is left out of the result when more than one file is requested.
+        '''
+        if workers is None:
+            workers = int(self.roconfig.get("checksum_workers", 4))
+        registries = self.getRegistries()
+        checksums  = {}
+        pending    = []
+        for rofile in rofiles:
+            try:
+                st    = os.stat(rofile)
+                stamp = [st.st_size, st.st_mtime, st.st_ino]
+            except OSError:
+                stamp = None
+            cached = registries.get("%s,checksumcache"%rofile)
+            if stamp and cached and cached[:3] == stamp:
+                checksums[rofile] = cached[3]
+            else:
+                pending.append((rofile, stamp))
+        if len(rofiles) == 1:
+            values = [ _calculateFileChecksum(rofile) for (rofile, _s) in pending ]
+        elif workers > 1 and len(pending) > 1:
+            pool = multiprocessing.pool.ThreadPool(min(workers, len(pending)))
+            try:
+                values = pool.map(_tryCalculateFileChecksum, [ rofile for (rofile, _s) in pending ])
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            values = [ _tryCalculateFileChecksum(rofile) for (rofile, _s) in pending ]
+        for ((rofile, stamp), checksum) in zip(pending, values):
+            if checksum is not None:
+                checksums[rofile] = checksum
+                if stamp:
+                    registries["%s,checksumcache"%rofile] = stamp + [checksum]
+        return checksums
 
 # End.
 
@@ -47,6 +47,10 @@ class PushResearchObject:
     
     def push(self):        
         mimetypes.init()
+        # Calculate checksums of changed local files in parallel before uploading
+        self._localRo.calculateChecksums(
+            [ ro_uriutils.getFilenameFromUri(r) for r in self._localRo.getAggregatedResources()
+              if self._localRo.isInternalResource(r) and ro_uriutils.isFileUri(r) ])
         for localResuri in self._localRo.getAggregatedResources():
             for (action, uri) in self.__uploadLocalResource(localResuri):
                 yield (action, uri)
@@ -57,9 +61,14 @@ class PushResearchObject:
                 yield (action, uri)
         self._remoteRo.reloadManifest()
                     
-        for (ann_node, ann_body, ann_target) in self._localRo.getAllAnnotationNodes():
-            for (action, uri) in self.__uploadLocalAnnotation(ann_node, ann_body, ann_target):
-                yield (action, uri)
+        # Local manifest updates are written once, before the results are reported,
+        # as a generator suspended in the batch may never be resumed to end it
+        uploaded = []
+        with self._localRo.batchUpdate():
+            for (ann_node, ann_body, ann_target) in list(self._localRo.getAllAnnotationNodes()):
+                uploaded.extend(self.__uploadLocalAnnotation(ann_node, ann_body, ann_target))
+        for (action, uri) in uploaded:
+            yield (action, uri)
         self._remoteRo.reloadManifest()
                 
         for (ann_node, ann_body, ann_target) in self._remoteRo.getAllAnnotationNodes():
@@ -18,5 +18,14 @@ MANIFEST_FILE   = "manifest.rdf"
 MANIFEST_FORMAT = "application/rdf+xml"
 MANIFEST_REF    = MANIFEST_DIR + "/" + MANIFEST_FILE
 REGISTRIES_FILE = ".registries.json"
+MANIFEST_JOURNAL_FILE     = "manifest.journal"
+MANIFEST_SUMMARY_FILE     = "manifest.summary"
+MANIFEST_SUMMARY_VERSION  = 2
+ANNOTATIONS_CACHE_FILE    = "annotations.cache"
+ANNOTATIONS_CACHE_VERSION = 2
+ANNOTATIONS_INDEX_FILE    = "annotations.index"
+ANNOTATIONS_INDEX_VERSION = 2
+EVALUATION_CACHE_FILE     = "evaluation.cache"
+EVALUATION_CACHE_VERSION  = 2
 
 # End.
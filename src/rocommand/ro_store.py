@@ -0,0 +1,292 @@
+# ro_store.py
+
+"""
+Compact in-memory RDF store for large research object graphs.
+
+RDF terms are interned to integer identifiers, and each statement is held as a
+row number in integer arrays of subject, predicate and object identifiers.  The
+statement row numbers for each subject, predicate and object identifier are held
+in SPO, POS and OSP indexes, so a pattern with any bound term is answered from the
+shortest applicable index entry.  An index entry for a single statement is held as
+a plain integer rather than an array.
+
+Each statement records the context (named graph) it was first added to; statements
+that are in more than one context have the others held separately.  Removed rows
+are reused by later additions, but interned terms are kept until the store is
+discarded.
+
+The store is context-aware, so it can be used with rdflib.ConjunctiveGraph or
+rdflib.Graph, e.g.:
+
+    graph = rdflib.ConjunctiveGraph(store=ro_store.CompactStore())
+
+Quoted (formula) statements are not supported.
+"""
+
+__author__      = "Graham Klyne (GK@ACM.ORG)"
+__copyright__   = "Copyright 2011-2013, University of Oxford"
+__license__     = "MIT (http://opensource.org/licenses/MIT)"
+
+import array
+import logging
+
+log = logging.getLogger(__name__)
+
+from rdflib.store import Store
+
+ROWTYPE = "i"       # array typecode for term identifiers and statement row numbers
+FREE    = -1        # subject identifier of unused statement row
+
+def _indexAdd(index, key, row):
+    entry = index.get(key)
+    if entry is None:
+        index[key] = row
+    elif isinstance(entry, int):
+        index[key] = array.array(ROWTYPE, [entry, row])
+    else:
+        entry.append(row)
+    return
+
+def _indexRemove(index, key, row):
+    entry = index[key]
+    if isinstance(entry, int):
+        del index[key]
+    else:
+        entry.remove(row)
+        if len(entry) == 1:
+            index[key] = entry[0]
+    return
+
+def _indexRows(index, key):
+    """
+    Returns a copy of the statement rows for a key, so the store can be updated
+    while the result is being used.
+    """
+    entry = index.get(key)
+    if entry is None:
+        return ()
+    if isinstance(entry, int):
+        return (entry,)
+    return entry[:]
+
+class CompactStore(Store):
+    """
+    Context-aware rdflib store using interned terms and array-backed indexes
+    """
+
+    context_aware = True
+    formula_aware = False
+
+    def __init__(self, configuration=None, identifier=None):
+        super(CompactStore, self).__init__(configuration)
+        self.identifier = identifier
+        self._namespace = {}
+        self._prefix    = {}
+        # Interned terms and contexts
+        self._termids   = {}
+        self._terms     = []
+        self._contextids = {}
+        self._contexts   = []
+        self._contextsize = {}
+        # Statement rows
+        self._s       = array.array(ROWTYPE)
+        self._p       = array.array(ROWTYPE)
+        self._o       = array.array(ROWTYPE)
+        self._c       = array.array(ROWTYPE)
+        self._morecontexts = {}         # row -> set of additional context ids
+        self._freerows = []
+        self._count    = 0
+        # Indexes: term id -> row or array of rows
+        self._spo     = {}
+        self._pos     = {}
+        self._osp     = {}
+        return
+
+    # Namespace bindings
+
+    def bind(self, prefix, namespace):
+        self._prefix[namespace] = prefix
+        self._namespace[prefix] = namespace
+        return
+
+    def namespace(self, prefix):
+        return self._namespace.get(prefix, None)
+
+    def prefix(self, namespace):
+        return self._prefix.get(namespace, None)
+
+    def namespaces(self):
+        return self._namespace.iteritems()
+
+    # Term and context interning
+
+    def _internTerm(self, term):
+        tid = self._termids.get(term)
+        if tid is None:
+            tid = len(self._terms)
+            self._termids[term] = tid
+            self._terms.append(term)
+        return tid
+
+    def _internContext(self, context):
+        cid = self._contextids.get(context)
+        if cid is None:
+            cid = len(self._contexts)
+            self._contextids[context] = cid
+            self._contexts.append(context)
+        if cid not in self._contextsize:
+            self._contextsize[cid] = 0
+        return cid
+
+    def _getContextId(self, context):
+        """
+        Returns identifier for a context in use, None for no context, or FREE for an
+        unknown context.
+        """
+        if context is None:
+            return None
+        cid = self._contextids.get(context)
+        if cid is None or cid not in self._contextsize:
+            return FREE
+        return cid
+
+    def _rowContexts(self, row):
+        cids = [self._c[row]]
+        if row in self._morecontexts:
+            cids.extend(self._morecontexts[row])
+        return cids
+
+    def _rowInContext(self, row, cid):
+        return ( cid is None or self._c[row] == cid or
+                 cid in self._morecontexts.get(row, ()) )
+
+    # Statement lookup
+
+    def _findRows(self, (subject, predicate, object)):
+        """
+        Returns candidate statement rows for a pattern, and the term identifiers used
+        to filter them.  Returns None if the pattern cannot match.
+        """
+        ids     = []
+        entries = []
+        for (term, index) in [(subject, self._spo), (predicate, self._pos), (object, self._osp)]:
+            if term is None:
+                ids.append(None)
+            else:
+                tid = self._termids.get(term)
+                if tid is None or tid not in index:
+                    return None
+                ids.append(tid)
+                entry = index[tid]
+                entries.append((1 if isinstance(entry, int) else len(entry), index, tid))
+        if entries:
+            (_n, index, tid) = min(entries)
+            rows = _indexRows(index, tid)
+        else:
+            rows = ( r for r in xrange(len(self._s)) if self._s[r] != FREE )
+        return (rows, ids)
+
+    def _matchRows(self, pattern, cid):
+        found = self._findRows(pattern)
+        if found is None:
+            return
+        (rows, (sid, pid, oid)) = found
+        for row in rows:
+            if ( self._s[row] != FREE and
+                 (sid is None or self._s[row] == sid) and
+                 (pid is None or self._p[row] == pid) and
+                 (oid is None or self._o[row] == oid) and
+                 self._rowInContext(row, cid) ):
+                yield row
+        return
+
+    def _rowTriple(self, row):
+        return (self._terms[self._s[row]], self._terms[self._p[row]], self._terms[self._o[row]])
+
+    def _rowContextGraphs(self, row):
+        return ( self._contexts[c] for c in self._rowContexts(row) )
+
+    # RDF APIs
+
+    def add(self, (subject, predicate, object), context, quoted=False):
+        assert not quoted, "CompactStore does not support quoted statements"
+        Store.add(self, (subject, predicate, object), context, quoted)
+        cid = self._internContext(context)
+        for row in self._matchRows((subject, predicate, object), None):
+            if not self._rowInContext(row, cid):
+                self._morecontexts.setdefault(row, set()).add(cid)
+                self._contextsize[cid] += 1
+            return
+        sid = self._internTerm(subject)
+        pid = self._internTerm(predicate)
+        oid = self._internTerm(object)
+        if self._freerows:
+            row = self._freerows.pop()
+            self._s[row] = sid
+            self._p[row] = pid
+            self._o[row] = oid
+            self._c[row] = cid
+        else:
+            row = len(self._s)
+            self._s.append(sid)
+            self._p.append(pid)
+            self._o.append(oid)
+            self._c.append(cid)
+        _indexAdd(self._spo, sid, row)
+        _indexAdd(self._pos, pid, row)
+        _indexAdd(self._osp, oid, row)
+        self._contextsize[cid] += 1
+        self._count += 1
+        return
+
+    def remove(self, (subject, predicate, object), context=None):
+        Store.remove(self, (subject, predicate, object), context=context)
+        cid = self._getContextId(context)
+        if cid == FREE:
+            return
+        for row in list(self._matchRows((subject, predicate, object), cid)):
+            if cid is None:
+                cids = self._rowContexts(row)
+            else:
+                cids = [cid]
+            for c in cids:
+                self._contextsize[c] -= 1
+            remaining = [ c for c in self._rowContexts(row) if c not in cids ]
+            self._morecontexts.pop(row, None)
+            if remaining:
+                self._c[row] = remaining[0]
+                if remaining[1:]:
+                    self._morecontexts[row] = set(remaining[1:])
+            else:
+                _indexRemove(self._spo, self._s[row], row)
+                _indexRemove(self._pos, self._p[row], row)
+                _indexRemove(self._osp, self._o[row], row)
+                self._s[row] = FREE
+                self._freerows.append(row)
+                self._count -= 1
+        if (subject, predicate, object) == (None, None, None) and cid is not None:
+            # Remove the whole context
+            del self._contextsize[cid]
+        return
+
+    def triples(self, (subject, predicate, object), context=None):
+        cid = self._getContextId(context)
+        if cid == FREE:
+            return
+        for row in self._matchRows((subject, predicate, object), cid):
+            yield (self._rowTriple(row), self._rowContextGraphs(row))
+        return
+
+    def contexts(self, triple=None):
+        if triple is None:
+            return ( self._contexts[c] for c in self._contextsize )
+        return ( c for row in self._matchRows(triple, None)
+                   for c in self._rowContextGraphs(row) )
+
+    def __len__(self, context=None):
+        cid = self._getContextId(context)
+        if cid is None:
+            return self._count
+        return self._contextsize.get(cid, 0)
+
+# End.
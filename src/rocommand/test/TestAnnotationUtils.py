@@ -258,6 +258,27 @@ class TestAnnotationUtils(TestROSupport.TestROSupport):
         testAnnotationFileName("a/",  "%s/%s/a/"%(rodir, ro_settings.MANIFEST_DIR))
         return
 
+    def testAllocateAnnotationFilename(self):
+        """
+        Test allocation of annotation body file names
+        """
+        rodir = self.createTestRo(testbase, "data/ro-test-1", "RO test annotation", "ro-testRoAnnotate")
+        name1 = ro_annotation.allocateAnnotationFilename(rodir, "file.txt")
+        self.assertRegexpMatches(name1, r"^Ann-\d\d\d\d\d\d\d\d-\d\d\d\d-file\.txt\.rdf$")
+        self.assertTrue(os.path.exists(ro_annotation.makeAnnotationFilename(rodir, name1)))
+        # Name taken by another writer is skipped
+        index1 = int(name1[13:17])
+        taken  = "%s%04d-file.txt.rdf"%(name1[:13], index1+1)
+        open(ro_annotation.makeAnnotationFilename(rodir, taken), "w").close()
+        name2 = ro_annotation.allocateAnnotationFilename(rodir, "file.txt")
+        self.assertEqual(name2, "%s%04d-file.txt.rdf"%(name1[:13], index1+2))
+        # New session continues from names already present
+        ro_annotation.annotationFileIndex.clear()
+        name3 = ro_annotation.allocateAnnotationFilename(rodir, "other.txt")
+        self.assertEqual(name3, "%s%04d-other.txt.rdf"%(name1[:13], index1+3))
+        self.deleteTestRo(rodir)
+        return
+
     def testCreateReadRoAnnotationBody(self):
         """
         Test function to create simple annotation body
@@ -668,6 +689,7 @@ def getTestSuite(select="unit"):
             , "testGetAnnotationByUri"
             , "testGetAnnotationNameByUri"
             , "testMakeAnnotationFilename"
+            , "testAllocateAnnotationFilename"
             , "testCreateReadRoAnnotationBody"
             , "testCreateReadFileAnnotationBody"
             , "testGetInitialRoAnnotations"
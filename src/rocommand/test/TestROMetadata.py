@@ -16,6 +16,7 @@ import unittest
 import logging
 import datetime
 import StringIO
+import hashlib
 try:
     # Running Python 2.5 with simplejson?
     import simplejson as json
@@ -36,6 +37,8 @@ from MiscUtils import TestUtils
 from rocommand import ro_settings
 from rocommand import ro_metadata
 from rocommand import ro_annotation
+from rocommand import ro_journal
+from rocommand import ro_store
 from rocommand.ro_namespaces import RDF, RO, AO, ORE, DCTERMS, ROTERMS
 from rocommand.ro_prefixes   import make_sparql_prefixes
 
@@ -71,6 +74,35 @@ class TestROMetadata(TestROSupport.TestROSupport):
         super(TestROMetadata, self).tearDown()
         return
 
+    def createAnnotatedTestRo(self, roname, annotations):
+        """
+        Create test research object with simple annotations
+
+        annotations is a list of (resource, attribute name, value) tuples.
+
+        Returns a pair of the research object directory and a list of the
+        annotation body file names created.
+        """
+        rodir = self.createTestRo(testbase, "data/ro-test-1", roname, "ro-testRoAnnotate")
+        romd  = ro_metadata.ro_metadata(ro_config, rodir)
+        annfiles = [ romd.addSimpleAnnotation(res, attrname, attrvalue)
+                     for (res, attrname, attrvalue) in annotations ]
+        return (rodir, annfiles)
+
+    def countAnnotationBodyReads(self, romd):
+        """
+        Record annotation bodies read by an ro_metadata object
+
+        Returns a list to which the reference of each annotation body read is appended.
+        """
+        reads = []
+        readAnnotationBody = romd._readAnnotationBody
+        def countingReadAnnotationBody(annotationref, anngr=None):
+            reads.append(annotationref)
+            return readAnnotationBody(annotationref, anngr)
+        romd._readAnnotationBody = countingReadAnnotationBody
+        return reads
+
     # Actual tests follow
 
     def testNull(self):
@@ -625,6 +657,396 @@ class TestROMetadata(TestROSupport.TestROSupport):
         self.deleteTestRo(rodir)
         return
 
+    def testAnnotationCache(self):
+        """
+        Test that annotations are loaded from the annotation cache when the bodies
+        are unchanged, and that a changed body is re-read.
+        """
+        roresource = "subdir1/subdir1-file.txt"
+        (rodir, [annfile, _]) = self.createAnnotatedTestRo("Test annotation cache",
+            [ (roresource, "title", "Cached title")
+            , (roresource, "type",  "Cached type")
+            ])
+        romd   = ro_metadata.ro_metadata(ro_config, rodir)
+        resuri = romd.getComponentUri(roresource)
+        self.assertEqual(romd.getAnnotationValue(resuri, DCTERMS.title), rdflib.Literal("Cached title"))
+        cachefile = os.path.join(rodir, ro_settings.MANIFEST_DIR, ro_settings.ANNOTATIONS_CACHE_FILE)
+        self.assertTrue(os.path.exists(cachefile))
+        # Unchanged RO: no annotation bodies are parsed
+        romd  = ro_metadata.ro_metadata(ro_config, rodir)
+        bodiesread = self.countAnnotationBodyReads(romd)
+        self.assertEqual(romd.getAnnotationValue(resuri, DCTERMS.title), rdflib.Literal("Cached title"))
+        self.assertEqual(romd.getAnnotationValue(resuri, DCTERMS.type), rdflib.Literal("Cached type"))
+        self.assertEqual(bodiesread, [])
+        # Changed body: only that body is parsed
+        g = rdflib.Graph()
+        g.add( (resuri, DCTERMS.title, rdflib.Literal("Updated cached title")) )
+        g.serialize(destination=os.path.join(rodir, annfile), format='xml')
+        romd  = ro_metadata.ro_metadata(ro_config, rodir)
+        bodiesread = self.countAnnotationBodyReads(romd)
+        self.assertEqual(romd.getAnnotationValue(resuri, DCTERMS.title), rdflib.Literal("Updated cached title"))
+        self.assertEqual(romd.getAnnotationValue(resuri, DCTERMS.type), rdflib.Literal("Cached type"))
+        self.assertEqual(len(bodiesread), 1)
+        self.assertEqual(str(romd.getComponentUri(bodiesread[0])), str(romd.getComponentUri(annfile)))
+        # Unreadable cache: annotation bodies are re-read and the cache is rebuilt
+        with open(cachefile, "w") as cf:
+            cf.write("not a cache")
+        romd  = ro_metadata.ro_metadata(ro_config, rodir)
+        self.assertEqual(romd.getAnnotationValue(resuri, DCTERMS.title), rdflib.Literal("Updated cached title"))
+        with open(cachefile, "r") as cf:
+            self.assertEqual(json.load(cf)["version"], ro_settings.ANNOTATIONS_CACHE_VERSION)
+        self.deleteTestRo(rodir)
+        return
+
+    def testAnnotationCachePrefixes(self):
+        """
+        Test that annotation graph prefixes are the same whether or not annotations
+        are loaded from the annotation cache.
+        """
+        (rodir, _) = self.createAnnotatedTestRo("Test annotation cache prefixes",
+            [ ("subdir1/subdir1-file.txt", "title", "Prefixed title") ])
+        cachefile = os.path.join(rodir, ro_settings.MANIFEST_DIR, ro_settings.ANNOTATIONS_CACHE_FILE)
+        for cached in (False, True):
+            self.assertEqual(os.path.exists(cachefile), cached)
+            romd = ro_metadata.ro_metadata(ro_config, rodir)
+            anntext = romd.getAnnotationGraph().serialize(format="turtle")
+            self.assertIn("dcterms:title", anntext)
+            self.assertNotIn("ns1:", anntext)
+        with open(cachefile, "r") as cf:
+            for body in json.load(cf)["bodies"]:
+                self.assertNotIn("ns1", [ p for (p, _) in body["namespaces"] ])
+        self.deleteTestRo(rodir)
+        return
+
+    def testIncrementalAnnotationUpdate(self):
+        """
+        Test that the loaded annotation graph is updated in place when annotations
+        are added, removed and replaced, and matches a freshly loaded graph.
+        """
+        rodir = self.createTestRo(testbase, "data/ro-test-1",
+            "Test incremental annotations", "ro-testRoAnnotate")
+        romd  = ro_metadata.ro_metadata(ro_config, rodir)
+        roresource = "subdir1/subdir1-file.txt"
+        resuri = romd.getComponentUri(roresource)
+        romd.addSimpleAnnotation(roresource, "type", "Incremental type")
+        anngraph = romd.getAnnotationGraph()
+        romd.addSimpleAnnotation(roresource, "title", "Incremental title")
+        romd.removeSimpleAnnotation(roresource, "type", "Incremental type")
+        romd.replaceSimpleAnnotation(".", "description", "Incremental description")
+        self.assertTrue(romd.getAnnotationGraph() is anngraph)
+        self.assertEqual(romd.getAnnotationValue(resuri, DCTERMS.title), rdflib.Literal("Incremental title"))
+        self.assertEqual(romd.getAnnotationValue(resuri, DCTERMS.type), None)
+        self.assertEqual(romd.getAnnotationValue(romd.getRoUri(), DCTERMS.description),
+                         rdflib.Literal("Incremental description"))
+        def groundTriples(g):
+            return set( t for t in g if not any(isinstance(n, rdflib.BNode) for n in t) )
+        romd2 = ro_metadata.ro_metadata(ro_config, rodir)
+        self.assertEqual(groundTriples(anngraph), groundTriples(romd2.getAnnotationGraph()))
+        self.assertEqual(len(anngraph), len(romd2.getAnnotationGraph()))
+        self.deleteTestRo(rodir)
+        return
+
+    def testAnnotationBodyGraphs(self):
+        """
+        Test that each annotation body is held as a separate named graph, and that
+        removing an annotation uses the loaded body rather than re-reading it.
+        """
+        roresource = "subdir1/subdir1-file.txt"
+        (rodir, [annfile, _]) = self.createAnnotatedTestRo("Test annotation body graphs",
+            [ (roresource, "title", "Body graph title")
+            , (roresource, "type",  "Body graph type")
+            ])
+        romd   = ro_metadata.ro_metadata(ro_config, rodir)
+        resuri = romd.getComponentUri(roresource)
+        anngraph = romd.getAnnotationGraph()
+        bodygraph = anngraph.get_context(romd.getComponentUriAbs(annfile))
+        self.assertEqual(list(bodygraph), [(resuri, DCTERMS.title, rdflib.Literal("Body graph title"))])
+        bodiesread = self.countAnnotationBodyReads(romd)
+        romd.removeSimpleAnnotation(roresource, "title", "Body graph title")
+        self.assertEqual(bodiesread, [])
+        self.assertEqual(len(bodygraph), 0)
+        self.assertEqual(romd.getAnnotationValue(resuri, DCTERMS.title), None)
+        self.assertEqual(romd.getAnnotationValue(resuri, DCTERMS.type), rdflib.Literal("Body graph type"))
+        self.deleteTestRo(rodir)
+        return
+
+    def testParallelAnnotationLoad(self):
+        """
+        Test that loading annotation bodies with worker processes gives the same
+        annotation graph as sequential loading.
+        """
+        rodir = self.createTestRo(testbase, "data/ro-test-1",
+            "Test parallel annotation load", "ro-testRoAnnotate")
+        romd  = ro_metadata.ro_metadata(ro_config, rodir)
+        roresource = "subdir1/subdir1-file.txt"
+        romd.addSimpleAnnotation(roresource, "title", "Parallel title")
+        romd.addSimpleAnnotation(roresource, "type", "Parallel type")
+        romd.addSimpleAnnotation(".", "description", "Parallel description")
+        cachefile = os.path.join(rodir, ro_settings.MANIFEST_DIR, ro_settings.ANNOTATIONS_CACHE_FILE)
+        def loadAnnotations(config):
+            if os.path.exists(cachefile): os.remove(cachefile)
+            romd = ro_metadata.ro_metadata(config, rodir)
+            return set( t for t in romd.getAnnotationGraph()
+                          if not any(isinstance(n, rdflib.BNode) for n in t) )
+        sequential = loadAnnotations(ro_config)
+        parallel   = loadAnnotations(dict(ro_config, annotation_load_workers=2))
+        self.assertEqual(parallel, sequential)
+        resuri = rdflib.URIRef(ro_metadata.ro_metadata(ro_config, rodir).getComponentUri(roresource))
+        self.assertIn((resuri, DCTERMS.title, rdflib.Literal("Parallel title")), parallel)
+        self.deleteTestRo(rodir)
+        return
+
+    def testIterAnnotationsBySubject(self):
+        """
+        Test that annotation stubs are selected by annotated resource, and that
+        removing a resource leaves annotations of other resources in place.
+        """
+        rodir = self.createTestRo(testbase, "data/ro-test-1",
+            "Test annotations by subject", "ro-testRoAnnotate")
+        romd  = ro_metadata.ro_metadata(ro_config, rodir)
+        res1 = "subdir1/subdir1-file.txt"
+        res2 = "subdir2/subdir2-file.txt"
+        romd.addSimpleAnnotation(res1, "title", "Title 1")
+        romd.addSimpleAnnotation(res1, "type", "Type 1")
+        romd.addSimpleAnnotation(res2, "title", "Title 2")
+        res1uri = romd.getComponentUri(res1)
+        res2uri = romd.getComponentUri(res2)
+        self.assertEqual(len(list(romd._iterAnnotations(subject=res1uri))), 2)
+        self.assertEqual(len(list(romd._iterAnnotations(subject=res2uri))), 1)
+        romd.removeAggregatedResource(res1uri)
+        self.assertEqual(list(romd._iterAnnotations(subject=res1uri)), [])
+        romd = ro_metadata.ro_metadata(ro_config, rodir)
+        self.assertEqual(list(romd._iterAnnotations(subject=res1uri)), [])
+        self.assertEqual(len(list(romd._iterAnnotations(subject=res2uri))), 1)
+        self.assertEqual(romd.getAnnotationValue(res2uri, DCTERMS.title), rdflib.Literal("Title 2"))
+        self.assertEqual(romd.getAnnotationValue(res1uri, DCTERMS.title), None)
+        self.deleteTestRo(rodir)
+        return
+
+    def testBatchUpdate(self):
+        """
+        Test that the manifest is written once at the end of a batch of updates
+        """
+        rodir = self.createTestRo(testbase, "data/ro-test-1",
+            "Test batch update", "ro-testRoAnnotate")
+        romd  = ro_metadata.ro_metadata(ro_config, rodir)
+        manifestwrites = []
+        def writeManifest():
+            manifestwrites.append(True)
+            return ro_metadata.ro_metadata._writeManifest(romd)
+        romd._writeManifest = writeManifest
+        res1 = "subdir1/subdir1-file.txt"
+        res2 = "subdir2/subdir2-file.txt"
+        with romd.batchUpdate():
+            romd.addSimpleAnnotation(res1, "title", "Batch title 1")
+            with romd.batchUpdate():
+                romd.addSimpleAnnotation(res2, "title", "Batch title 2")
+            romd.replaceSimpleAnnotation(".", "description", "Batch description")
+            self.assertEqual(manifestwrites, [])
+        self.assertEqual(manifestwrites, [True])
+        romd = ro_metadata.ro_metadata(ro_config, rodir)
+        self.assertEqual(romd.getAnnotationValue(romd.getComponentUri(res1), DCTERMS.title),
+                         rdflib.Literal("Batch title 1"))
+        self.assertEqual(romd.getAnnotationValue(romd.getComponentUri(res2), DCTERMS.title),
+                         rdflib.Literal("Batch title 2"))
+        self.assertEqual(romd.getAnnotationValue(romd.getRoUri(), DCTERMS.description),
+                         rdflib.Literal("Batch description"))
+        self.deleteTestRo(rodir)
+        return
+
+    def testManifestJournal(self):
+        """
+        Test that in journal mode manifest updates from concurrent writers are
+        recorded in the journal, and are folded into the manifest by compactManifest.
+        """
+        rodir = self.createTestRo(testbase, "data/ro-test-1",
+            "Test manifest journal", "ro-testRoAnnotate")
+        journal_config = dict(ro_config, manifest_journal=True)
+        romd  = ro_metadata.ro_metadata(journal_config, rodir)
+        res1 = "subdir1/subdir1-file.txt"
+        res2 = "subdir2/subdir2-file.txt"
+        romd.addSimpleAnnotation(res1, "title", "Journal title 1")
+        manifestfile = romd.getManifestFilename()
+        journalfile  = os.path.join(rodir, ro_settings.MANIFEST_DIR, ro_settings.MANIFEST_JOURNAL_FILE)
+        manifestsize = os.stat(manifestfile).st_size
+        # Two writers working from the same manifest
+        romd1 = ro_metadata.ro_metadata(journal_config, rodir)
+        romd2 = ro_metadata.ro_metadata(journal_config, rodir)
+        romd1.addSimpleAnnotation(res1, "type", "Journal type 1")
+        romd2.addSimpleAnnotation(res2, "title", "Journal title 2")
+        romd2.removeSimpleAnnotation(res1, "title", "Journal title 1")
+        self.assertEqual(os.stat(manifestfile).st_size, manifestsize)
+        self.assertTrue(os.stat(journalfile).st_size > 0)
+        def checkAnnotations(romd):
+            res1uri = romd.getComponentUri(res1)
+            res2uri = romd.getComponentUri(res2)
+            self.assertEqual(romd.getAnnotationValue(res1uri, DCTERMS.title), None)
+            self.assertEqual(romd.getAnnotationValue(res1uri, DCTERMS.type), rdflib.Literal("Journal type 1"))
+            self.assertEqual(romd.getAnnotationValue(res2uri, DCTERMS.title), rdflib.Literal("Journal title 2"))
+            self.assertEqual(len(list(romd._iterAnnotations())), 3)
+        checkAnnotations(ro_metadata.ro_metadata(ro_config, rodir))
+        ro_metadata.ro_metadata(ro_config, rodir).compactManifest()
+        self.assertEqual(open(journalfile).read(), ro_journal.HEADER)
+        checkAnnotations(ro_metadata.ro_metadata(ro_config, rodir))
+        self.deleteTestRo(rodir)
+        return
+
+    def testAnnotationBodyIndex(self):
+        """
+        Test that removing and replacing simple annotations reads only annotation
+        bodies that assert the annotated subject and predicate.
+        """
+        res1 = "subdir1/subdir1-file.txt"
+        (rodir, annfiles) = self.createAnnotatedTestRo("Test annotation body index",
+            [ (res1, "title",       "Index title 1")
+            , (res1, "description", "Index description 1")
+            , (res1, "type",        "Index type 1")
+            ])
+        # New session: the persisted index is used to select bodies to read
+        romd  = ro_metadata.ro_metadata(ro_config, rodir)
+        reads = self.countAnnotationBodyReads(romd)
+        romd.removeSimpleAnnotation(res1, "description", "Index description 1")
+        self.assertEqual(len(reads), 1)
+        # Replacing a value replaces it in the manifest only
+        romd.replaceSimpleAnnotation(res1, "title", "Index title 2")
+        res1uri = romd.getComponentUri(res1)
+        self.assertEqual(set(romd.getAnnotationValues(res1uri, DCTERMS.title)),
+                         set([rdflib.Literal("Index title 1"), rdflib.Literal("Index title 2")]))
+        romd  = ro_metadata.ro_metadata(ro_config, rodir)
+        self.assertEqual(set(romd.getAnnotationValues(res1uri, DCTERMS.title)),
+                         set([rdflib.Literal("Index title 1"), rdflib.Literal("Index title 2")]))
+        self.assertEqual(romd.getAnnotationValue(res1uri, DCTERMS.type),
+                         rdflib.Literal("Index type 1"))
+        self.assertEqual(romd.getAnnotationValue(res1uri, DCTERMS.description), None)
+        # The persisted index lists the bodies that assert each subject and predicate
+        self.assertEqual(len(romd._getAnnotationIndex()[(unicode(res1uri), unicode(DCTERMS.title))]), 1)
+        self.assertNotIn((unicode(res1uri), unicode(DCTERMS.description)), romd._getAnnotationIndex())
+        romd  = ro_metadata.ro_metadata(ro_config, rodir)
+        reads = self.countAnnotationBodyReads(romd)
+        romd.removeSimpleAnnotation(res1, "title", "Index title 1")
+        self.assertEqual(len(reads), 1)
+        self.assertEqual(list(romd.getAnnotationValues(res1uri, DCTERMS.title)),
+                         [rdflib.Literal("Index title 2")])
+        # A body changed outside RO manager is re-indexed
+        g = rdflib.Graph()
+        g.add( (res1uri, DCTERMS.type,  rdflib.Literal("Index type 1")) )
+        g.add( (res1uri, DCTERMS.title, rdflib.Literal("Index title 3")) )
+        g.serialize(destination=os.path.join(rodir, annfiles[2]), format='xml')
+        romd  = ro_metadata.ro_metadata(ro_config, rodir)
+        romd.removeSimpleAnnotation(res1, "title", "Index title 3")
+        self.assertEqual(list(romd.getAnnotationValues(res1uri, DCTERMS.title)),
+                         [rdflib.Literal("Index title 2")])
+        self.deleteTestRo(rodir)
+        return
+
+    def testLazyManifestSummary(self):
+        """
+        Test that RO metadata for a lazily opened RO is read from the manifest summary
+        file without parsing the manifest, and that the summary is refreshed when the
+        manifest changes.
+        """
+        rodir = self.createTestRo(testbase, "data/ro-test-1",
+            "Test lazy manifest", "ro-testRoLazy")
+        ro_metadata.ro_metadata(ro_config, rodir).addAggregatedResources(os.path.join(rodir, "subdir1"))
+        rodict = ro_metadata.ro_metadata(ro_config, rodir).getRoMetadataDict()
+        romd   = ro_metadata.ro_metadata(ro_config, rodir, lazy=True)
+        self.assertEqual(romd.getRoMetadataDict(), rodict)
+        summaryfile = os.path.join(rodir, ro_settings.MANIFEST_DIR, ro_settings.MANIFEST_SUMMARY_FILE)
+        self.assertTrue(os.path.exists(summaryfile))
+        romd   = ro_metadata.ro_metadata(ro_config, rodir, lazy=True)
+        romd._readManifestFile = None
+        self.assertEqual(romd.getRoMetadataDict(), rodict)
+        self.assertEqual(romd._manifestgraph, None)
+        # Aggregated resources are also taken from the summary
+        roaggs = set(ro_metadata.ro_metadata(ro_config, rodir).getAggregatedResources())
+        self.assertIn(romd.getComponentUri("subdir1/subdir1-file.txt"), roaggs)
+        self.assertEqual(set(romd.getAggregatedResources()), roaggs)
+        self.assertEqual(romd._manifestgraph, None)
+        # Update manifest: summary is no longer used
+        romd   = ro_metadata.ro_metadata(ro_config, rodir)
+        romd.replaceSimpleAnnotation("", "title", "Lazy title 2")
+        romd.addAggregatedResources(os.path.join(rodir, "README-ro-test-1"))
+        romd   = ro_metadata.ro_metadata(ro_config, rodir, lazy=True)
+        self.assertEqual(romd.getRoMetadataDict()['rotitle'], rdflib.Literal("Lazy title 2"))
+        self.assertEqual(romd.getRoMetadataDict()['roident'], rodict['roident'])
+        self.assertEqual(set(romd.getAggregatedResources()),
+                         roaggs | set([romd.getComponentUri("README-ro-test-1")]))
+        self.deleteTestRo(rodir)
+        return
+
+    def testCompactGraphStore(self):
+        """
+        Test that annotations held in the compact graph store give the same results
+        as the default store.
+        """
+        rodir = self.createTestRo(testbase, "data/ro-test-1",
+            "Test compact graph store", "ro-testRoAnnotate")
+        roresource = "subdir1/subdir1-file.txt"
+        romd  = ro_metadata.ro_metadata(ro_config, rodir)
+        romd.addSimpleAnnotation(roresource, "type",        "Test file")
+        romd.addSimpleAnnotation(roresource, "title",       "Test file in RO")
+        romd.addSimpleAnnotation(roresource, "rdf:type",    ROTERMS.resource)
+        compact_config = dict(ro_config, graph_store="compact")
+        romd1 = ro_metadata.ro_metadata(ro_config, rodir)
+        romd2 = ro_metadata.ro_metadata(compact_config, rodir)
+        self.assertTrue(isinstance(romd2.getAnnotationGraph().store, ro_store.CompactStore))
+        def namedAnnotations(romd):
+            return set( t for t in romd.iterateAnnotations()
+                        if not isinstance(t[2], rdflib.BNode) )
+        self.assertEqual(namedAnnotations(romd1), namedAnnotations(romd2))
+        query = (make_sparql_prefixes() +
+            """
+            SELECT ?file ?title WHERE
+            {
+                ?ro rdf:type ro:ResearchObject ;
+                    dcterms:creator "Test User" .
+                ?file rdf:type roterms:resource ;
+                    dcterms:title ?title .
+            }
+            """)
+        resp1 = romd1.queryAnnotations(query)
+        resp2 = romd2.queryAnnotations(query)
+        self.assertEqual(len(resp2), 1)
+        self.assertEqual(resp2, resp1)
+        # Updates are applied to the compact store
+        romd2.removeSimpleAnnotation(roresource, "title", "Test file in RO")
+        self.assertEqual(romd2.queryAnnotations(query), [])
+        self.deleteTestRo(rodir)
+        return
+
+    def testCalculateChecksums(self):
+        """
+        Test that file checksums are saved in the registries and recalculated only
+        when a file changes.
+        """
+        rodir = self.createTestRo(testbase, "data/ro-test-1",
+            "Test checksums", "ro-testRoChecksums")
+        romd  = ro_metadata.ro_metadata(ro_config, rodir)
+        file1 = os.path.join(rodir, "subdir1/subdir1-file.txt")
+        file2 = os.path.join(rodir, "subdir2/subdir2-file.txt")
+        dir1  = os.path.join(rodir, "subdir1")
+        checksums = romd.calculateChecksums([file1, file2, dir1], workers=2)
+        self.assertEqual(checksums, 
+            { file1: hashlib.md5(open(file1, "rb").read()).hexdigest()
+            , file2: hashlib.md5(open(file2, "rb").read()).hexdigest()
+            })
+        romd.saveRegistries()
+        # Unchanged files are not read again
+        romd  = ro_metadata.ro_metadata(ro_config, rodir)
+        calculateFileChecksum = ro_metadata._calculateFileChecksum
+        ro_metadata._calculateFileChecksum = None
+        try:
+            self.assertEqual(romd.calculateChecksum(file1), checksums[file1])
+        finally:
+            ro_metadata._calculateFileChecksum = calculateFileChecksum
+        with open(file1, "a") as f:
+            f.write("More content\n")
+        self.assertEqual(romd.calculateChecksum(file1),
+                         hashlib.md5(open(file1, "rb").read()).hexdigest())
+        self.assertNotEqual(romd.calculateChecksum(file1), checksums[file1])
+        self.deleteTestRo(rodir)
+        return
+
     def testQueryAnnotationsRemote(self):
         romd  = ro_metadata.ro_metadata(
             ro_config,
@@ -828,6 +1250,18 @@ def getTestSuite(select="unit"):
             , "testAddGetAnnotationValues"
             , "testQueryAnnotations"
             , "testQueryAnnotationsWithMissingGraph"
+            , "testAnnotationCache"
+            , "testAnnotationCachePrefixes"
+            , "testIncrementalAnnotationUpdate"
+            , "testAnnotationBodyGraphs"
+            , "testParallelAnnotationLoad"
+            , "testIterAnnotationsBySubject"
+            , "testBatchUpdate"
+            , "testManifestJournal"
+            , "testAnnotationBodyIndex"
+            , "testLazyManifestSummary"
+            , "testCompactGraphStore"
+            , "testCalculateChecksums"
             , "testGetRoUri"
             , "testGetComponentUri"
             , "testGetComponentUriRel"
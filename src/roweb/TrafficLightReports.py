@@ -147,6 +147,8 @@ EvalTargetResultClass = (
 #     , "itemclass":      ["fail", "should"]
 #     }
 #
+# An item that was not evaluated has "itemsatisfied" null and "itemclass" ["noteval"].
+#
 # Assumed incoming bindings:
 #   result    result node being reproted
 #   rouri     URI of RO being evaluated
@@ -173,8 +175,11 @@ EvalItemJson = (
         },
         { 'output':
             '''\n    , "itemsatisfied":  true'''
-        , 'alt':
-            '''\n    , "itemsatisfied":  false'''
+        , 'altreport':
+          { 'query':  sparql_prefixes+"""ASK { ?result minim:notEvaluated [ minim:tryRequirement ?itemuri ] }"""
+          , 'output': '''\n    , "itemsatisfied":  null'''
+          , 'alt':    '''\n    , "itemsatisfied":  false'''
+          }
         , 'query': sparql_prefixes+
             """
             SELECT * WHERE
@@ -186,12 +191,16 @@ EvalItemJson = (
         { 'query':  sparql_prefixes+"""ASK { ?result minim:satisfied [ minim:tryRequirement ?itemuri ] }"""
         , 'output':     '''\n    , "itemclass":      ["pass"]'''
         , 'altreport':
-          { 'query':  sparql_prefixes+"""ASK { ?result minim:missingMay [ minim:tryRequirement ?itemuri ] }"""
-          , 'output':   '''\n    , "itemclass":      ["fail", "may"]'''
+          { 'query':  sparql_prefixes+"""ASK { ?result minim:notEvaluated [ minim:tryRequirement ?itemuri ] }"""
+          , 'output':   '''\n    , "itemclass":      ["noteval"]'''
           , 'altreport':
-            { 'query':  sparql_prefixes+"""ASK { ?result minim:missingShould [ minim:tryRequirement ?itemuri ] }"""
-            , 'output': '''\n    , "itemclass":      ["fail", "should"]'''
-            , 'alt':    '''\n    , "itemclass":      ["fail", "must"]'''
+            { 'query':  sparql_prefixes+"""ASK { ?result minim:missingMay [ minim:tryRequirement ?itemuri ] }"""
+            , 'output':   '''\n    , "itemclass":      ["fail", "may"]'''
+            , 'altreport':
+              { 'query':  sparql_prefixes+"""ASK { ?result minim:missingShould [ minim:tryRequirement ?itemuri ] }"""
+              , 'output': '''\n    , "itemclass":      ["fail", "should"]'''
+              , 'alt':    '''\n    , "itemclass":      ["fail", "must"]'''
+              }
             }
           }
         },
@@ -374,12 +383,16 @@ EvalItemHtml = (
       , { 'query':  sparql_prefixes+"""ASK { ?result minim:satisfied [ minim:tryRequirement ?itemuri ] }"""
         , 'output':     '''\n            <td class="trafficlight small pass"><div/></td>'''
         , 'altreport':
-          { 'query':  sparql_prefixes+"""ASK { ?result minim:missingMay [ minim:tryRequirement ?itemuri ] }"""
-          , 'output':   '''\n            <td class="trafficlight small fail may"><div/></td>'''
+          { 'query':  sparql_prefixes+"""ASK { ?result minim:notEvaluated [ minim:tryRequirement ?itemuri ] }"""
+          , 'output':   '''\n            <td class="trafficlight small noteval"><div/></td>'''
           , 'altreport':
-            { 'query':  sparql_prefixes+"""ASK { ?result minim:missingShould [ minim:tryRequirement ?itemuri ] }"""
-            , 'output': '''\n            <td class="trafficlight small fail should"><div/></td>'''
-            , 'alt':    '''\n            <td class="trafficlight small fail must"><div/></td>'''
+            { 'query':  sparql_prefixes+"""ASK { ?result minim:missingMay [ minim:tryRequirement ?itemuri ] }"""
+            , 'output':   '''\n            <td class="trafficlight small fail may"><div/></td>'''
+            , 'altreport':
+              { 'query':  sparql_prefixes+"""ASK { ?result minim:missingShould [ minim:tryRequirement ?itemuri ] }"""
+              , 'output': '''\n            <td class="trafficlight small fail should"><div/></td>'''
+              , 'alt':    '''\n            <td class="trafficlight small fail must"><div/></td>'''
+              }
             }
           }
         }
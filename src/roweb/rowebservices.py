@@ -134,6 +134,10 @@ def service_html(request):
             <li><code><cite>purpose</cite></code> is a purpose for which the evaluation is performed (e.g. "Complete", "Runnable", etc.)
                 The recognised values for this parameter will depend on what is defined by the MINIM model used.</li>
             <li><code><cite>target</cite></code> is the %-escaped URI of a target resource to which the purpose is applied</li>
+            <li><code><cite>detail</cite></code> (optional) is the level of detail required: one of
+                "summary", "must", "should", "may" or "full" (the default).  At levels other than
+                "full" and "may", checklist items that are not needed to determine the result at that
+                level are not evaluated, and are reported as such.</li>
           </ul>
           </p>
         </body>
@@ -151,7 +155,10 @@ def real_evaluate(request):
     minim   = urllib.quote(request.params["minim"], quotesafe)
     target  = urllib.quote(request.params.get("target","."), quotesafe)
     purpose = request.params["purpose"]
-    log.info("Evaluate RO %s, minim %s, target %s, purpose %s"%(RO,minim,target,purpose))
+    detail  = request.params.get("detail", "full")
+    if detail not in ro_eval_minim.DETAIL_LEVELS:
+        detail = "full"
+    log.info("Evaluate RO %s, minim %s, target %s, purpose %s, detail %s"%(RO,minim,target,purpose,detail))
     # create rometa object
     # @@TODO: use proper configuration and credentials
     ROparse   = urlparse.urlparse(RO)
@@ -168,7 +175,7 @@ def real_evaluate(request):
     rometa = ro_metadata(ro_config, RO)
     log.info("rometa.rouri: %s"%(rometa.rouri) )
     # invoke evaluation service
-    (graph, evalresult) = ro_eval_minim.evaluate(rometa, minim, target, purpose)
+    (graph, evalresult) = ro_eval_minim.evaluate(rometa, minim, target, purpose, detail)
     log.debug("evaluate:results: \n"+json.dumps(evalresult, indent=2))
     # Assemble graph of results
     graph =  ro_eval_minim.evalResultGraph(graph, evalresult)